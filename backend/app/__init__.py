@@ -57,9 +57,16 @@ def create_app(config_class=Config):
     
     # Create database tables
     with app.app_context():
+        # Connection pragmas must be in place before the first connection is opened
+        from app.utils.database import configure_engines
+        configure_engines(app)
+
         # Import models to ensure they are registered with SQLAlchemy
-        from app.models import User, ChatSession, ChatMessage, Order
+        from app.models import User, ChatSession, ChatMessage, ChatArchive, Order
+        from app.utils.schema import add_missing_columns, add_missing_indexes
         db.create_all()
+        add_missing_columns(db)
+        add_missing_indexes(db)
     
     # Register blueprints
     from app.auth import bp as auth_bp
@@ -78,6 +85,9 @@ def create_app(config_class=Config):
     # Health check endpoint
     @app.route('/health')
     def health():
-        return {'status': 'healthy'}, 200
+        from app.utils.circuit_breaker import get_llm_breaker
+        
+        # An open LLM circuit degrades chat to fallback replies but the service stays up
+        return {'status': 'healthy', 'llm_circuit': get_llm_breaker().state}, 200
     
     return app
@@ -1,16 +1,27 @@
-from flask import request, jsonify
+from flask import request, jsonify, Response, stream_with_context, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import update
 from app.chat import bp
 from app import db
 from app.models import User, ChatSession, ChatMessage
 from app.utils.llm_client import LLMClient
-from app.utils.knowledge_base import KnowledgeBase
+from app.utils.knowledge_base import get_knowledge_base
+from app.utils.conversation_memory import summarize_if_needed
+from app.utils.database import read_session
+from app.utils.history_cache import get_history_cache
+from app.utils.message_storage import encode_context, resolve_context
+from app.utils.retention import rehydrate_session
+from app.utils.intent_router import IntentRouter
+from app.utils.order_drafter import get_order_drafter
 import uuid
+import json
+import time
 import logging
 from datetime import datetime
 
 llm_client = LLMClient()
-knowledge_base = KnowledgeBase()
+knowledge_base = get_knowledge_base()
+intent_router = IntentRouter(knowledge_base)
 
 @bp.route('/', methods=['POST'])
 @jwt_required()
@@ -31,72 +42,62 @@ def chat():
         
         logging.info(f"User message: {user_message[:50]}...")
         
-        # Get or create chat session
-        if session_id:
-            chat_session = ChatSession.query.filter_by(
-                session_id=session_id, 
-                user_id=user_id
-            ).first()
-            logging.info(f"Found existing session: {session_id}")
+        # Read phase: session, history (read before the new message is saved so
+        # it isn't sent twice), intent and knowledge base context
+        chat_session = get_or_create_session(user_id, session_id)
+        session_pk = chat_session.id
+        public_session_id = chat_session.session_id
+        summary = chat_session.summary
+        chat_history = get_chat_history(chat_session)
+        
+        # Menu listings and order status are answered without the LLM
+        routed = route_intent(user_message, user_id)
+        if not routed:
+            # Retrieve relevant knowledge base content
+            logging.info("Retrieving knowledge base context...")
+            retrieved_context = knowledge_base.retrieve(user_message)
+            logging.info(f"Retrieved {len(retrieved_context) if retrieved_context else 0} knowledge base items")
         else:
-            chat_session = None
-            logging.info("No session ID provided")
+            retrieved_context = None
+        context_ref = encode_context(retrieved_context, knowledge_base.version)
         
-        if not chat_session:
-            # Create new session
-            chat_session = ChatSession()
-            chat_session.user_id = user_id
-            chat_session.session_id = str(uuid.uuid4())
-            db.session.add(chat_session)
-            db.session.commit()
-            logging.info(f"Created new session: {chat_session.session_id}")
-        
-        # Save user message
-        user_msg = ChatMessage()
-        user_msg.session_id = chat_session.id
-        user_msg.message_type = 'user'
-        user_msg.content = user_message
-        db.session.add(user_msg)
-        
-        # Retrieve relevant knowledge base content
-        logging.info("Retrieving knowledge base context...")
-        retrieved_context = knowledge_base.retrieve(user_message)
-        logging.info(f"Retrieved {len(retrieved_context) if retrieved_context else 0} knowledge base items")
-        
-        # Generate AI response
-        logging.info("Calling LLM client to generate response...")
-        ai_response = llm_client.generate_response(
-            user_message=user_message,
-            context=retrieved_context,
-            chat_history=get_chat_history(chat_session.id)
-        )
-        logging.info(f"LLM response generated: {ai_response[:50]}...")
-        
-        # Check if we should suggest order creation (only for authenticated users)
-        # NOTE: Disabled automatic suggestions since LLM already handles this intelligently
-        # should_suggest = llm_client.should_suggest_order_creation(user_message)
-        # user_id = get_jwt_identity() if hasattr(get_jwt_identity, '__call__') else None
-        
-        # if should_suggest and user_id:
-        #     logging.info("LLM detected order intent, adding suggestion to response")
-        #     ai_response += "\n\n🛒 **Would you like to create an order?**\n\nI see that you mentioned some products from our menu. I can analyze our conversation and create an order for you. Just click the shopping cart button (🛒) in the top right corner of the chat."
-        
-        # Save AI response
-        ai_msg = ChatMessage()
-        ai_msg.session_id = chat_session.id
-        ai_msg.message_type = 'assistant'
-        ai_msg.content = ai_response
-        ai_msg.retrieved_context = str(retrieved_context) if retrieved_context else None
-        db.session.add(ai_msg)
-        db.session.commit()
+        # Save the user message in its own short transaction and release the
+        # connection, so no lock is held while waiting for the LLM
+        save_message(session_pk, 'user', user_message)
+        db.session.close()
+        
+        if routed:
+            ai_response = routed
+        else:
+            # Generate AI response; identical opening questions may share a cached reply
+            logging.info("Calling LLM client to generate response...")
+            ai_response = llm_client.generate_response(
+                user_message=user_message,
+                context=retrieved_context,
+                chat_history=chat_history,
+                cacheable=_is_cacheable_turn(chat_history, summary),
+                kb_version=knowledge_base.version,
+                summary=summary
+            )
+            logging.info(f"LLM response generated: {ai_response[:50]}...")
+        
+        # Write phase: save AI response
+        save_message(session_pk, 'assistant', ai_response, context_ref)
+        
+        if not routed:
+            schedule_order_draft(session_pk, user_message)
         
         logging.info("Chat response completed successfully")
         
-        return jsonify({
+        response = jsonify({
             'message': ai_response,
-            'session_id': chat_session.session_id,
+            'session_id': public_session_id,
+            'knowledge_base_version': knowledge_base.version,
             'timestamp': datetime.utcnow().isoformat()
-        }), 200
+        })
+        # Summarizing may take another LLM call; the client shouldn't wait for it
+        defer_summary_update(response, session_pk)
+        return response, 200
         
     except Exception as e:
         db.session.rollback()
@@ -104,17 +105,282 @@ def chat():
         logging.error(f"Error type: {type(e).__name__}")
         return jsonify({'error': 'Chat failed', 'details': str(e)}), 500
 
-def get_chat_history(session_id, limit=10):
-    """Helper function to get recent chat history for context"""
-    messages = ChatMessage.query.filter_by(session_id=session_id).order_by(
-        ChatMessage.timestamp.desc()
-    ).limit(limit).all()
+@bp.route('/stream', methods=['POST'])
+@jwt_required()
+def chat_stream():
+    """Streaming chat endpoint - sends the AI response as Server-Sent Events"""
+    try:
+        user_id = get_jwt_identity()
+        data = request.get_json()
+        
+        logging.info(f"Chat stream endpoint called by user {user_id}")
+        
+        if not data.get('message'):
+            logging.warning("Chat stream request missing message")
+            return jsonify({'error': 'Message is required'}), 400
+        
+        user_message = data['message'].strip()
+        started = time.monotonic()
+        
+        chat_session = get_or_create_session(user_id, data.get('session_id'))
+        
+        # History is read before the new message is saved so it isn't sent twice
+        routed = route_intent(user_message, user_id)
+        chat_history = get_chat_history(chat_session)
+        summary = chat_session.summary
+        retrieved_context = knowledge_base.retrieve(user_message) if not routed else None
+        context_ref = encode_context(retrieved_context, knowledge_base.version)
+        
+        session_pk = chat_session.id
+        public_session_id = chat_session.session_id
+        
+        # Save user message before streaming starts; no connection is held while streaming
+        save_message(session_pk, 'user', user_message)
+        db.session.close()
+        
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Chat stream endpoint error: {str(e)}")
+        return jsonify({'error': 'Chat failed', 'details': str(e)}), 500
     
-    history = []
-    for msg in reversed(messages):
-        history.append({
-            'role': 'user' if msg.message_type == 'user' else 'assistant',
-            'content': msg.content
+    def generate():
+        parts = []
+        first_token_ms = None
+        
+        # Tell the client which session this is before the first token
+        yield _sse_event('start', {'session_id': public_session_id})
+        
+        if routed:
+            chunks = [routed]
+        else:
+            chunks = llm_client.stream_response(
+                user_message=user_message,
+                context=retrieved_context,
+                chat_history=chat_history,
+                cacheable=_is_cacheable_turn(chat_history, summary),
+                kb_version=knowledge_base.version,
+                summary=summary
+            )
+        
+        for delta in chunks:
+            if first_token_ms is None:
+                first_token_ms = round((time.monotonic() - started) * 1000)
+            parts.append(delta)
+            yield _sse_event('token', {'content': delta})
+        
+        ai_response = ''.join(parts).strip()
+        
+        # Persist the assembled assistant message once the stream is complete
+        try:
+            save_message(session_pk, 'assistant', ai_response, context_ref)
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Failed to save streamed chat response: {str(e)}")
+            yield _sse_event('error', {'error': 'Failed to save response'})
+        
+        logging.info(f"Chat stream completed: first token {first_token_ms} ms, {len(ai_response)} chars")
+        
+        yield _sse_event('done', {
+            'message': ai_response,
+            'session_id': public_session_id,
+            'knowledge_base_version': knowledge_base.version,
+            'timestamp': datetime.utcnow().isoformat(),
+            'timing': {
+                'first_token_ms': first_token_ms,
+                'total_ms': round((time.monotonic() - started) * 1000)
+            }
         })
+        
+        # The client has the full reply by now, so drafting doesn't delay it
+        if not routed:
+            schedule_order_draft(session_pk, user_message)
+    
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Summarize once the stream is closed, as /chat/ does
+    defer_summary_update(response, session_pk)
+    return response
+
+@bp.route('/messages/<int:message_id>/context', methods=['GET'])
+@jwt_required()
+def message_context(message_id):
+    """Knowledge base entries an assistant message was answered from, resolved to full text"""
+    try:
+        user_id = get_jwt_identity()
+
+        # Users can only see context of their own sessions
+        row = db.session.query(ChatMessage.retrieved_context).join(ChatSession).filter(
+            ChatMessage.id == message_id,
+            ChatSession.user_id == user_id
+        ).first()
+
+        if not row:
+            return jsonify({'error': f'Message {message_id} not found or does not belong to you'}), 404
+
+        return jsonify({'message_id': message_id, **resolve_context(row.retrieved_context, knowledge_base)}), 200
+
+    except Exception as e:
+        return jsonify({'error': 'Failed to load message context', 'details': str(e)}), 500
+
+@bp.route('/sessions/<session_id>/rehydrate', methods=['POST'])
+@jwt_required()
+def rehydrate(session_id):
+    """Move an archived session's messages back so the conversation can be shown and continued"""
+    try:
+        user_id = get_jwt_identity()
+
+        chat_session = ChatSession.query.filter_by(session_id=session_id, user_id=user_id).first()
+        if not chat_session:
+            return jsonify({'error': f'Session {session_id} not found or does not belong to you'}), 404
+
+        archived = chat_session.is_active is False
+        restored = rehydrate_session(chat_session) if archived else 0
+        return jsonify({'session_id': session_id, 'was_archived': archived, 'restored_messages': restored}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Rehydrate session error: {str(e)}")
+        return jsonify({'error': 'Failed to rehydrate session', 'details': str(e)}), 500
+
+def schedule_order_draft(session_pk, user_message):
+    """Draft the session's order in the background after a turn with ordering intent"""
+    try:
+        drafter = get_order_drafter()
+        if drafter and llm_client.should_suggest_order_creation(user_message):
+            drafter.submit(session_pk)
+    except Exception as e:
+        logging.warning(f"Could not schedule order draft: {str(e)}")
+
+def _is_cacheable_turn(chat_history, summary):
+    """
+    Whether the reply may come from (and go to) the shared completion cache:
+    only before the assistant has answered anything in the session, since
+    later replies depend on earlier answers
+    """
+    return not summary and not any(message['role'] == 'assistant' for message in chat_history)
+
+def _sse_event(event, data):
+    """Format a Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def get_or_create_session(user_id, session_id=None):
+    """Return the user's chat session, creating a new one if it doesn't exist"""
+    if session_id:
+        chat_session = ChatSession.query.filter_by(
+            session_id=session_id, 
+            user_id=user_id
+        ).first()
+        logging.info(f"Found existing session: {session_id}")
+        if chat_session and chat_session.is_active is False:
+            # Archived for inactivity; its messages are needed as history again
+            rehydrate_session(chat_session)
+    else:
+        chat_session = None
+        logging.info("No session ID provided")
+    
+    if not chat_session:
+        # Create new session
+        chat_session = ChatSession()
+        chat_session.user_id = user_id
+        chat_session.session_id = str(uuid.uuid4())
+        db.session.add(chat_session)
+        db.session.commit()
+        logging.info(f"Created new session: {chat_session.session_id}")
+    
+    return chat_session
+
+def save_message(session_pk, message_type, content, context_ref=None):
+    """Insert one chat message, make it the session's last message and commit right away"""
+    message = ChatMessage()
+    message.session_id = session_pk
+    message.message_type = message_type
+    message.content = content
+    message.retrieved_context = context_ref
+    db.session.add(message)
+    db.session.flush()
+    message_id = message.id  # Reading it after the commit would reload the message
+    
+    # Write through to the history cache only if the cached snapshot was the
+    # session's latest state when this message went in
+    history_cache = get_history_cache()
+    cached = history_cache.peek(session_pk) if history_cache is not None else None
+    advance = update(ChatSession).where(ChatSession.id == session_pk).values(
+        last_message_id=message_id).execution_options(synchronize_session=False)
+    current = cached is not None and db.session.execute(
+        advance.where(ChatSession.last_message_id.is_not_distinct_from(cached.last_message_id))).rowcount == 1
+    if not current:
+        db.session.execute(advance)
+    db.session.commit()
+    
+    if current:
+        history_cache.append(session_pk, cached.last_message_id, message_id, history_role(message_type), content)
+    elif cached is not None:
+        history_cache.discard(session_pk)
+    return message
+
+def route_intent(user_message, user_id):
+    """Reply for a deterministic intent (menu listings, order status), or None to use the LLM"""
+    if not current_app.config.get('CHAT_INTENT_ROUTER_ENABLED', True):
+        return None
+    try:
+        routed = intent_router.route(user_message, user_id)
+    except Exception as e:
+        logging.error(f"Intent router error, falling back to the LLM: {str(e)}")
+        return None
+    return routed[1] if routed else None
+
+def update_summary(chat_session):
+    """Fold older messages into the session summary if the conversation got long"""
+    try:
+        if summarize_if_needed(chat_session, llm_client):
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Failed to update conversation summary: {str(e)}")
+
+def defer_summary_update(response, session_pk):
+    """Update the session summary once the response has been sent, in a fresh app context"""
+    app = current_app._get_current_object()
+    
+    def update():
+        with app.app_context():
+            try:
+                update_summary(db.session.get(ChatSession, session_pk))
+            except Exception as e:
+                logging.error(f"Deferred summary update failed: {str(e)}")
+    
+    response.call_on_close(update)
+
+def history_role(message_type):
+    return 'user' if message_type == 'user' else 'assistant'
+
+def get_chat_history(chat_session, limit=10):
+    """Helper function to get recent chat history for context (messages after the summary watermark)"""
+    after_id = chat_session.summary_message_id
+    history_cache = get_history_cache()
+    if history_cache is not None:
+        history = history_cache.get(chat_session.id, chat_session.last_message_id, limit, after_id)
+        if history is not None:
+            return history
+    
+    # A cache miss loads a full ring buffer, from before the watermark too
+    load_limit = max(limit, history_cache.size) if history_cache is not None else limit
+    with read_session() as session:
+        query = session.query(ChatMessage.id, ChatMessage.message_type, ChatMessage.content).filter_by(session_id=chat_session.id)
+        if after_id and history_cache is None:
+            query = query.filter(ChatMessage.id > after_id)
+        rows = query.order_by(ChatMessage.timestamp.desc()).limit(load_limit).all()
+    
+    messages = [(row.id, history_role(row.message_type), row.content) for row in reversed(rows)]
+    if history_cache is not None:
+        history_cache.store(chat_session.id, chat_session.last_message_id, messages, complete=len(rows) < load_limit)
+    
+    history = []
+    for message_id, role, content in messages:
+        if not after_id or message_id > after_id:
+            history.append({'role': role, 'content': content})
     
-    return history
+    return history[-limit:]
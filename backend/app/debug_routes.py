@@ -16,6 +16,10 @@ def llm_status():
             'llm_test': {}
         }
         
+        from app.utils.circuit_breaker import get_llm_breaker, get_llm_retry_budget
+        status['circuit_breaker'] = get_llm_breaker().stats()
+        status['retry_budget'] = get_llm_retry_budget().stats()
+        
         # Check environment variables
         status['environment'] = {
             'OPENAI_API_KEY_set': bool(os.environ.get('OPENAI_API_KEY')),
@@ -29,7 +33,8 @@ def llm_status():
         status['openai_config'] = {
             'config_api_key_set': bool(api_key),
             'config_api_key_length': len(api_key) if api_key else 0,
-            'config_api_key_prefix': api_key[:8] + '...' if api_key and len(api_key) > 8 else api_key
+            'config_api_key_prefix': api_key[:8] + '...' if api_key and len(api_key) > 8 else api_key,
+            'base_url': current_app.config.get('OPENAI_BASE_URL')
         }
         
         # Test OpenAI client initialization
@@ -37,7 +42,12 @@ def llm_status():
             from openai import OpenAI
             
             if api_key:
-                client = OpenAI(api_key=api_key)
+                client = OpenAI(
+                    api_key=api_key,
+                    base_url=current_app.config.get('OPENAI_BASE_URL'),
+                    timeout=current_app.config.get('LLM_TIMEOUT_SECONDS', 20),
+                    max_retries=0
+                )
                 
                 # Test simple API call
                 response = client.chat.completions.create(
@@ -115,3 +125,57 @@ def environment_info():
             'error': 'Debug environment endpoint failed',
             'details': str(e)
         }), 500
+
+@debug_bp.route('/debug/llm-cache', methods=['GET'])
+def llm_cache_info():
+    """Debug endpoint to check the LLM completion cache, call coalescing, background order drafts and the history cache"""
+    try:
+        from app.utils.completion_cache import get_completion_cache
+        from app.utils.singleflight import get_single_flight
+        from app.utils.order_drafter import get_order_drafter
+        from app.utils.history_cache import get_history_cache
+        
+        cache = get_completion_cache()
+        single_flight = get_single_flight()
+        drafter = get_order_drafter()
+        history_cache = get_history_cache()
+        status = {'enabled': True, **cache.stats()} if cache else {'enabled': False}
+        status['coalescing'] = single_flight.stats() if single_flight else {'enabled': False}
+        status['order_drafts'] = drafter.stats() if drafter else {'enabled': False}
+        status['chat_history'] = history_cache.stats() if history_cache else {'enabled': False}
+        
+        return jsonify(status), 200
+        
+    except Exception as e:
+        logging.error(f"Debug LLM cache endpoint error: {e}")
+        return jsonify({
+            'error': 'Debug LLM cache endpoint failed',
+            'details': str(e)
+        }), 500
+
+@debug_bp.route('/debug/knowledge-base', methods=['GET'])
+def knowledge_base_info():
+    """Debug endpoint to check the active knowledge base snapshot and cache"""
+    try:
+        from app.utils.knowledge_base import get_knowledge_base
+        knowledge_base = get_knowledge_base()
+        
+        version = knowledge_base.version
+        snapshot = knowledge_base.snapshot
+        
+        return jsonify({
+            'version': version,
+            'ranking': snapshot.ranking if snapshot else None,
+            'entries': len(snapshot.entries) if snapshot else 0,
+            'terms': len(snapshot.postings) if snapshot else 0,
+            'menu_items': len(snapshot.catalog) if snapshot else 0,
+            'reload_interval': knowledge_base.reload_interval,
+            'query_cache': knowledge_base.query_cache.stats()
+        }), 200
+        
+    except Exception as e:
+        logging.error(f"Debug knowledge base endpoint error: {e}")
+        return jsonify({
+            'error': 'Debug knowledge base endpoint failed',
+            'details': str(e)
+        }), 500
@@ -1,5 +1,7 @@
 from app import db
+from app.utils.message_storage import CompressedText
 from datetime import datetime
+import json
 from werkzeug.security import generate_password_hash, check_password_hash
 
 class User(db.Model):
@@ -65,6 +67,32 @@ class Order(db.Model):
             'driver_name': self.driver_name,
             'driver_phone': self.driver_phone
         }
+    
+    def to_status_dict(self):
+        """Convert order to dictionary with parsed items and a chat-friendly status"""
+        # Parse items JSON
+        try:
+            items = json.loads(self.items)
+        except (TypeError, ValueError):
+            items = []
+        
+        order_data = self.to_dict()
+        order_data['items'] = items
+        
+        # Add status description for chat-friendly response
+        status_descriptions = {
+            'received': 'Your order has been received and is being processed.',
+            'preparing': 'Our kitchen is preparing your delicious meal.',
+            'cooking': 'Your food is being cooked with care.',
+            'ready': 'Your order is ready for pickup/delivery.',
+            'out_for_delivery': f'Your order is on the way! Driver: {self.driver_name}' if self.driver_name else 'Your order is out for delivery.',
+            'delivered': 'Your order has been delivered. Enjoy your meal!',
+            'cancelled': 'Your order has been cancelled.'
+        }
+        
+        order_data['status_description'] = status_descriptions.get(self.status, 'Status unknown')
+        order_data['chat_friendly_summary'] = f"Order {self.id}: {len(items)} items, Total: ${self.total_amount:.2f}, Status: {order_data['status_description']}"
+        return order_data
 
 class ChatSession(db.Model):
     """Chat session model for tracking conversations"""
@@ -73,21 +101,39 @@ class ChatSession(db.Model):
     session_id = db.Column(db.String(36), nullable=False, unique=True)  # UUID
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    is_active = db.Column(db.Boolean, default=True)
+    is_active = db.Column(db.Boolean, default=True)  # False once the messages are archived (see ChatArchive)
     
+    # Rolling summary of older messages; messages up to summary_message_id are folded into it
+    summary = db.Column(db.Text, nullable=True)
+    summary_message_id = db.Column(db.Integer, nullable=True)
+
+    # Draft order (JSON) built from the user messages up to cart_message_id
+    draft_cart = db.Column(db.Text, nullable=True)
+    cart_message_id = db.Column(db.Integer, nullable=True)
+
+    # Newest message of the session; validates cached history (see app/utils/history_cache.py)
+    last_message_id = db.Column(db.Integer, nullable=True)
+
     # Relationships
     messages = db.relationship('ChatMessage', backref='session', lazy='dynamic', cascade='all, delete-orphan')
 
 class ChatMessage(db.Model):
     """Individual chat messages"""
+    __table_args__ = (
+        # Recent history of a session (ORDER BY timestamp DESC LIMIT n)
+        db.Index('ix_chat_message_session_timestamp', 'session_id', 'timestamp'),
+        # A session's user messages after a watermark (draft cart); rows are ordered by the implicit rowid
+        db.Index('ix_chat_message_session_type', 'session_id', 'message_type'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.Integer, db.ForeignKey('chat_session.id'), nullable=False)
     message_type = db.Column(db.String(10), nullable=False)  # 'user' or 'assistant'
-    content = db.Column(db.Text, nullable=False)
+    content = db.Column(CompressedText, nullable=False)  # Large bodies optionally compressed (MESSAGE_COMPRESSION)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Optional metadata
-    retrieved_context = db.Column(db.Text, nullable=True)  # For RAG context
+    retrieved_context = db.Column(db.Text, nullable=True)  # Knowledge base version and entry keys, see encode_context
     
     def to_dict(self):
         """Convert message to dictionary"""
@@ -97,3 +143,13 @@ class ChatMessage(db.Model):
             'content': self.content,
             'timestamp': self.timestamp.isoformat()
         }
+
+class ChatArchive(db.Model):
+    """Messages of an idle chat session, moved out of chat_message as one compressed document"""
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey('chat_session.id'), nullable=False, unique=True)
+    message_count = db.Column(db.Integer, nullable=False)
+    raw_bytes = db.Column(db.Integer, nullable=False)  # Size of the uncompressed JSON document
+    last_message_at = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    payload = db.Column(db.LargeBinary, nullable=False)  # Codec tag plus compressed JSON, see app/utils/retention.py
@@ -1,97 +1,56 @@
-from flask import request, jsonify
+from flask import request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.orders import bp
 from app import db
-from app.models import Order, User, ChatSession, ChatMessage
+from app.models import Order, User, ChatSession
 from app.utils.llm_client import LLMClient
+from app.utils.knowledge_base import get_knowledge_base
+from app.utils.database import read_session
+from app.utils.draft_cart import clear_cart, pending_user_messages, render_cart, update_cart, validate_order_items
+from app.utils.order_drafter import get_order_drafter
+from app.utils.retention import rehydrate_session
 import json
 import uuid
 import random
 import string
 from datetime import datetime, timedelta
-import os
 import logging
 
-def load_menu():
-    """Load menu data from JSON file"""
-    try:
-        menu_path = os.path.join(os.path.dirname(__file__), '..', '..', 'knowledge_base', 'menu.json')
-        with open(menu_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Error loading menu: {e}")
-        return {}
-
 def generate_order_id():
     """Generate a unique order ID in format PB######"""
     return f"PB{''.join(random.choices(string.digits, k=6))}"
 
 def analyze_chat_for_order(session_id, user_id):
-    """Analyze chat messages to extract order items using LLM"""
+    """Update the session's draft cart from the messages since its last analysis and return it as an order"""
     try:
         # Get the chat session
         session = ChatSession.query.filter_by(session_id=session_id, user_id=user_id).first()
         if not session:
             return {"error": "Chat session not found"}, 404
+        if session.is_active is False:
+            rehydrate_session(session)
         
-        # Get all messages from the session
-        messages = ChatMessage.query.filter_by(session_id=session.id).order_by(ChatMessage.timestamp).all()
-        
-        # Combine all user messages for analysis
-        conversation_text = " ".join([msg.content for msg in messages if msg.message_type == 'user'])
-        
-        if not conversation_text.strip():
+        if session.cart_message_id is None and not session.summary and not pending_user_messages(session).first():
             return {"error": "No user messages found in conversation"}, 400
         
-        # Load menu for validation
-        menu = load_menu()
+        # Shared menu catalog for validation, reloaded with the knowledge base
+        catalog = get_knowledge_base().catalog
         
-        if not menu:
+        if not len(catalog):
             return {"error": "Menu data not available"}, 500
         
-        # Use LLM for intelligent order extraction
-        llm_client = LLMClient()
-        try:
-            llm_result = llm_client.analyze_conversation_for_order(conversation_text, menu)
-        except Exception as llm_error:
-            logging.warning(f"LLM analysis failed: {str(llm_error)}, falling back to keyword matching")
-            llm_result = {"items": [], "confidence": 0.0, "reasoning": f"LLM failed: {str(llm_error)}"}
-        
-        # Process LLM results
-        detected_items = []
-        total_amount = 0.0
+        # A background draft in progress is awaited rather than repeated; a queued one is cancelled
+        drafter = get_order_drafter()
+        if drafter:
+            drafter.settle(session.id, float(current_app.config.get('ORDER_DRAFT_WAIT_SECONDS', 10)))
+            db.session.refresh(session)
         
-        if llm_result.get('items'):
-            for item in llm_result['items']:
-                # Validate that the item exists in our menu and prices match
-                item_found = False
-                for category in ['burgers', 'sides', 'drinks', 'desserts']:
-                    if category in menu:
-                        for menu_item in menu[category]:
-                            if menu_item['name'].lower() == item['name'].lower():
-                                # Use actual menu price for security
-                                actual_price = float(menu_item['price'])
-                                quantity = max(1, int(item.get('quantity', 1)))  # Ensure positive quantity
-                                
-                                validated_item = {
-                                    "name": menu_item['name'],  # Use exact menu name
-                                    "price": actual_price,
-                                    "quantity": quantity,
-                                    "customizations": item.get('customizations', []),
-                                    "category": category
-                                }
-                                
-                                detected_items.append(validated_item)
-                                total_amount += actual_price * quantity
-                                item_found = True
-                                break
-                    if item_found:
-                        break
+        # Only messages added since the cart was last updated are analyzed; a fresh draft needs no analysis
+        cart = update_cart(session, catalog, LLMClient())
+        db.session.commit()
         
-        # Fallback to simple keyword matching if LLM fails or finds nothing
-        if not detected_items:
-            logging.info("LLM found no items, falling back to simple keyword matching")
-            detected_items, total_amount = _simple_keyword_extraction(conversation_text, menu)
+        # Re-validate against the current menu; prices may have changed since the cart was drafted
+        detected_items, total_amount = validate_order_items(cart['items'], catalog)
         
         if not detected_items:
             return {"error": "No menu items detected in conversation. Please mention specific items from our menu."}, 400
@@ -99,59 +58,18 @@ def analyze_chat_for_order(session_id, user_id):
         return {
             "items": detected_items,
             "total_amount": round(total_amount, 2),
-            "conversation_summary": conversation_text[:200] + "..." if len(conversation_text) > 200 else conversation_text,
-            "analysis_method": "LLM" if llm_result.get('items') else "keyword_matching",
-            "llm_confidence": llm_result.get('confidence', 0.0),
-            "llm_reasoning": llm_result.get('reasoning', 'No LLM analysis available'),
-            "unavailable_items": llm_result.get('unavailable_items', [])
+            "conversation_summary": render_cart(detected_items),
+            "analysis_method": cart['analysis_method'],
+            "llm_confidence": cart['confidence'],
+            "llm_reasoning": cart['reasoning'] or 'No LLM analysis available',
+            "unavailable_items": cart['unavailable_items']
         }, 200
         
     except Exception as e:
+        db.session.rollback()
         logging.error(f"Error in analyze_chat_for_order: {str(e)}")
         return {"error": f"Failed to analyze chat: {str(e)}"}, 500
 
-def _simple_keyword_extraction(conversation_text, menu):
-    """Fallback simple keyword matching for order extraction"""
-    detected_items = []
-    total_amount = 0.0
-    conversation_lower = conversation_text.lower()
-    
-    # Check each menu category for mentioned items
-    for category in ['burgers', 'sides', 'drinks', 'desserts']:
-        if category in menu:
-            for item in menu[category]:
-                item_name = item['name'].lower()
-                
-                # Simple keyword matching
-                if any(word in conversation_lower for word in item_name.split()):
-                    # Try to extract quantity (default to 1)
-                    quantity = 1
-                    for word in conversation_text.split():
-                        if word.isdigit() and int(word) <= 10:  # Reasonable quantity limit
-                            quantity = int(word)
-                            break
-                    
-                    # Extract customizations (simple approach)
-                    customizations = []
-                    if "no onions" in conversation_lower or "without onions" in conversation_lower:
-                        customizations.append("no onions")
-                    if "extra cheese" in conversation_lower:
-                        customizations.append("extra cheese")
-                    if "no tomato" in conversation_lower or "without tomato" in conversation_lower:
-                        customizations.append("no tomato")
-                    
-                    detected_items.append({
-                        "name": item['name'],
-                        "price": float(item['price']),
-                        "quantity": quantity,
-                        "customizations": customizations,
-                        "category": category
-                    })
-                    
-                    total_amount += float(item['price']) * quantity
-    
-    return detected_items, total_amount
-
 @bp.route('/', methods=['POST'])
 @jwt_required()
 def create_order():
@@ -192,6 +110,8 @@ def create_order():
         )
         
         db.session.add(order)
+        # The cart became this order; later items start a new one
+        clear_cart(ChatSession.query.filter_by(session_id=session_id, user_id=user_id).first())
         db.session.commit()
         
         # Prepare response
@@ -223,34 +143,13 @@ def lookup_order(order_id):
         user_id = get_jwt_identity()
         
         # Find order - user can only see their own orders
-        order = Order.query.filter_by(id=order_id, user_id=user_id).first()
+        with read_session() as session:
+            order = session.query(Order).filter_by(id=order_id, user_id=user_id).first()
+            order_data = order.to_status_dict() if order else None
         
-        if not order:
+        if not order_data:
             return jsonify({'error': f'Order {order_id} not found or does not belong to you'}), 404
         
-        # Parse items JSON
-        try:
-            items = json.loads(order.items)
-        except:
-            items = []
-        
-        order_data = order.to_dict()
-        order_data['items'] = items
-        
-        # Add status description for chat-friendly response
-        status_descriptions = {
-            'received': 'Your order has been received and is being processed.',
-            'preparing': 'Our kitchen is preparing your delicious meal.',
-            'cooking': 'Your food is being cooked with care.',
-            'ready': 'Your order is ready for pickup/delivery.',
-            'out_for_delivery': f'Your order is on the way! Driver: {order.driver_name}' if order.driver_name else 'Your order is out for delivery.',
-            'delivered': 'Your order has been delivered. Enjoy your meal!',
-            'cancelled': 'Your order has been cancelled.'
-        }
-        
-        order_data['status_description'] = status_descriptions.get(order.status, 'Status unknown')
-        order_data['chat_friendly_summary'] = f"Order {order_id}: {len(items)} items, Total: ${order.total_amount:.2f}, Status: {order_data['status_description']}"
-        
         return jsonify({'order': order_data}), 200
         
     except Exception as e:
@@ -0,0 +1,79 @@
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+
+# Field weights applied to term frequencies of menu items (BM25F style)
+BM25_FIELD_WEIGHTS = {
+    'name': 3.0,
+    'description': 1.0,
+    'ingredients': 1.5,
+    'category': 1.0
+}
+
+class BM25Index:
+    """Okapi BM25 ranking over a precomputed term-document weight matrix"""
+
+    def __init__(self, documents: List[Dict[str, float]], k1: float = 1.2, b: float = 0.75):
+        """
+        Build the matrix for a list of documents
+
+        Args:
+            documents (list): One {term: weighted term frequency} dict per document,
+                in entry id order
+            k1 (float): Term frequency saturation
+            b (float): Document length normalisation
+        """
+        self.vocabulary: Dict[str, int] = {}
+        for doc in documents:
+            for term in doc:
+                self.vocabulary.setdefault(term, len(self.vocabulary))
+
+        tf = np.zeros((len(documents), len(self.vocabulary)), dtype=np.float32)
+        for row, doc in enumerate(documents):
+            for term, freq in doc.items():
+                tf[row, self.vocabulary[term]] = freq
+
+        doc_lengths = tf.sum(axis=1)
+        avg_length = float(doc_lengths.mean()) if len(documents) else 0.0
+        doc_freq = np.count_nonzero(tf, axis=0)
+        n_docs = len(documents)
+        idf = np.log(1.0 + (n_docs - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+
+        # Precompute the full BM25 term weight so a query is a single product
+        norm = k1 * (1.0 - b + b * doc_lengths / avg_length) if avg_length else np.full(n_docs, k1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weights = tf * (k1 + 1.0) / (tf + norm[:, None].astype(np.float32))
+        self.matrix = np.nan_to_num(weights * idf[None, :]).astype(np.float32)
+
+    def score(self, terms: Iterable[str]) -> np.ndarray:
+        """Score every document against the query terms in one matrix-vector product"""
+        query = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for term in terms:
+            column = self.vocabulary.get(term)
+            if column is not None:
+                query[column] += 1.0
+        if not query.any():
+            return np.zeros(self.matrix.shape[0], dtype=np.float32)
+        return self.matrix @ query
+
+    def top_k(self, terms: Iterable[str], k: int) -> List[Tuple[int, float]]:
+        """Return up to k (document id, score) pairs with a positive score, best first"""
+        return top_k(self.score(terms), k)
+
+def top_k(scores: np.ndarray, k: int, min_score: float = 0.0) -> List[Tuple[int, float]]:
+    """Best k (index, score) pairs above min_score without sorting the whole array"""
+    candidates = np.flatnonzero(scores > min_score)
+    if k <= 0:
+        return []
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    ranked = candidates[np.argsort(-scores[candidates], kind='stable')]
+    return [(int(index), float(scores[index])) for index in ranked]
+
+def weighted_term_frequencies(fields: Dict[str, List[str]], field_weights: Dict[str, float]) -> Dict[str, float]:
+    """Combine per-field token lists into one weighted term frequency dict"""
+    frequencies: Dict[str, float] = {}
+    for field, terms in fields.items():
+        weight = field_weights.get(field, 1.0)
+        for term in terms:
+            frequencies[term] = frequencies.get(term, 0.0) + weight
+    return frequencies
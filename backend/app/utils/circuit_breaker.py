@@ -0,0 +1,165 @@
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional
+from flask import current_app
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open"""
+
+class CircuitBreaker:
+    """
+    Stop calling a failing dependency for a while.
+
+    The circuit opens after ``failure_threshold`` consecutive failures, so
+    callers fail fast instead of waiting on timeouts. After
+    ``recovery_timeout`` seconds it goes half-open and lets up to
+    ``half_open_max_calls`` probe calls through: a success closes it again,
+    a failure re-opens it for another recovery period.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._lock = threading.Lock()
+        self.total_failures = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        """Current state, moving from open to half-open once the recovery timeout has passed"""
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._half_open_calls = 0
+            logging.info(f"Circuit '{self.name}' half-open, probing for recovery")
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Whether a call may be made now (counts as a probe while half-open)"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def release_probe(self):
+        """Give back a half-open probe slot for a call that ended without a verdict on the dependency"""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logging.info(f"Circuit '{self.name}' closed, dependency recovered")
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self.total_failures += 1
+            state = self._current_state()
+            if state == self.HALF_OPEN or (state == self.CLOSED and self._failures >= self.failure_threshold):
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self.times_opened += 1
+                logging.warning(f"Circuit '{self.name}' opened after {self._failures} consecutive failure(s)")
+
+    def stats(self) -> Dict[str, Any]:
+        """State and counters for health and debug endpoints"""
+        with self._lock:
+            state = self._current_state()
+            retry_in = self.recovery_timeout - (time.monotonic() - self._opened_at) if state == self.OPEN else 0.0
+            return {
+                'state': state,
+                'consecutive_failures': self._failures,
+                'failure_threshold': self.failure_threshold,
+                'recovery_timeout': self.recovery_timeout,
+                'retry_in_seconds': round(max(0.0, retry_in), 1),
+                'total_failures': self.total_failures,
+                'rejected': self.rejected,
+                'times_opened': self.times_opened
+            }
+
+class RetryBudget:
+    """
+    Cap retries to a fraction of recent requests.
+
+    Every request deposits ``ratio`` tokens (up to ``max_tokens``) and every
+    retry spends one, so during an outage retries add at most ``ratio`` extra
+    load on top of the normal traffic instead of multiplying it.
+    """
+
+    def __init__(self, ratio: float = 0.2, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+        self.exhausted = 0
+
+    def record_request(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        """Take one retry token, or return False when the budget is used up"""
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            self.exhausted += 1
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'tokens': round(self._tokens, 2), 'ratio': self.ratio, 'exhausted': self.exhausted}
+
+_llm_breaker: Optional[CircuitBreaker] = None
+_llm_retry_budget: Optional[RetryBudget] = None
+_llm_lock = threading.Lock()
+
+def get_llm_breaker() -> CircuitBreaker:
+    """Process-wide circuit breaker around OpenAI calls, configured from the app config"""
+    global _llm_breaker
+    if _llm_breaker is None:
+        config = current_app.config
+        with _llm_lock:
+            if _llm_breaker is None:
+                _llm_breaker = CircuitBreaker(
+                    'openai',
+                    failure_threshold=int(config.get('LLM_BREAKER_FAILURE_THRESHOLD', 5)),
+                    recovery_timeout=float(config.get('LLM_BREAKER_RECOVERY_SECONDS', 30)),
+                    half_open_max_calls=int(config.get('LLM_BREAKER_HALF_OPEN_CALLS', 1))
+                )
+    return _llm_breaker
+
+def get_llm_retry_budget() -> RetryBudget:
+    """Process-wide retry budget for OpenAI calls, configured from the app config"""
+    global _llm_retry_budget
+    if _llm_retry_budget is None:
+        config = current_app.config
+        with _llm_lock:
+            if _llm_retry_budget is None:
+                _llm_retry_budget = RetryBudget(ratio=float(config.get('LLM_RETRY_BUDGET_RATIO', 0.2)))
+    return _llm_retry_budget
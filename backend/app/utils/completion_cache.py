@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from flask import current_app
+from app.utils.cache import LRUCache
+
+class CompletionCache:
+    """
+    Two-tier cache of LLM completions.
+
+    The first tier is an in-process LRU; the second a SQLite file shared by
+    every gunicorn worker on the host. Entries expire after ``ttl`` seconds,
+    the file is trimmed to ``max_rows`` (oldest first), and entries written
+    for an older knowledge base version are purged as soon as a new version
+    is seen. Failures in the SQLite tier are logged and treated as misses.
+    """
+
+    def __init__(self, path: Optional[str] = None, memory_size: int = 256, ttl: float = 3600,
+                 max_rows: int = 5000):
+        """
+        Args:
+            path (str): SQLite file for the shared tier; None keeps the cache in-process only
+            memory_size (int): Entries kept in the in-process tier
+            ttl (float): Seconds an entry stays valid
+            max_rows (int): Maximum rows kept in the shared tier
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.memory = LRUCache(max_size=memory_size, ttl=ttl)
+        self.shared_hits = 0
+        self.stores = 0
+        self._kb_version: Optional[str] = None
+        self._lock = threading.Lock()
+        if path:
+            self._init_db()
+
+    @staticmethod
+    def make_key(messages: List[Dict[str, str]], params: Dict[str, Any], kb_version: Optional[str] = None) -> str:
+        """Hash of the fully assembled messages, model parameters and knowledge base version"""
+        payload = json.dumps({'messages': messages, 'params': params, 'kb_version': kb_version},
+                             sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Connection for one operation, closed on exit (sqlite3's own context manager doesn't close)"""
+        # Short busy timeout: a cache should never make a request wait on another worker
+        conn = sqlite3.connect(self.path, timeout=0.5, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS completions ('
+                    'key TEXT PRIMARY KEY, value TEXT NOT NULL, kb_version TEXT, created_at REAL NOT NULL)'
+                )
+                conn.execute('CREATE INDEX IF NOT EXISTS ix_completions_created_at ON completions (created_at)')
+        except sqlite3.Error as e:
+            logging.warning(f"LLM completion cache file unavailable ({self.path}), using memory only: {str(e)}")
+            self.path = None
+
+    def _check_version(self, kb_version: Optional[str]):
+        """Purge entries of other knowledge base versions the first time a new version shows up"""
+        if kb_version is None or kb_version == self._kb_version:
+            return
+        with self._lock:
+            if kb_version == self._kb_version:
+                return
+            previous, self._kb_version = self._kb_version, kb_version
+        self.memory.clear()
+        if self.path:
+            try:
+                with self._connect() as conn:
+                    conn.execute('DELETE FROM completions WHERE kb_version IS NOT NULL AND kb_version != ?', (kb_version,))
+            except sqlite3.Error as e:
+                logging.warning(f"LLM completion cache purge failed: {str(e)}")
+        if previous is not None:
+            logging.info(f"LLM completion cache invalidated: knowledge base {previous} -> {kb_version}")
+
+    def get(self, key: str, kb_version: Optional[str] = None) -> Optional[str]:
+        """Cached completion for a key, checking the in-process tier first"""
+        self._check_version(kb_version)
+        value = self.memory.get(key)
+        if value is not None or not self.path:
+            return value
+
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    'SELECT value FROM completions WHERE key = ? AND created_at > ?',
+                    (key, time.time() - self.ttl)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logging.warning(f"LLM completion cache read failed: {str(e)}")
+            return None
+
+        if row is None:
+            return None
+        self.shared_hits += 1
+        self.memory.set(key, row[0])
+        return row[0]
+
+    def set(self, key: str, value: str, kb_version: Optional[str] = None):
+        """Store a completion in both tiers"""
+        if not value:
+            return
+        self._check_version(kb_version)
+        self.memory.set(key, value)
+        self.stores += 1
+        if not self.path:
+            return
+
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO completions (key, value, kb_version, created_at) VALUES (?, ?, ?, ?)',
+                    (key, value, kb_version, time.time())
+                )
+        except sqlite3.Error as e:
+            logging.warning(f"LLM completion cache write failed: {str(e)}")
+            return
+
+        # Evicting on every write would turn each store into a table scan
+        if self.stores % 50 == 1:
+            self.evict()
+
+    def evict(self):
+        """Delete expired rows and trim the shared tier to max_rows, oldest first"""
+        if not self.path:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM completions WHERE created_at <= ?', (time.time() - self.ttl,))
+                conn.execute(
+                    'DELETE FROM completions WHERE key IN ('
+                    'SELECT key FROM completions ORDER BY created_at DESC LIMIT -1 OFFSET ?)',
+                    (self.max_rows,)
+                )
+        except sqlite3.Error as e:
+            logging.warning(f"LLM completion cache eviction failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for debug endpoints"""
+        stats = {
+            'memory': self.memory.stats(),
+            'shared_path': self.path,
+            'shared_hits': self.shared_hits,
+            'stores': self.stores,
+            'ttl': self.ttl,
+            'kb_version': self._kb_version
+        }
+        if self.path:
+            try:
+                with self._connect() as conn:
+                    stats['shared_rows'] = conn.execute('SELECT COUNT(*) FROM completions').fetchone()[0]
+            except sqlite3.Error:
+                stats['shared_rows'] = None
+        return stats
+
+_completion_cache: Optional[CompletionCache] = None
+_completion_cache_lock = threading.Lock()
+
+def get_completion_cache() -> Optional[CompletionCache]:
+    """Process-wide completion cache configured from the app config (None when disabled)"""
+    global _completion_cache
+    if _completion_cache is None:
+        config = current_app.config
+        if not config.get('LLM_CACHE_ENABLED', True):
+            return None
+        with _completion_cache_lock:
+            if _completion_cache is None:
+                _completion_cache = CompletionCache(
+                    path=config.get('LLM_CACHE_PATH') or None,
+                    memory_size=int(config.get('LLM_CACHE_MEMORY_SIZE', 256)),
+                    ttl=float(config.get('LLM_CACHE_TTL', 3600)),
+                    max_rows=int(config.get('LLM_CACHE_MAX_ROWS', 5000))
+                )
+    return _completion_cache
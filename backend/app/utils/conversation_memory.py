@@ -0,0 +1,43 @@
+import logging
+from flask import current_app
+from app.models import ChatMessage
+
+def unsummarized_messages(chat_session):
+    """Query for the session's messages that are not folded into its summary yet"""
+    query = ChatMessage.query.filter(ChatMessage.session_id == chat_session.id)
+    if chat_session.summary_message_id:
+        query = query.filter(ChatMessage.id > chat_session.summary_message_id)
+    return query
+
+def summarize_if_needed(chat_session, llm_client):
+    """
+    Fold older messages into the session's rolling summary once the
+    unsummarized part of the conversation passes CHAT_SUMMARY_THRESHOLD
+    messages. Only messages after the summary watermark are sent to the
+    LLM, and the newest CHAT_SUMMARY_KEEP_RECENT stay raw. The caller
+    commits.
+
+    Returns:
+        bool: True if the summary was updated
+    """
+    threshold = int(current_app.config.get('CHAT_SUMMARY_THRESHOLD', 12))
+    keep_recent = int(current_app.config.get('CHAT_SUMMARY_KEEP_RECENT', 6))
+    if threshold <= 0:
+        return False
+
+    pending = unsummarized_messages(chat_session).count()
+    if pending <= threshold:
+        return False
+
+    messages = unsummarized_messages(chat_session).order_by(ChatMessage.id).limit(pending - keep_recent).all()
+    summary = llm_client.summarize_conversation(chat_session.summary, [
+        {'role': 'user' if message.message_type == 'user' else 'assistant', 'content': message.content}
+        for message in messages
+    ])
+    if not summary:
+        return False
+
+    chat_session.summary = summary
+    chat_session.summary_message_id = messages[-1].id
+    logging.info(f"Folded {len(messages)} messages into the summary of session {chat_session.session_id}")
+    return True
@@ -0,0 +1,92 @@
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict
+from flask import current_app
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from app import db
+
+# App extension holding the engine of the optional pool of query-only connections
+READ_ENGINE = 'sqlite_read_engine'
+
+def sqlite_pragmas(config) -> Dict[str, Any]:
+    """Connection pragmas from the app config, in the order they are applied"""
+    return {
+        # First, so that switching the journal mode waits for other connections instead of failing
+        'busy_timeout': int(config.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        # Only takes effect on a new database file (or after a full VACUUM), see app/utils/retention.py
+        'auto_vacuum': config.get('SQLITE_AUTO_VACUUM', 'INCREMENTAL'),
+        'journal_mode': config.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': config.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'mmap_size': int(config.get('SQLITE_MMAP_SIZE', 268435456)),
+        'cache_size': int(config.get('SQLITE_CACHE_SIZE', -8000))
+    }
+
+def is_file_sqlite(uri) -> bool:
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+def apply_sqlite_profile(engine, pragmas: Dict[str, Any], query_only: bool = False):
+    """Set the pragmas on every new connection of a SQLite engine"""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+            if query_only:
+                cursor.execute('PRAGMA query_only=ON')
+        finally:
+            cursor.close()
+
+def configure_engines(app):
+    """
+    Install the SQLite profile on the app's engine and create the read pool
+    if it is enabled; call in an app context after ``db.init_app``.
+
+    The read pool opens ordinary connections to the same SQLite file (a
+    ``mode=ro`` connection cannot open a WAL database that has no shared
+    memory file yet) and makes them query-only.
+    """
+    config = app.config
+    tuned = config.get('SQLITE_TUNING_ENABLED', True)
+    pragmas = sqlite_pragmas(config) if tuned else {}
+    apply_sqlite_profile(db.engine, pragmas)
+    if tuned and db.engine.dialect.name == 'sqlite':
+        logging.info(f"SQLite profile: {', '.join(f'{name}={value}' for name, value in pragmas.items())}")
+
+    if config.get('SQLITE_READ_POOL_ENABLED', False) and is_file_sqlite(db.engine.url):
+        options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+        options['pool_size'] = int(config.get('SQLITE_READ_POOL_SIZE', 10))
+        read_engine = create_engine(db.engine.url, **options)
+        apply_sqlite_profile(read_engine, pragmas, query_only=True)
+        app.extensions[READ_ENGINE] = read_engine
+
+@contextmanager
+def read_session():
+    """
+    Session for read-only queries: on the read pool when it is configured,
+    otherwise the request's own session. Objects loaded from the read pool
+    are detached once the block ends.
+    """
+    engine = current_app.extensions.get(READ_ENGINE)
+    if engine is None:
+        yield db.session
+        return
+    session = Session(bind=engine)
+    try:
+        yield session
+    finally:
+        session.close()
+
+def database_size():
+    """Bytes used by the SQLite file (pages in use, excluding free pages), or None for other databases"""
+    if db.engine.dialect.name != 'sqlite':
+        return None
+    page_count = db.session.execute(text('PRAGMA page_count')).scalar()
+    free_pages = db.session.execute(text('PRAGMA freelist_count')).scalar()
+    return (page_count - free_pages) * db.session.execute(text('PRAGMA page_size')).scalar()
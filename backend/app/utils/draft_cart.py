@@ -0,0 +1,220 @@
+import json
+import logging
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+from flask import current_app
+from app.models import ChatMessage
+from app.utils.keyword_matcher import KeywordMatcher
+from app.utils.menu_catalog import MenuCatalog
+from app.utils.order_extractor import extract_order
+
+# Menu categories that can be ordered on their own (combos are not)
+ORDER_CATEGORIES = ('burgers', 'sides', 'drinks', 'desserts')
+
+# Extractor issues that say nothing about the order itself (questions about the menu)
+BENIGN_ISSUES = {'question'}
+
+# Customizations recognised by the keyword fallback, in the order they are reported
+CUSTOMIZATION_KEYWORDS = {
+    'no onions': ['no onions', 'without onions'],
+    'extra cheese': ['extra cheese'],
+    'no tomato': ['no tomato', 'without tomato']
+}
+
+def empty_cart() -> Dict[str, Any]:
+    return {
+        'items': [],
+        'total_amount': 0.0,
+        'analysis_method': None,
+        'confidence': 0.0,
+        'reasoning': '',
+        'unavailable_items': []
+    }
+
+def load_cart(chat_session) -> Dict[str, Any]:
+    """The session's draft cart, or an empty one"""
+    if not chat_session.draft_cart:
+        return empty_cart()
+    try:
+        return {**empty_cart(), **json.loads(chat_session.draft_cart)}
+    except ValueError:
+        logging.warning(f"Discarding unreadable draft cart of session {chat_session.session_id}")
+        return empty_cart()
+
+def clear_cart(chat_session):
+    """Empty the cart once it became an order; the watermark stays so those messages are not re-read"""
+    chat_session.draft_cart = None
+
+def pending_user_messages(chat_session):
+    """Query for the user messages the draft cart does not reflect yet"""
+    # Before the first analysis, messages folded into the rolling summary are represented by the summary
+    watermark = chat_session.cart_message_id
+    if watermark is None:
+        watermark = chat_session.summary_message_id
+    query = ChatMessage.query.filter_by(session_id=chat_session.id, message_type='user')
+    if watermark:
+        query = query.filter(ChatMessage.id > watermark)
+    return query.order_by(ChatMessage.id)
+
+def render_cart(items: List[Dict[str, Any]]) -> str:
+    """Cart items as one line, e.g. '2x Classic PerfBurger (no onions); 1x Fresh Lemonade'"""
+    return '; '.join(
+        f"{item['quantity']}x {item['name']}" + (f" ({', '.join(item['customizations'])})" if item.get('customizations') else '')
+        for item in items
+    )
+
+def validate_order_items(items, catalog: MenuCatalog) -> Tuple[List[Dict[str, Any]], float]:
+    """Map extracted items onto orderable menu items, using menu names and prices"""
+    detected_items = []
+    total_amount = 0.0
+    for item in items:
+        # Validate that the item exists in our menu and prices match
+        menu_item = catalog.lookup(str(item.get('name', '')))
+        if menu_item is None or menu_item.category not in ORDER_CATEGORIES:
+            continue
+
+        quantity = max(1, int(item.get('quantity', 1)))  # Ensure positive quantity
+        detected_items.append({
+            "name": menu_item.name,  # Use exact menu name
+            "price": menu_item.price,  # Use actual menu price for security
+            "quantity": quantity,
+            "customizations": item.get('customizations', []),
+            "category": menu_item.category
+        })
+        total_amount += menu_item.price * quantity
+    return detected_items, total_amount
+
+def merge_items(items: List[Dict[str, Any]], new_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Add new items to a cart; identical lines (same item and customizations) add up"""
+    merged = [dict(item) for item in items]
+    for new_item in new_items:
+        for item in merged:
+            if item['name'] == new_item['name'] and item.get('customizations', []) == new_item.get('customizations', []):
+                item['quantity'] += new_item['quantity']
+                break
+        else:
+            merged.append(dict(new_item))
+    return merged
+
+def update_cart(chat_session, catalog: MenuCatalog, llm_client) -> Dict[str, Any]:
+    """
+    Bring the session's draft cart up to date with the user messages added
+    since its watermark and store it on the session. The caller commits.
+
+    Only the new messages are analyzed. Clear-cut additions are merged by the
+    rule-based extractor and small talk leaves the cart alone; anything else
+    goes to the LLM together with the current cart, and the LLM answers with
+    the whole updated order. Small talk doesn't move the watermark, so it is
+    read again with the next message that may refer to it.
+
+    Returns:
+        dict: The updated cart
+    """
+    cart = load_cart(chat_session)
+    messages = pending_user_messages(chat_session).all()
+    if not messages:
+        return cart
+
+    delta_text = " ".join(message.content for message in messages)
+    # The summary is LLM prose, so the rules do not apply to it
+    paraphrased = chat_session.cart_message_id is None and bool(chat_session.summary)
+    if paraphrased:
+        delta_text = f"Earlier in the conversation: {chat_session.summary}\n{delta_text}"
+
+    config = current_app.config
+    rules_enabled = config.get('ORDER_EXTRACTOR_ENABLED', True) and not paraphrased
+    local_result = extract_order(delta_text, catalog, ORDER_CATEGORIES)
+    local_items, _ = validate_order_items(local_result['items'], catalog)
+    repeated = {item['name'] for item in cart['items']} & {item['name'] for item in local_items}
+
+    if rules_enabled and local_items and not repeated and \
+            local_result['confidence'] >= float(config.get('ORDER_EXTRACTOR_MIN_CONFIDENCE', 0.8)):
+        logging.info(f"Cart of session {chat_session.session_id} updated without the LLM (confidence {local_result['confidence']})")
+        result, method = local_result, 'rules'
+        items = merge_items(cart['items'], local_items)
+    elif rules_enabled and not local_items and not set(local_result['issues']) - BENIGN_ISSUES:
+        # Nothing order-related in the new messages. They stay pending, so a later
+        # "I'll take two of those" is analyzed together with the question it refers to
+        logging.info(f"Cart of session {chat_session.session_id} unchanged, {len(messages)} message(s) kept pending")
+        return cart
+    else:
+        conversation_text = delta_text
+        if cart['items']:
+            conversation_text = f"Order so far: {render_cart(cart['items'])}\nNew messages: {delta_text}"
+        try:
+            result = llm_client.analyze_conversation_for_order(conversation_text, catalog)
+        except Exception as llm_error:
+            logging.warning(f"LLM analysis failed: {str(llm_error)}, falling back to local extraction")
+            result = {"items": [], "confidence": 0.0, "reasoning": f"LLM failed: {str(llm_error)}"}
+
+        llm_items, _ = validate_order_items(result.get('items') or [], catalog)
+        if llm_items:
+            # The LLM saw the cart, so its answer replaces it
+            method, items = 'LLM', llm_items
+        elif local_items:
+            logging.info("LLM found no items, falling back to rule-based extraction")
+            method, items = 'rules', merge_items(cart['items'], local_items)
+        elif not cart['items']:
+            logging.info("No items found, falling back to simple keyword matching")
+            items, _ = _simple_keyword_extraction(delta_text, catalog)
+            method = 'keyword_matching' if items else cart['analysis_method']
+        else:
+            method, items = cart['analysis_method'], cart['items']
+
+    items, total_amount = validate_order_items(items, catalog)
+    cart = {
+        'items': items,
+        'total_amount': round(total_amount, 2),
+        'analysis_method': method,
+        'confidence': result.get('confidence', 0.0),
+        'reasoning': result.get('reasoning', ''),
+        'unavailable_items': list(dict.fromkeys(cart['unavailable_items'] + list(result.get('unavailable_items', []))))
+    }
+    chat_session.draft_cart = json.dumps(cart)
+    chat_session.cart_message_id = messages[-1].id
+    return cart
+
+@lru_cache(maxsize=8)
+def _menu_keyword_matcher(item_names):
+    """Matcher for item names (any word of a name) and customizations, built once per menu"""
+    groups = {name: name.lower().split() for name in item_names}
+    groups.update({f'customization:{label}': keywords for label, keywords in CUSTOMIZATION_KEYWORDS.items()})
+    return KeywordMatcher(groups)
+
+def _simple_keyword_extraction(conversation_text, catalog):
+    """Fallback simple keyword matching for order extraction"""
+    detected_items = []
+    total_amount = 0.0
+
+    menu_items = catalog.in_categories(ORDER_CATEGORIES)
+    item_names = tuple(item.name for item in menu_items)
+
+    # One pass over the conversation finds every mentioned item and customization
+    matches = _menu_keyword_matcher(item_names).match(conversation_text)
+    if not matches:
+        return detected_items, total_amount
+
+    # Try to extract quantity (default to 1)
+    quantity = 1
+    for word in conversation_text.split():
+        if word.isdigit() and int(word) <= 10:  # Reasonable quantity limit
+            quantity = int(word)
+            break
+
+    # Extract customizations (simple approach)
+    customizations = [label for label in CUSTOMIZATION_KEYWORDS if f'customization:{label}' in matches]
+
+    # Report mentioned items in menu order
+    for item in menu_items:
+        if item.name in matches:
+            detected_items.append({
+                "name": item.name,
+                "price": item.price,
+                "quantity": quantity,
+                "customizations": list(customizations),
+                "category": item.category
+            })
+
+            total_amount += item.price * quantity
+
+    return detected_items, total_amount
@@ -0,0 +1,110 @@
+import os
+import re
+import zlib
+import logging
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from app.utils.bm25 import top_k
+
+EMBEDDINGS_FILENAME = 'embeddings.npz'
+
+_WORD_RE = re.compile(r"[a-z0-9ñáéíóúü]+")
+
+class HashedNgramEmbedder:
+    """
+    Local, network-free text embedding.
+
+    Words and their character n-grams are hashed (signed feature hashing
+    with a stable CRC32) into a fixed number of dimensions and the vector is
+    L2-normalised, so cosine similarity is a plain dot product.
+    """
+
+    def __init__(self, dim: int = 1024, ngram_sizes: Sequence[int] = (3, 4, 5)):
+        self.dim = dim
+        self.ngram_sizes = tuple(ngram_sizes)
+
+    @property
+    def signature(self) -> str:
+        """Identifies the embedding parameters so persisted vectors can be validated"""
+        return f"hashed-ngram:{self.dim}:{','.join(str(n) for n in self.ngram_sizes)}"
+
+    def _features(self, text: str) -> List[str]:
+        features = []
+        for word in _WORD_RE.findall(text.lower()):
+            features.append(word)
+            padded = f" {word} "
+            for size in self.ngram_sizes:
+                features.extend(padded[i:i + size] for i in range(len(padded) - size + 1))
+        return features
+
+    def embed(self, text: str) -> np.ndarray:
+        """Normalised vector for one text (all zeros for text without words)"""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            hashed = zlib.crc32(feature.encode('utf-8'))
+            vector[hashed % self.dim] += 1.0 if hashed & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_many(self, texts: Sequence[str]) -> np.ndarray:
+        """Matrix with one normalised row per text"""
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.vstack([self.embed(text) for text in texts])
+
+class VectorIndex:
+    """Cosine similarity search over a precomputed normalised entry matrix"""
+
+    def __init__(self, matrix: np.ndarray, embedder: HashedNgramEmbedder, min_similarity: float = 0.1):
+        self.matrix = matrix
+        self.embedder = embedder
+        self.min_similarity = min_similarity
+
+    def top_k(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Return up to k (entry id, similarity) pairs, best first"""
+        if not len(self.matrix):
+            return []
+        return top_k(self.matrix @ self.embedder.embed(query), k, self.min_similarity)
+
+def build_vector_index(keys: Sequence[str], texts: Sequence[str], version: str,
+                       cache_dir: Optional[str] = None,
+                       embedder: Optional[HashedNgramEmbedder] = None) -> VectorIndex:
+    """
+    Build the entry matrix, reusing vectors persisted next to the knowledge base files
+
+    Args:
+        keys (list): Stable entry keys, in entry id order
+        texts (list): Text to embed for each entry
+        version (str): Knowledge base snapshot version the vectors belong to
+        cache_dir (str): Directory holding embeddings.npz; None disables persistence
+    """
+    embedder = embedder or HashedNgramEmbedder()
+    path = os.path.join(cache_dir, EMBEDDINGS_FILENAME) if cache_dir else None
+
+    if path and os.path.exists(path):
+        try:
+            with np.load(path, allow_pickle=False) as stored:
+                if (str(stored['version']) == version and str(stored['embedder']) == embedder.signature
+                        and list(stored['keys']) == list(keys)):
+                    logging.info(f"Loaded {len(keys)} knowledge base vectors from {path}")
+                    return VectorIndex(stored['matrix'], embedder)
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable knowledge base vectors {path}: {str(e)}")
+
+    matrix = embedder.embed_many(texts)
+
+    if path:
+        # Write to a temporary file first so other workers never read a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, matrix=matrix, keys=np.array(list(keys), dtype=str),
+                         version=np.array(version), embedder=np.array(embedder.signature))
+            os.replace(tmp_path, path)
+            logging.info(f"Saved {len(keys)} knowledge base vectors to {path}")
+        except OSError as e:
+            logging.warning(f"Could not persist knowledge base vectors to {path}: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    return VectorIndex(matrix, embedder)
@@ -0,0 +1,133 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from flask import current_app
+
+class SessionHistory(NamedTuple):
+    """Snapshot of a session's newest messages"""
+    last_message_id: Optional[int]  # ChatSession.last_message_id the snapshot corresponds to
+    complete: bool  # True if the snapshot holds every message of the session
+    messages: Tuple[Tuple[int, str, str], ...]  # (id, role, content), oldest first
+
+class HistoryCache:
+    """
+    In-process ring buffers of the newest chat messages per session.
+
+    A snapshot is only served while its ``last_message_id`` still matches
+    the session row, so messages written by another worker make it a miss
+    rather than a stale answer. ``save_message`` writes through: it only
+    extends a snapshot after its conditional update proved the snapshot was
+    current when the message was inserted, and discards it otherwise.
+    Sessions are evicted least recently used first.
+    """
+
+    def __init__(self, max_sessions: int = 1024, size: int = 20):
+        """
+        Args:
+            max_sessions (int): Sessions kept; the least recently used is evicted
+            size (int): Newest messages kept per session
+        """
+        self.max_sessions = max_sessions
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.appends = 0
+        self.evictions = 0
+        self._data: "OrderedDict[int, SessionHistory]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def peek(self, session_pk: int) -> Optional[SessionHistory]:
+        """The session's snapshot whether or not it is current, without counting a hit"""
+        with self._lock:
+            return self._data.get(session_pk)
+
+    def get(self, session_pk: int, last_message_id: Optional[int], limit: int,
+            after_id: Optional[int] = None) -> Optional[List[Dict[str, str]]]:
+        """
+        The newest ``limit`` messages after ``after_id`` as chat history, or
+        None if the snapshot is missing, outdated or does not reach back far enough
+        """
+        with self._lock:
+            snapshot = self._data.get(session_pk)
+            if snapshot is not None and snapshot.last_message_id == last_message_id:
+                messages = [message for message in snapshot.messages if not after_id or message[0] > after_id]
+                reaches_back = snapshot.complete or (after_id and snapshot.messages and snapshot.messages[0][0] <= after_id)
+                if len(messages) >= limit or reaches_back:
+                    self._data.move_to_end(session_pk)
+                    self.hits += 1
+                    return [{'role': role, 'content': content} for _, role, content in messages[-limit:]]
+            self.misses += 1
+            return None
+
+    def store(self, session_pk: int, last_message_id: Optional[int], messages: List[Tuple[int, str, str]],
+              complete: bool):
+        """Cache the session's newest messages (oldest first) as read from the database"""
+        if self.max_sessions <= 0:
+            return
+        snapshot = SessionHistory(last_message_id, complete and len(messages) <= self.size,
+                                  tuple(messages[-self.size:]))
+        with self._lock:
+            self._set(session_pk, snapshot)
+
+    def append(self, session_pk: int, previous_id: Optional[int], message_id: int, role: str, content: str):
+        """Extend the session's snapshot if it still ends at ``previous_id``, else drop it"""
+        with self._lock:
+            snapshot = self._data.get(session_pk)
+            if snapshot is None:
+                return
+            if snapshot.last_message_id != previous_id:
+                del self._data[session_pk]
+                return
+            messages = snapshot.messages + ((message_id, role, content),)
+            complete = snapshot.complete and len(messages) <= self.size
+            self._set(session_pk, SessionHistory(message_id, complete, messages[-self.size:]))
+            self.appends += 1
+
+    def discard(self, session_pk: int):
+        with self._lock:
+            self._data.pop(session_pk, None)
+
+    def clear(self):
+        """Drop every snapshot (counters are kept)"""
+        with self._lock:
+            self._data.clear()
+
+    def _set(self, session_pk: int, snapshot: SessionHistory):
+        self._data[session_pk] = snapshot
+        self._data.move_to_end(session_pk)
+        while len(self._data) > self.max_sessions:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for debug endpoints"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'sessions': len(self._data),
+                'max_sessions': self.max_sessions,
+                'messages_per_session': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'appends': self.appends,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0
+            }
+
+_history_cache: Optional[HistoryCache] = None
+_history_cache_lock = threading.Lock()
+
+def get_history_cache() -> Optional[HistoryCache]:
+    """Process-wide chat history cache configured from the app config (None when disabled)"""
+    global _history_cache
+    if _history_cache is None:
+        config = current_app.config
+        if int(config.get('HISTORY_CACHE_SESSIONS', 1024)) <= 0:
+            return None
+        with _history_cache_lock:
+            if _history_cache is None:
+                _history_cache = HistoryCache(
+                    max_sessions=int(config.get('HISTORY_CACHE_SESSIONS', 1024)),
+                    size=int(config.get('HISTORY_CACHE_MESSAGES', 20))
+                )
+    return _history_cache
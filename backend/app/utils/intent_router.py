@@ -0,0 +1,162 @@
+import re
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+from app.models import Order
+from app.utils.database import read_session
+from app.utils.knowledge_base import KnowledgeBase, normalize_query
+
+# Order IDs as generated by the orders blueprint, e.g. PB123456
+ORDER_ID_RE = re.compile(r'\b(pb\d{6})\b', re.IGNORECASE)
+
+# Whole-message order lookups such as "PB123456", "check order PB123456" or
+# "where is my order PB123456?"; the order ID is replaced by <id> first.
+# Complaints, refunds or changes that mention an order ID go to the LLM.
+_ORDER_STATUS_RE = re.compile(
+    r"^(?:(?:hi|hello|hey|hola)[,!. ]+)?"
+    r"¿?(?:please |can you |could you |can i |could i )?"
+    r"(?:(?:check|track|look ?up|find|show(?: me)?|get|status(?: of| for)?|order status(?: of| for)?|"
+    r"where(?: is|'s)|how(?: is|'s)|what(?: is|'s) the status (?:of|on|for)|any (?:news|updates?) (?:on|for|about)|"
+    r"dónde está|donde esta|estado de)\s+)?"
+    r"(?:the |my |mi |el )?"
+    r"(?:order |pedido )?(?:id |number |#)?#?"
+    r"<id>"
+    r"(?: order)?(?: status| estado)?(?: please)?[?.!\s]*$"
+)
+
+# Whole-message listing requests such as "menu", "show me the full menu please",
+# "what drinks do you have?" or "list all burgers". Anything more specific
+# ("is the menu gluten free?") is left to the LLM.
+_LISTING_RE = re.compile(
+    r"^(?:(?:hi|hello|hey|hola)[,!. ]+)?"
+    r"(?:please |can i |could i |can you |could you |i want to |i'd like to )?"
+    r"(?:see |show(?: me)? |get |view |list |send(?: me)? |what's on |what is on |what are |what |which )?"
+    r"(?:the |your |all |all the |all your |all of your )?"
+    r"(?:full |whole |complete |entire )?"
+    r"(?P<target>menu|burgers?|sides?|drinks?|beverages?|combos?)"
+    r"(?: options| list)?"
+    r"(?: do you (?:have|offer|serve|sell))?"
+    r"(?: please)?[?.!\s]*$"
+)
+
+_LISTING_TARGETS = {
+    'menu': 'full_menu',
+    'burger': 'burgers',
+    'side': 'sides',
+    'drink': 'drinks',
+    'beverage': 'drinks',
+    'combo': 'combos'
+}
+
+# Menu sections of the full menu, in display order
+MENU_SECTIONS = (('burgers', '🍔 Burgers'), ('sides', '🍟 Sides'), ('drinks', '🥤 Drinks'), ('combos', '🎁 Combos'))
+
+def match_intent(user_message: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Classify a message into a deterministic intent
+
+    Returns:
+        tuple: ('order_status', order_id), (listing name, None) or (None, None)
+    """
+    query = normalize_query(user_message)
+    order_match = ORDER_ID_RE.search(query)
+    if order_match:
+        if _ORDER_STATUS_RE.match(ORDER_ID_RE.sub('<id>', query, count=1)):
+            return 'order_status', order_match.group(1).upper()
+        return None, None
+
+    listing = _LISTING_RE.match(query)
+    if listing:
+        return _LISTING_TARGETS[listing.group('target').rstrip('s')], None
+
+    return None, None
+
+def render_menu_section(items) -> str:
+    """Render menu items as a compact chat-friendly list"""
+    lines = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        lines.append(f"• **{item.get('name', 'Unknown Item')}** - ${item.get('price', 'N/A')}")
+        if item.get('description'):
+            lines.append(f"  {item['description']}")
+    return '\n'.join(lines)
+
+def render_listing_templates(menu_data: Dict) -> Dict[str, str]:
+    """Pre-render the reply for every listing intent from the menu data"""
+    sections = {
+        name: render_menu_section(menu_data.get(name, []) or [])
+        for name, _ in MENU_SECTIONS
+    }
+    full_menu = '\n\n'.join(
+        f"**{title}**\n{sections[name]}" for name, title in MENU_SECTIONS if sections[name]
+    )
+    templates = {
+        'full_menu': f"Here's our full menu:\n\n{full_menu}\n\nWhat can I get started for you?",
+    }
+    for name, title in MENU_SECTIONS:
+        if sections[name]:
+            templates[name] = f"Here are our {title.split(' ', 1)[1].lower()}:\n\n{sections[name]}\n\nWould you like to add any of these to your order?"
+        else:
+            templates[name] = f"Sorry, we don't have any {name} on the menu right now."
+    return templates
+
+def render_order_status(order_id: str, order_data: Optional[Dict]) -> str:
+    """Render an order lookup result (as returned by Order.to_status_dict) as a chat reply"""
+    if order_data is None:
+        return (f"I couldn't find order {order_id} on your account. "
+                f"Please double-check the order ID (format: PB######) and try again.")
+
+    lines = [f"📦 **Order {order_data['id']}**", f"Status: {order_data['status_description']}"]
+    for item in order_data['items']:
+        if isinstance(item, dict):
+            lines.append(f"• {item.get('quantity', 1)}x {item.get('name', 'Item')}")
+    lines.append(f"Total: ${order_data['total_amount']:.2f}")
+    if order_data.get('estimated_delivery') and order_data['status'] not in ('delivered', 'cancelled'):
+        lines.append(f"Estimated delivery: {order_data['estimated_delivery'][:16].replace('T', ' ')} UTC")
+    return '\n'.join(lines)
+
+class IntentRouter:
+    """
+    Answer deterministic intents without the LLM.
+
+    Full menu, drinks and category listings are served from templates
+    pre-rendered once per knowledge base version; order lookups
+    ("check order PB123456") are answered from the same lookup as
+    /orders/lookup/<order_id>.
+    """
+
+    def __init__(self, knowledge_base: KnowledgeBase):
+        self.knowledge_base = knowledge_base
+        self._templates: Tuple[Optional[str], Dict[str, str]] = (None, {})
+        self._lock = threading.Lock()
+
+    def _listing_templates(self) -> Dict[str, str]:
+        catalog = self.knowledge_base.catalog  # Loads the knowledge base and picks up reloads
+        rendered_version, templates = self._templates
+        if rendered_version != catalog.version or not templates:
+            with self._lock:
+                rendered_version, templates = self._templates
+                if rendered_version != catalog.version or not templates:
+                    templates = render_listing_templates(catalog.menu_data)
+                    self._templates = (catalog.version, templates)
+        return templates
+
+    def route(self, user_message: str, user_id) -> Optional[Tuple[str, str]]:
+        """
+        Return (intent, reply) for a deterministic intent, or None to use the LLM
+        """
+        intent, order_id = match_intent(user_message)
+        if intent is None:
+            return None
+
+        if intent == 'order_status':
+            with read_session() as session:
+                order = session.query(Order).filter_by(id=order_id, user_id=user_id).first()
+                order_data = order.to_status_dict() if order else None
+            reply = render_order_status(order_id, order_data)
+        else:
+            reply = self._listing_templates()[intent]
+
+        logging.info(f"Intent router answered '{intent}' without the LLM")
+        return intent, reply
@@ -0,0 +1,45 @@
+import re
+from typing import Dict, FrozenSet, Iterable, Set
+
+class KeywordMatcher:
+    """
+    Find which keyword groups occur in a text in a single pass.
+
+    All patterns are compiled into one lookahead alternation, longest first,
+    so every start position is examined once and overlapping keywords from
+    different groups (e.g. 'extra cheese' and 'cheese') are all reported.
+    Matching is case-insensitive substring matching, like ``keyword in text``.
+    """
+
+    def __init__(self, groups: Dict[str, Iterable[str]]):
+        """
+        Args:
+            groups (dict): Group name -> keywords; a keyword may belong to several groups
+        """
+        pattern_groups: Dict[str, Set[str]] = {}
+        for group, patterns in groups.items():
+            for pattern in patterns:
+                if pattern:
+                    pattern_groups.setdefault(pattern.lower(), set()).add(group)
+
+        # Only the longest keyword at a position is reported, and every shorter
+        # keyword that is a prefix of it matches there too
+        self._groups: Dict[str, FrozenSet[str]] = {}
+        for pattern in pattern_groups:
+            implied = set()
+            for other, other_groups in pattern_groups.items():
+                if pattern.startswith(other):
+                    implied |= other_groups
+            self._groups[pattern] = frozenset(implied)
+
+        alternation = '|'.join(re.escape(pattern) for pattern in sorted(pattern_groups, key=len, reverse=True))
+        self._regex = re.compile(f'(?=({alternation}))') if pattern_groups else None
+
+    def match(self, text: str) -> Set[str]:
+        """Return the names of all groups with at least one keyword in the text"""
+        found: Set[str] = set()
+        if self._regex is None or not text:
+            return found
+        for match in self._regex.finditer(text.lower()):
+            found |= self._groups[match.group(1)]
+        return found
@@ -1,58 +1,441 @@
 import os
+import re
 import json
+import time
+import hashlib
+import threading
 import yaml
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from flask import current_app
 import logging
+from dataclasses import dataclass
+from app.utils.cache import LRUCache
+from app.utils.keyword_matcher import KeywordMatcher
+from app.utils.bm25 import BM25Index, BM25_FIELD_WEIGHTS, weighted_term_frequencies
+from app.utils.embeddings import VectorIndex, build_vector_index
+from app.utils.menu_catalog import MenuCatalog
+
+RANKING_MODES = ('keyword', 'bm25', 'vector')
+
+# Spanish to English term mapping (keep for backwards compatibility)
+SPANISH_TO_ENGLISH = {
+    'bebidas': 'drinks',
+    'hamburguesas': 'burgers',
+    'acompañamientos': 'sides',
+    'papas': 'fries',
+    'malteada': 'milkshake',
+    'gaseosa': 'soda',
+    'refresco': 'soda'
+}
+
+# Common words that would otherwise match almost every entry
+STOP_WORDS = frozenset([
+    'the', 'and', 'are', 'you', 'your', 'for', 'with', 'what', 'whats', 'have',
+    'can', 'how', 'our', 'that', 'this', 'any', 'from', 'there', 'about', 'does'
+])
+
+_TOKEN_RE = re.compile(r"[a-z0-9ñáéíóúü]+")
+_SPANISH_RE = re.compile(r"\b(" + "|".join(SPANISH_TO_ENGLISH) + r")\b")
+
+# Queries that are answered with a whole menu section instead of a search
+LISTING_TRIGGERS = KeywordMatcher({
+    'full_menu': ['menu', 'what\'s on the menu', 'show me the menu', 'see the menu', 'full menu'],
+    'drinks': ['drinks', 'what drinks', 'all drinks', 'beverages', 'drink options']
+})
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a query: lowercased, Spanish terms mapped, whitespace collapsed"""
+    query_lower = ' '.join(query.lower().split())
+    return _SPANISH_RE.sub(lambda match: SPANISH_TO_ENGLISH[match.group(1)], query_lower)
+
+def tokenize(text: str) -> List[str]:
+    """Split text into normalized search terms (Spanish mapped, stop words dropped, plurals folded)"""
+    terms = []
+    for token in _TOKEN_RE.findall(text.lower().replace("'", '')):
+        token = SPANISH_TO_ENGLISH.get(token, token)
+        if len(token) <= 2 or token in STOP_WORDS:  # Skip very short and common words
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+# Menu sections searched by retrieve, with the category label used in results
+SEARCHABLE_MENU_SECTIONS = (('burgers', 'burger'), ('sides', 'sides'), ('drinks', 'drinks'))
+
+def _slug(text: str) -> str:
+    """Lowercase identifier fragment for entry keys"""
+    return '-'.join(_TOKEN_RE.findall(str(text).lower())) or 'entry'
+
+def format_menu_item(item: Dict) -> str:
+    """Format menu item for display"""
+    parts = []
+    
+    if 'name' in item:
+        parts.append(f"**{item['name']}**")
+    
+    if 'price' in item:
+        parts.append(f"Price: ${item['price']}")
+    
+    if 'description' in item:
+        parts.append(f"Description: {item['description']}")
+    
+    if 'ingredients' in item and isinstance(item['ingredients'], list):
+        parts.append(f"Ingredients: {', '.join(item['ingredients'])}")
+    
+    if 'nutritional_info' in item:
+        nutrition = item['nutritional_info']
+        parts.append(f"Calories: {nutrition.get('calories', 'N/A')}")
+    
+    return '\n'.join(parts)
+
+def _menu_term_weights(item: Dict) -> Dict[str, float]:
+    """Weight each term of a menu item by the fields it appears in"""
+    weights: Dict[str, float] = {}
+    
+    def add(text, weight):
+        for term in set(tokenize(text)):
+            weights[term] = weights.get(term, 0.0) + weight
+    
+    add(item.get('name', ''), 2.0)
+    add(item.get('description', ''), 1.5)
+    ingredients = item.get('ingredients', [])
+    if isinstance(ingredients, list):
+        for ingredient in ingredients:
+            add(ingredient, 1.0)
+    add(item.get('category', ''), 1.0)
+    return weights
+
+def _text_term_weights(text: str) -> Dict[str, float]:
+    """Each distinct term of a free-text entry counts once"""
+    return {term: 1.0 for term in tokenize(text)}
+
+@dataclass(frozen=True)
+class KnowledgeEntry:
+    """A single retrievable knowledge base entry with its content pre-rendered"""
+    id: int
+    key: str  # Stable identifier, e.g. 'menu:burgers:classic-perfburger'
+    type: str
+    title: str
+    content: str
+    category: Optional[str] = None
+    
+    def to_result(self, score: float) -> Dict[str, Any]:
+        """Result dict in the shape returned by retrieve"""
+        if self.category is None:
+            return {'key': self.key, 'type': self.type, 'title': self.title, 'content': self.content, 'score': score}
+        return {'key': self.key, 'type': self.type, 'category': self.category, 'title': self.title, 'content': self.content, 'score': score}
+
+class KnowledgeSnapshot:
+    """
+    Immutable compiled view of the knowledge base files.
+    
+    Built once per load: entries are rendered, the inverted index (and the
+    BM25 matrix when enabled) computed, the full-menu and drinks result
+    lists prepared and the menu catalog indexed, so the hot path only looks
+    things up.
+    """
+    
+    def __init__(self, data: Dict[str, Any], ranking: str = 'keyword', version: str = 'default',
+                 cache_dir: Optional[str] = None):
+        """
+        Args:
+            data (dict): Parsed 'menu', 'faqs' and 'policies' files
+            ranking (str): 'keyword', 'bm25' or 'vector'
+            version (str): Content hash of the source files; caches key on it
+            cache_dir (str): Where 'vector' ranking persists entry vectors
+        """
+        if ranking not in RANKING_MODES:
+            logging.warning(f"Unknown knowledge base ranking '{ranking}', using keyword scoring")
+            ranking = 'keyword'
+        self.data = data
+        self.ranking = ranking
+        self.version = version
+        
+        entries: List[KnowledgeEntry] = []
+        postings: Dict[str, Dict[int, float]] = {}
+        bm25_documents = []
+        vector_texts = []
+        
+        def add_entry(key, entry_type, title, content, term_weights, bm25_fields, search_text, category=None):
+            entry = KnowledgeEntry(len(entries), key, entry_type, title, content, category)
+            entries.append(entry)
+            for term, weight in term_weights.items():
+                postings.setdefault(term, {})[entry.id] = weight
+            bm25_documents.append(weighted_term_frequencies(bm25_fields, BM25_FIELD_WEIGHTS))
+            vector_texts.append(search_text)
+            return entry
+        
+        menu_data = data.get('menu', {}) or {}
+        menu_entries: Dict[str, List[KnowledgeEntry]] = {}
+        self.catalog = MenuCatalog(menu_data, version)
+        
+        # Menu items: burgers, sides and drinks are searchable
+        for section, label in SEARCHABLE_MENU_SECTIONS:
+            menu_entries[label] = [
+                add_entry(
+                    f"menu:{section}:{_slug(item.get('name', index))}",
+                    'menu_item',
+                    item.get('name', f'Unknown {label}'),
+                    format_menu_item(item),
+                    _menu_term_weights(item),
+                    {
+                        'name': tokenize(item.get('name', '')),
+                        'description': tokenize(item.get('description', '')),
+                        'ingredients': [term for ingredient in item.get('ingredients', []) or [] for term in tokenize(ingredient)],
+                        'category': tokenize(item.get('category', ''))
+                    },
+                    f"{format_menu_item(item)} {item.get('category', '')} {label}",
+                    category=label
+                )
+                for index, item in enumerate(menu_data.get(section, []))
+            ]
+        
+        # FAQs: question and answer are searched together
+        for faq in (data.get('faqs', {}) or {}).get('faqs', []):
+            text_to_search = f"{faq.get('question', '')} {faq.get('answer', '')}"
+            add_entry(
+                f"faq:{_slug(faq.get('question', len(entries)))}",
+                'faq',
+                faq.get('question', 'FAQ'),
+                faq.get('answer', ''),
+                _text_term_weights(text_to_search),
+                {'text': tokenize(text_to_search)},
+                text_to_search
+            )
+        
+        # Policies
+        for policy_key, policy_content in (data.get('policies', {}) or {}).items():
+            if isinstance(policy_content, str):
+                add_entry(
+                    f"policy:{policy_key}",
+                    'policy',
+                    policy_key.replace('_', ' ').title(),
+                    policy_content,
+                    _text_term_weights(policy_content),
+                    {'text': tokenize(policy_content)},
+                    policy_content
+                )
+        
+        self.entries: Tuple[KnowledgeEntry, ...] = tuple(entries)
+        self.postings = postings
+        self.bm25: Optional[BM25Index] = BM25Index(bm25_documents) if ranking == 'bm25' else None
+        self.vectors: Optional[VectorIndex] = None
+        if ranking == 'vector':
+            self.vectors = build_vector_index([entry.key for entry in entries], vector_texts, version, cache_dir)
+        
+        # Pre-rendered results for the full-menu and drinks paths (combos are listed, not searched)
+        combo_entries = [
+            KnowledgeEntry(-1, f"menu:combos:{_slug(combo.get('name', index))}", 'menu_item',
+                           combo.get('name', 'Unknown Combo'), format_menu_item(combo), 'combos')
+            for index, combo in enumerate(menu_data.get('combos', []))
+        ]
+        self.full_menu: Tuple[Dict[str, Any], ...] = tuple(
+            entry.to_result(1.0)
+            for entry in menu_entries['burger'] + menu_entries['sides'] + menu_entries['drinks'] + combo_entries
+        )
+        self.drinks: Tuple[Dict[str, Any], ...] = tuple(entry.to_result(1.0) for entry in menu_entries['drinks'])
+        
+        # Stored chat context refers to entries by key
+        self.by_key: Dict[str, KnowledgeEntry] = {entry.key: entry for entry in self.entries + tuple(combo_entries)}
+        
+        logging.info(f"Knowledge base snapshot {version} compiled: {len(self.entries)} entries, {len(self.postings)} terms, ranking={ranking}")
+    
+    def search(self, query_lower: str, max_results: int) -> List[Dict[str, Any]]:
+        """Rank entries for an already lowercased query"""
+        query_words = query_lower.split()
+        query_terms = set(tokenize(query_lower))
+        
+        if self.vectors is not None:
+            return [
+                self.entries[entry_id].to_result(score)
+                for entry_id, score in self.vectors.top_k(query_lower, max_results)
+            ]
+        
+        if self.bm25 is not None:
+            return [
+                self.entries[entry_id].to_result(score)
+                for entry_id, score in self.bm25.top_k(query_terms, max_results)
+            ]
+        
+        # Accumulate scores only for entries that share a term with the query
+        scores: Dict[int, float] = {}
+        for term in query_terms:
+            for entry_id, weight in self.postings.get(term, {}).items():
+                scores[entry_id] = scores.get(entry_id, 0.0) + weight
+        
+        ranked = []
+        for entry_id, score in scores.items():
+            if self.entries[entry_id].type != 'menu_item':
+                # FAQ and policy scores are normalised by query length
+                score = score / len(query_words) if query_words else 0.0
+            ranked.append((score, entry_id))
+        
+        # Sort by relevance score and return top results
+        ranked.sort(key=lambda pair: pair[0], reverse=True)
+        return [self.entries[entry_id].to_result(score) for score, entry_id in ranked[:max_results]]
+
+KNOWLEDGE_BASE_FILES = ('menu.json', 'faqs.yaml', 'policies.json')
 
 class KnowledgeBase:
-    """RAG knowledge base for retrieving relevant context"""
+    """
+    RAG knowledge base for retrieving relevant context
     
-    def __init__(self):
-        self.knowledge_data: Optional[Dict[str, Any]] = None
+    Readers always go through ``self.snapshot``; reloads compile a new
+    snapshot in a background thread and replace the reference in a single
+    assignment, so the read path never takes a lock.
+    """
+    
+    def __init__(self, ranking: Optional[str] = None, kb_path: Optional[str] = None,
+                 reload_interval: Optional[float] = None):
+        """
+        Args:
+            ranking (str): 'keyword', 'bm25' or 'vector'; defaults to KNOWLEDGE_BASE_RANKING
+            kb_path (str): Knowledge base directory; defaults to KNOWLEDGE_BASE_PATH
+            reload_interval (float): Seconds between change checks, 0 disables;
+                defaults to KNOWLEDGE_BASE_RELOAD_INTERVAL
+        """
+        self.ranking = ranking
+        self.kb_path = kb_path
+        self.reload_interval = reload_interval
+        self.snapshot: Optional[KnowledgeSnapshot] = None
+        self._file_state: Optional[Tuple] = None
+        self._next_check = 0.0
+        self._reload_lock = threading.Lock()
+        # Results keyed by (snapshot version, normalized query, max_results)
+        self.query_cache = LRUCache(max_size=512, ttl=300)
+    
+    @property
+    def knowledge_data(self) -> Optional[Dict[str, Any]]:
+        """Raw data of the current snapshot"""
+        return self.snapshot.data if self.snapshot else None
+    
+    @property
+    def version(self) -> Optional[str]:
+        """Version id of the current snapshot"""
+        self._ensure_loaded()
+        return self.snapshot.version if self.snapshot else None
+    
+    @property
+    def catalog(self) -> MenuCatalog:
+        """Menu catalog of the current snapshot, replaced together with it on reload"""
+        self._ensure_loaded()
+        return self.snapshot.catalog
     
     def _ensure_loaded(self):
-        """Ensure knowledge base is loaded (lazy loading)"""
-        if self.knowledge_data is None:
-            self._load_knowledge_base()
+        """Ensure knowledge base is loaded (lazy loading) and schedule change checks"""
+        if self.snapshot is None:
+            with self._reload_lock:
+                if self.snapshot is None:
+                    self._load_knowledge_base()
+            return
+        
+        if self.reload_interval and time.monotonic() >= self._next_check:
+            self._next_check = time.monotonic() + self.reload_interval
+            # Never wait here: if a check is already running, keep serving the current snapshot
+            if self._reload_lock.acquire(blocking=False):
+                threading.Thread(target=self._check_for_changes, name='kb-reload', daemon=True).start()
     
-    def _load_knowledge_base(self):
-        """Load knowledge base from files"""
+    def _check_for_changes(self):
+        """Background task: rebuild and swap the snapshot when the files changed"""
         try:
-            # Use relative path if no flask context
-            try:
-                kb_path = current_app.config.get('KNOWLEDGE_BASE_PATH', 'knowledge_base/')
-            except RuntimeError:
-                # No application context, use relative path
-                kb_path = 'knowledge_base/'
+            file_state = self._stat_files()
+            if file_state == self._file_state:
+                return
             
-            # Load all knowledge base files
-            self.knowledge_data = {
-                'menu': self._load_file(os.path.join(kb_path, 'menu.json')),
-                'faqs': self._load_file(os.path.join(kb_path, 'faqs.yaml')),
-                'policies': self._load_file(os.path.join(kb_path, 'policies.json'))
-            }
-            
-            logging.info("Knowledge base loaded successfully")
+            knowledge_data, version = self._read_files()
+            if version != self.snapshot.version:  # Otherwise touched but identical content
+                self.snapshot = KnowledgeSnapshot(knowledge_data, self.ranking, version, self.kb_path)
+                self.query_cache.clear()
+                logging.info(f"Knowledge base reloaded: version {version}")
+            self._file_state = file_state
+        except Exception as e:
+            logging.error(f"Knowledge base reload failed, keeping version {self.snapshot.version}: {str(e)}")
+        finally:
+            self._reload_lock.release()
+    
+    def reload(self) -> str:
+        """Synchronously reload the files if they changed; returns the active version"""
+        if self.snapshot is None:
+            self._ensure_loaded()
+        else:
+            self._reload_lock.acquire()
+            self._check_for_changes()
+        return self.snapshot.version
+    
+    def _load_knowledge_base(self):
+        """Load knowledge base from files and compile a snapshot"""
+        # Use relative path if no flask context
+        try:
+            config = current_app.config
+        except RuntimeError:
+            # No application context, use relative path
+            config = {}
+        
+        if self.kb_path is None:
+            self.kb_path = config.get('KNOWLEDGE_BASE_PATH', 'knowledge_base/')
+        if self.ranking is None:
+            self.ranking = config.get('KNOWLEDGE_BASE_RANKING', 'keyword')
+        if self.reload_interval is None:
+            self.reload_interval = float(config.get('KNOWLEDGE_BASE_RELOAD_INTERVAL', 0))
+        self.query_cache.max_size = int(config.get('KNOWLEDGE_BASE_CACHE_SIZE', self.query_cache.max_size))
+        self.query_cache.ttl = config.get('KNOWLEDGE_BASE_CACHE_TTL', self.query_cache.ttl)
+        
+        try:
+            self._file_state = self._stat_files()
+            knowledge_data, version = self._read_files()
+            logging.info(f"Knowledge base loaded successfully: version {version}")
             
         except Exception as e:
             logging.error(f"Failed to load knowledge base: {str(e)}")
-            self.knowledge_data = self._get_default_knowledge()
+            knowledge_data, version = self._get_default_knowledge(), 'default'
+        
+        self._next_check = time.monotonic() + (self.reload_interval or 0)
+        cache_dir = self.kb_path if version != 'default' else None
+        self.snapshot = KnowledgeSnapshot(knowledge_data, self.ranking, version, cache_dir)
     
-    def _load_file(self, filepath):
-        """Load individual knowledge base file"""
+    def _stat_files(self) -> Tuple:
+        """Cheap change signature: (name, mtime, size) of each knowledge base file"""
+        state = []
+        for name in KNOWLEDGE_BASE_FILES:
+            try:
+                stat = os.stat(os.path.join(self.kb_path, name))
+                state.append((name, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                state.append((name, None, None))
+        return tuple(state)
+    
+    def _read_files(self) -> Tuple[Dict[str, Any], str]:
+        """Read and parse all knowledge base files; the version is a hash of their content"""
+        digest = hashlib.sha256()
+        knowledge_data = {}
+        for name in KNOWLEDGE_BASE_FILES:
+            raw = self._read_bytes(os.path.join(self.kb_path, name))
+            digest.update(name.encode('utf-8') + b'\0' + raw + b'\0')
+            knowledge_data[name.split('.')[0]] = self._parse_file(name, raw)
+        return knowledge_data, digest.hexdigest()[:12]
+    
+    def _read_bytes(self, filepath) -> bytes:
+        """Read a knowledge base file, treating a missing file as empty"""
         if not os.path.exists(filepath):
             logging.warning(f"Knowledge base file not found: {filepath}")
+            return b''
+        with open(filepath, 'rb') as f:
+            return f.read()
+    
+    def _parse_file(self, filepath, raw: bytes):
+        """Parse individual knowledge base file"""
+        if not raw:
             return {}
         
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                if filepath.endswith('.json'):
-                    return json.load(f)
-                elif filepath.endswith('.yaml') or filepath.endswith('.yml'):
-                    return yaml.safe_load(f)
-                else:
-                    return {'content': f.read()}
+            text = raw.decode('utf-8')
+            if filepath.endswith('.json'):
+                return json.loads(text)
+            elif filepath.endswith('.yaml') or filepath.endswith('.yml'):
+                return yaml.safe_load(text)
+            else:
+                return {'content': text}
         except Exception as e:
             logging.error(f"Failed to load {filepath}: {str(e)}")
             return {}
@@ -69,207 +452,38 @@ class KnowledgeBase:
             List[Dict]: List of relevant knowledge base entries
         """
         self._ensure_loaded()
-        if not self.knowledge_data:
+        snapshot = self.snapshot
+        if not snapshot or not snapshot.data:
             return []
         
         try:
-            query_lower = query.lower()
+            query_lower = normalize_query(query)
+            cache_key = (snapshot.version, query_lower, max_results)
+            cached = self.query_cache.get(cache_key)
+            if cached is not None:
+                return list(cached)
             
-            # Check if user is asking for full menu
-            full_menu_triggers = ['menu', 'what\'s on the menu', 'show me the menu', 'see the menu', 'full menu']
-            if any(trigger in query_lower for trigger in full_menu_triggers):
-                return self.get_full_menu()
-            
-            # Check if user is asking for drinks specifically
-            drinks_triggers = ['drinks', 'what drinks', 'all drinks', 'beverages', 'drink options']
-            if any(trigger in query_lower for trigger in drinks_triggers):
-                return self.get_all_drinks()
-            
-            # Spanish to English term mapping (keep for backwards compatibility)
-            spanish_to_english = {
-                'bebidas': 'drinks',
-                'hamburguesas': 'burgers', 
-                'acompañamientos': 'sides',
-                'papas': 'fries',
-                'malteada': 'milkshake',
-                'gaseosa': 'soda',
-                'refresco': 'soda'
-            }
-            
-            # Replace Spanish terms with English equivalents
-            original_query = query_lower
-            for spanish, english in spanish_to_english.items():
-                if spanish in query_lower:
-                    query_lower = query_lower.replace(spanish, english)
-            
-            relevant_items = []
-            
-            # Search menu items
-            menu_items = self._search_menu(query_lower)
-            relevant_items.extend(menu_items)
-            
-            # Search FAQs
-            faq_items = self._search_faqs(query_lower)
-            relevant_items.extend(faq_items)
-            
-            # Search policies
-            policy_items = self._search_policies(query_lower)
-            relevant_items.extend(policy_items)
-            
-            # Sort by relevance score and return top results
-            relevant_items.sort(key=lambda x: x.get('score', 0), reverse=True)
-            return relevant_items[:max_results]
+            results = self._retrieve_uncached(snapshot, query_lower, max_results)
+            self.query_cache.set(cache_key, tuple(results))
+            return results
             
         except Exception as e:
             logging.error(f"Knowledge retrieval error: {str(e)}")
             return []
     
-    def _search_menu(self, query: str) -> List[Dict[str, Any]]:
-        """Search menu items"""
-        self._ensure_loaded()
-        if not self.knowledge_data:
-            return []
-        results = []
-        menu_data = self.knowledge_data.get('menu', {})
-        
-        # Search burgers
-        burgers = menu_data.get('burgers', [])
-        for burger in burgers:
-            score = self._calculate_relevance(query, burger)
-            if score > 0:
-                results.append({
-                    'type': 'menu_item',
-                    'category': 'burger',
-                    'title': burger.get('name', 'Unknown Burger'),
-                    'content': self._format_menu_item(burger),
-                    'score': score
-                })
-        
-        # Search sides and drinks
-        for category in ['sides', 'drinks']:
-            items = menu_data.get(category, [])
-            for item in items:
-                score = self._calculate_relevance(query, item)
-                if score > 0:
-                    results.append({
-                        'type': 'menu_item',
-                        'category': category,
-                        'title': item.get('name', f'Unknown {category}'),
-                        'content': self._format_menu_item(item),
-                        'score': score
-                    })
-        
-        return results
-    
-    def _search_faqs(self, query: str) -> List[Dict[str, Any]]:
-        """Search FAQ entries"""
-        self._ensure_loaded()
-        if not self.knowledge_data:
-            return []
-        results = []
-        faqs = self.knowledge_data.get('faqs', {}).get('faqs', [])
-        
-        for faq in faqs:
-            # Check both question and answer
-            text_to_search = f"{faq.get('question', '')} {faq.get('answer', '')}"
-            score = self._calculate_text_relevance(query, text_to_search.lower())
-            
-            if score > 0:
-                results.append({
-                    'type': 'faq',
-                    'title': faq.get('question', 'FAQ'),
-                    'content': faq.get('answer', ''),
-                    'score': score
-                })
-        
-        return results
-    
-    def _search_policies(self, query: str) -> List[Dict[str, Any]]:
-        """Search policy documents"""
-        self._ensure_loaded()
-        if not self.knowledge_data:
-            return []
-        results = []
-        policies = self.knowledge_data.get('policies', {})
-        
-        for policy_key, policy_content in policies.items():
-            if isinstance(policy_content, str):
-                score = self._calculate_text_relevance(query, policy_content.lower())
-                if score > 0:
-                    results.append({
-                        'type': 'policy',
-                        'title': policy_key.replace('_', ' ').title(),
-                        'content': policy_content,
-                        'score': score
-                    })
-        
-        return results
-    
-    def _calculate_relevance(self, query: str, item: Dict) -> float:
-        """Calculate relevance score for a menu item"""
-        score = 0.0
-        
-        # Check name
-        name = item.get('name', '').lower()
-        if query in name:
-            score += 2.0
-        
-        # Check description
-        description = item.get('description', '').lower()
-        if query in description:
-            score += 1.5
-        
-        # Check ingredients
-        ingredients = item.get('ingredients', [])
-        if isinstance(ingredients, list):
-            for ingredient in ingredients:
-                if query in ingredient.lower():
-                    score += 1.0
-        
-        # Check categories/tags
-        category = item.get('category', '').lower()
-        if query in category:
-            score += 1.0
-        
-        return score
-    
-    def _calculate_text_relevance(self, query: str, text: str) -> float:
-        """Calculate relevance score for text content"""
-        if not text or not query:
-            return 0.0
+    def _retrieve_uncached(self, snapshot: KnowledgeSnapshot, query_lower: str, max_results: int) -> List[Dict[str, Any]]:
+        """Retrieve for a normalized query against a given snapshot"""
+        triggers = LISTING_TRIGGERS.match(query_lower)
         
-        # Simple keyword matching - can be enhanced with more sophisticated methods
-        query_words = query.split()
-        score = 0.0
+        # Check if user is asking for full menu
+        if 'full_menu' in triggers:
+            return list(snapshot.full_menu)
         
-        for word in query_words:
-            if len(word) > 2:  # Skip very short words
-                if word in text:
-                    score += 1.0
+        # Check if user is asking for drinks specifically
+        if 'drinks' in triggers:
+            return list(snapshot.drinks)
         
-        return score / len(query_words) if query_words else 0.0
-    
-    def _format_menu_item(self, item: Dict) -> str:
-        """Format menu item for display"""
-        parts = []
-        
-        if 'name' in item:
-            parts.append(f"**{item['name']}**")
-        
-        if 'price' in item:
-            parts.append(f"Price: ${item['price']}")
-        
-        if 'description' in item:
-            parts.append(f"Description: {item['description']}")
-        
-        if 'ingredients' in item and isinstance(item['ingredients'], list):
-            parts.append(f"Ingredients: {', '.join(item['ingredients'])}")
-        
-        if 'nutritional_info' in item:
-            nutrition = item['nutritional_info']
-            parts.append(f"Calories: {nutrition.get('calories', 'N/A')}")
-        
-        return '\n'.join(parts)
+        return snapshot.search(query_lower, max_results)
     
     def _get_default_knowledge(self):
         """Provide default knowledge base when files are not available"""
@@ -304,76 +518,26 @@ class KnowledgeBase:
     def get_full_menu(self) -> List[Dict[str, Any]]:
         """Get complete menu for display when user asks for full menu"""
         self._ensure_loaded()
-        if not self.knowledge_data:
-            return []
-        
-        results = []
-        menu_data = self.knowledge_data.get('menu', {})
-        
-        # Add all burgers
-        burgers = menu_data.get('burgers', [])
-        for burger in burgers:
-            results.append({
-                'type': 'menu_item',
-                'category': 'burger',
-                'title': burger.get('name', 'Unknown Burger'),
-                'content': self._format_menu_item(burger),
-                'score': 1.0
-            })
-        
-        # Add all sides
-        sides = menu_data.get('sides', [])
-        for side in sides:
-            results.append({
-                'type': 'menu_item', 
-                'category': 'sides',
-                'title': side.get('name', 'Unknown Side'),
-                'content': self._format_menu_item(side),
-                'score': 1.0
-            })
-        
-        # Add all drinks
-        drinks = menu_data.get('drinks', [])
-        for drink in drinks:
-            results.append({
-                'type': 'menu_item',
-                'category': 'drinks', 
-                'title': drink.get('name', 'Unknown Drink'),
-                'content': self._format_menu_item(drink),
-                'score': 1.0
-            })
-        
-        # Add combos if they exist
-        combos = menu_data.get('combos', [])
-        for combo in combos:
-            results.append({
-                'type': 'menu_item',
-                'category': 'combos',
-                'title': combo.get('name', 'Unknown Combo'),
-                'content': self._format_menu_item(combo),
-                'score': 1.0
-            })
-        
-        return results
-
+        return list(self.snapshot.full_menu) if self.snapshot else []
+    
     def get_all_drinks(self) -> List[Dict[str, Any]]:
         """Get all drinks from the menu when user asks specifically about drinks"""
         self._ensure_loaded()
-        if not self.knowledge_data:
-            return []
-        
-        results = []
-        menu_data = self.knowledge_data.get('menu', {})
-        
-        # Add all drinks with high relevance score
-        drinks = menu_data.get('drinks', [])
-        for drink in drinks:
-            results.append({
-                'type': 'menu_item',
-                'category': 'drinks',
-                'title': drink.get('name', 'Unknown Drink'),
-                'content': self._format_menu_item(drink),
-                'score': 1.0
-            })
-        
-        return results
+        return list(self.snapshot.drinks) if self.snapshot else []
+
+    def get_entry(self, key: str) -> Optional[KnowledgeEntry]:
+        """Entry of the current snapshot by its stable key, e.g. 'faq:do-you-deliver'"""
+        self._ensure_loaded()
+        return self.snapshot.by_key.get(key) if self.snapshot else None
+
+_knowledge_base: Optional[KnowledgeBase] = None
+_knowledge_base_lock = threading.Lock()
+
+def get_knowledge_base() -> KnowledgeBase:
+    """Process-wide knowledge base shared by chat, orders and the debug endpoints"""
+    global _knowledge_base
+    if _knowledge_base is None:
+        with _knowledge_base_lock:
+            if _knowledge_base is None:
+                _knowledge_base = KnowledgeBase()
+    return _knowledge_base
@@ -1,6 +1,68 @@
-from openai import OpenAI
+from openai import OpenAI, APIConnectionError, APIStatusError, APITimeoutError, InternalServerError, RateLimitError
 from flask import current_app
+from app.utils.keyword_matcher import KeywordMatcher
+from app.utils.prompt_builder import compact_whitespace, pack_prompt
+from app.utils.completion_cache import CompletionCache, get_completion_cache
+from app.utils.singleflight import get_single_flight
+from app.utils.circuit_breaker import CircuitOpenError, get_llm_breaker, get_llm_retry_budget
 import logging
+import random
+import time
+
+# Upstream failures worth retrying; they also count against the circuit breaker
+RETRYABLE_ERRORS = (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError)
+
+# Model parameters of chat replies, summaries and order analysis (also part of the completion cache key)
+CHAT_COMPLETION_PARAMS = {
+    'model': 'gpt-3.5-turbo',
+    'max_tokens': 500,
+    'temperature': 0.7,
+    'presence_penalty': 0.1,
+    'frequency_penalty': 0.1
+}
+SUMMARY_PARAMS = {
+    'model': 'gpt-3.5-turbo',
+    'max_tokens': 250,
+    'temperature': 0.2
+}
+ORDER_ANALYSIS_PARAMS = {
+    'model': 'gpt-3.5-turbo',
+    'max_tokens': 1000,
+    'temperature': 0.2,  # Very low temperature for consistent parsing
+    'response_format': {'type': 'json_object'}
+}
+
+# Keyword groups used to pick a canned reply when the AI is unavailable
+FALLBACK_TOPICS = KeywordMatcher({
+    'order': ['order', 'status', 'track'],
+    'menu': ['menu', 'burger', 'food', 'eat'],
+    'delivery': ['delivery', 'deliver', 'time']
+})
+
+# Signals of ordering intent in a user message
+ORDER_SIGNALS = KeywordMatcher({
+    'order_intent': [
+        'want', 'need', 'i\'ll take', 'i\'ll have', 'i want', 'i need',
+        'order', 'buy', 'purchase', 'get me', 'give me', 'can i have',
+        'i would like', 'i\'d like', 'looking for', 'interested in'
+    ],
+    'food': [
+        'burger', 'hamburger', 'fries', 'drink', 'beverage', 'combo', 
+        'meal', 'food', 'classic', 'perfburger', 'bbq', 'bacon', 
+        'veggie', 'spicy', 'jalapeño', 'cheese', 'deluxe', 'supreme',
+        'shake', 'milkshake', 'soda', 'water', 'onion rings'
+    ],
+    'quantity': [
+        'two', 'three', 'four', 'five', 'couple', 'few', 'several',
+        '1', '2', '3', '4', '5', '6', '7', '8', '9'
+    ],
+    'customization': [
+        'no onions', 'extra cheese', 'no tomato', 'medium rare', 'well done',
+        'without', 'add', 'extra'
+    ],
+    'menu': ['menu'],
+    'want': ['want']
+})
 
 class LLMClient:
     """Client for interacting with OpenAI's language models"""
@@ -47,6 +109,8 @@ class LLMClient:
         Remember: Your goal is not just to answer questions, but to help customers easily create orders 
         when they show interest in our food items. BUT NEVER INVENT MENU ITEMS THAT DON'T EXIST.
         """
+        # The indentation above is only for readability; don't pay tokens for it
+        self.system_prompt = compact_whitespace(self.system_prompt)
     
     def _initialize_client(self):
         """Initialize OpenAI client if not already done"""
@@ -64,13 +128,21 @@ class LLMClient:
                 raise ValueError("OpenAI API key not configured")
             
             try:
-                self.client = OpenAI(api_key=api_key)
-                logging.info("OpenAI client initialized successfully")
+                base_url = current_app.config.get('OPENAI_BASE_URL')
+                # The SDK's own retries would stack on top of ours and hide failures from the breaker
+                self.client = OpenAI(
+                    api_key=api_key,
+                    base_url=base_url,
+                    timeout=current_app.config.get('LLM_TIMEOUT_SECONDS', 20),
+                    max_retries=0
+                )
+                logging.info(f"OpenAI client initialized successfully ({base_url or 'default API endpoint'})")
             except Exception as e:
                 logging.error(f"Failed to initialize OpenAI client: {e}")
                 raise
     
-    def generate_response(self, user_message, context=None, chat_history=None):
+    def generate_response(self, user_message, context=None, chat_history=None, cacheable=False, kb_version=None,
+                      summary=None):
         """
         Generate AI response to user message
         
@@ -78,6 +150,9 @@ class LLMClient:
             user_message (str): The user's message
             context (list): Retrieved knowledge base context
             chat_history (list): Previous messages in the conversation
+            cacheable (bool): Whether an identical earlier reply may be reused
+            kb_version (str): Knowledge base version the context came from
+            summary (str): Summary of the conversation before chat_history
             
         Returns:
             str: AI-generated response
@@ -88,40 +163,42 @@ class LLMClient:
             self._initialize_client()
             logging.info("LLM client initialized successfully")
             
-            # Build the conversation context
-            messages = [{"role": "system", "content": self.system_prompt}]
-            
-            # Add retrieved context if available
-            if context:
-                context_text = self._format_context(context)
-                context_message = f"Here's some relevant information that might help answer the user's question:\n\n{context_text}"
-                messages.append({"role": "system", "content": context_message})
-                logging.info(f"Added context: {len(context)} items")
+            messages = self._build_messages(user_message, context, chat_history, summary)
             
-            # Add chat history
-            if chat_history:
-                messages.extend(chat_history[-10:])  # Last 10 messages for context
-                logging.info(f"Added chat history: {len(chat_history[-10:])} messages")
+            cache, cache_key = self._completion_cache(cacheable, messages, CHAT_COMPLETION_PARAMS, kb_version)
+            if cache:
+                cached = cache.get(cache_key, kb_version)
+                if cached:
+                    logging.info(f"LLM completion cache hit, response length: {len(cached)} chars")
+                    return cached
             
-            # Add current user message
-            messages.append({"role": "user", "content": user_message})
-            
-            logging.info(f"Making OpenAI API call with {len(messages)} messages")
+            def complete():
+                # Generate response using OpenAI
+                response = self._create_completion(messages=messages, **CHAT_COMPLETION_PARAMS)
+                
+                content = response.choices[0].message.content
+                logging.info(f"OpenAI API call successful, response length: {len(content) if content else 0} chars")
+                if content and cache:
+                    # Stored before waiting callers are released so other workers can find it
+                    cache.set(cache_key, content.strip(), kb_version)
+                return content.strip() if content else None
+            
+            # Identical prompts already in flight share one upstream call
+            single_flight = get_single_flight()
+            if single_flight:
+                flight_key = cache_key or CompletionCache.make_key(messages, CHAT_COMPLETION_PARAMS, kb_version)
+                lookup = (lambda: cache.get(cache_key, kb_version)) if cache else None
+                content, coalesced = single_flight.do(flight_key, complete, lookup)
+                if coalesced:
+                    logging.info(f"LLM response shared from a coalesced call {flight_key[:12]}")
+            else:
+                content = complete()
             
-            # Generate response using OpenAI
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                max_tokens=500,
-                temperature=0.7,
-                presence_penalty=0.1,
-                frequency_penalty=0.1
-            )
-            
-            content = response.choices[0].message.content
-            logging.info(f"OpenAI API call successful, response length: {len(content) if content else 0} chars")
-            return content.strip() if content else "I apologize, but I'm having trouble generating a response right now."
+            return content or "I apologize, but I'm having trouble generating a response right now."
             
+        except CircuitOpenError:
+            logging.warning("OpenAI circuit is open, returning fallback response")
+            return self._get_fallback_response(user_message)
         except Exception as e:
             logging.error(f"LLM generation error: {str(e)}")
             logging.error(f"Error type: {type(e).__name__}")
@@ -129,6 +206,180 @@ class LLMClient:
             logging.info(f"Returning fallback response: {fallback[:50]}...")
             return fallback
     
+    def stream_response(self, user_message, context=None, chat_history=None, cacheable=False, kb_version=None,
+                    summary=None):
+        """
+        Generate AI response to user message incrementally
+        
+        Args:
+            user_message (str): The user's message
+            context (list): Retrieved knowledge base context
+            chat_history (list): Previous messages in the conversation
+            cacheable (bool): Whether an identical earlier reply may be reused
+            kb_version (str): Knowledge base version the context came from
+            summary (str): Summary of the conversation before chat_history
+            
+        Yields:
+            str: Response text chunks as they arrive (the fallback response if
+            the call fails before anything was produced)
+        """
+        produced = False
+        try:
+            logging.info(f"LLM stream_response called with message: {user_message[:50]}...")
+            
+            self._initialize_client()
+            messages = self._build_messages(user_message, context, chat_history, summary)
+            
+            cache, cache_key = self._completion_cache(cacheable, messages, CHAT_COMPLETION_PARAMS, kb_version)
+            if cache:
+                cached = cache.get(cache_key, kb_version)
+                if cached:
+                    logging.info(f"LLM completion cache hit, response length: {len(cached)} chars")
+                    produced = True
+                    yield cached
+                    return
+            
+            stream = self._create_completion(messages=messages, stream=True, **CHAT_COMPLETION_PARAMS)
+            
+            parts = []
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    produced = True
+                    parts.append(delta)
+                    yield delta
+            
+            if not produced:
+                yield "I apologize, but I'm having trouble generating a response right now."
+            elif cache:
+                # Only complete streams are cached
+                cache.set(cache_key, ''.join(parts).strip(), kb_version)
+                
+        except CircuitOpenError:
+            logging.warning("OpenAI circuit is open, returning fallback response")
+            yield self._get_fallback_response(user_message)
+        except Exception as e:
+            logging.error(f"LLM streaming error: {str(e)}")
+            logging.error(f"Error type: {type(e).__name__}")
+            if produced and isinstance(e, RETRYABLE_ERRORS):
+                # The stream broke after it started, past the point where it could be retried
+                get_llm_breaker().record_failure()
+            if not produced:
+                yield self._get_fallback_response(user_message)
+    
+    def _create_completion(self, **kwargs):
+        """
+        Call the chat completions API through the circuit breaker
+        
+        Transient failures are retried up to LLM_MAX_RETRIES times with full
+        jitter exponential backoff, as long as the retry budget allows.
+        
+        Raises:
+            CircuitOpenError: If the circuit is open and the call was not attempted
+        """
+        breaker = get_llm_breaker()
+        budget = get_llm_retry_budget()
+        config = current_app.config
+        max_retries = int(config.get('LLM_MAX_RETRIES', 2))
+        backoff = float(config.get('LLM_RETRY_BACKOFF_SECONDS', 0.5))
+        max_backoff = float(config.get('LLM_RETRY_MAX_BACKOFF_SECONDS', 4))
+        
+        if not breaker.allow_request():
+            raise CircuitOpenError("OpenAI circuit is open, skipping the call")
+        budget.record_request()
+        
+        attempt = 0
+        while True:
+            try:
+                response = self.client.chat.completions.create(**kwargs)
+            except RETRYABLE_ERRORS as e:
+                breaker.record_failure()
+                if attempt >= max_retries or not budget.try_spend() or not breaker.allow_request():
+                    raise
+                delay = random.uniform(0, min(max_backoff, backoff * 2 ** attempt))
+                attempt += 1
+                logging.warning(f"OpenAI call failed ({type(e).__name__}), retry {attempt}/{max_retries} in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+            except APIStatusError:
+                # The API answered and refused this request (4xx): it is up
+                breaker.record_success()
+                raise
+            except BaseException:
+                # Every exit must settle the call, or a half-open probe slot would never come back
+                breaker.release_probe()
+                raise
+            breaker.record_success()
+            return response
+    
+    def _completion_cache(self, cacheable, messages, params, kb_version):
+        """Return (cache, key) for a cacheable call, or (None, None)"""
+        cache = get_completion_cache() if cacheable else None
+        if cache is None:
+            return None, None
+        return cache, CompletionCache.make_key(messages, params, kb_version)
+    
+    def _build_messages(self, user_message, context, chat_history, summary=None):
+        """Assemble the chat completion messages within the prompt token budget"""
+        # System prompt, conversation summary, retrieved context and the last
+        # 10 history messages, trimmed to the prompt token budget
+        messages, prompt_stats = pack_prompt(
+            system_prompt=self.system_prompt,
+            user_message=user_message,
+            context=context,
+            chat_history=chat_history,
+            budget=current_app.config.get('LLM_PROMPT_TOKEN_BUDGET', 3000),
+            format_context=self._format_context,
+            context_intro="Here's some relevant information that might help answer the user's question:\n\n",
+            max_history=10,
+            summary=f"Summary of the earlier conversation:\n{summary}" if summary else None
+        )
+        
+        logging.info(
+            f"Prompt assembled: {len(messages)} messages, ~{prompt_stats['prompt_tokens']} prompt tokens "
+            f"(budget {prompt_stats['budget']}, context {prompt_stats['context_items']} kept/{prompt_stats['context_dropped']} dropped, "
+            f"history {prompt_stats['history_messages']} kept/{prompt_stats['history_dropped']} dropped)"
+        )
+        return messages
+    
+    def summarize_conversation(self, previous_summary, messages):
+        """
+        Fold new conversation messages into the running summary
+        
+        Args:
+            previous_summary (str): Summary so far, or None
+            messages (list): New messages as {'role', 'content'} dicts, oldest first
+            
+        Returns:
+            str: Updated summary, or None if it could not be generated
+        """
+        transcript = "\n".join(
+            f"{'Customer' if message['role'] == 'user' else 'PerfBot'}: {message['content']}"
+            for message in messages
+        )
+        prompt = compact_whitespace(f"""
+        Update the running summary of a PerfBurger customer service chat with the new messages.
+        Keep what the customer wants to order (items, quantities, customizations), order IDs,
+        questions still open and preferences they stated. Drop greetings and small talk.
+        Write at most 120 words in the customer's language.
+        
+        CURRENT SUMMARY:
+        {previous_summary or '(none yet)'}
+        
+        NEW MESSAGES:
+        {transcript}
+        """)
+        try:
+            self._initialize_client()
+            response = self._create_completion(messages=[{'role': 'user', 'content': prompt}], **SUMMARY_PARAMS)
+            content = response.choices[0].message.content
+            return content.strip() if content else None
+        except Exception as e:
+            logging.error(f"Conversation summarization error: {str(e)}")
+            return None
+    
     def _format_context(self, context):
         """Format retrieved context for the AI prompt"""
         if not context:
@@ -158,23 +409,24 @@ class LLMClient:
         }
         
         # Simple keyword matching for fallback
-        message_lower = user_message.lower()
-        if any(word in message_lower for word in ['order', 'status', 'track']):
+        topics = FALLBACK_TOPICS.match(user_message)
+        if 'order' in topics:
             return fallback_responses['order']
-        elif any(word in message_lower for word in ['menu', 'burger', 'food', 'eat']):
+        elif 'menu' in topics:
             return fallback_responses['menu']
-        elif any(word in message_lower for word in ['delivery', 'deliver', 'time']):
+        elif 'delivery' in topics:
             return fallback_responses['delivery']
         else:
             return fallback_responses['default']
 
-    def analyze_conversation_for_order(self, conversation_text, menu_data):
+    def analyze_conversation_for_order(self, conversation_text, catalog, cacheable=True):
         """
         Analyze conversation text to extract order items using LLM
         
         Args:
             conversation_text (str): Combined user messages from chat
-            menu_data (dict): Menu data for validation
+            catalog (MenuCatalog): Menu for the prompt and for validation
+            cacheable (bool): Whether an earlier analysis of the same conversation may be reused
             
         Returns:
             dict: Extracted order information or error
@@ -183,7 +435,7 @@ class LLMClient:
             self._initialize_client()
             
             # Create a structured prompt for order extraction
-            menu_items_text = self._format_menu_for_llm(menu_data)
+            menu_items_text = catalog.extraction_prompt
             
             system_prompt = f"""You are an expert order analysis assistant for PerfBurger restaurant. 
             Your task is to analyze customer conversations and extract specific order items with high accuracy.
@@ -238,23 +490,25 @@ class LLMClient:
                 {"role": "user", "content": user_prompt}
             ]
             
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                max_tokens=1000,
-                temperature=0.2,  # Very low temperature for consistent parsing
-                response_format={"type": "json_object"}
-            )
+            # The menu is part of the prompt, so menu changes produce a new key
+            cache, cache_key = self._completion_cache(cacheable, messages, ORDER_ANALYSIS_PARAMS, None)
+            content = cache.get(cache_key) if cache else None
+            if content:
+                logging.info("LLM completion cache hit for order analysis")
+            else:
+                response = self._create_completion(messages=messages, **ORDER_ANALYSIS_PARAMS)
+                content = response.choices[0].message.content
             
-            content = response.choices[0].message.content
             if content:
                 import json
                 try:
                     result = json.loads(content)
+                    if cache:
+                        cache.set(cache_key, content)
                     logging.info(f"LLM order analysis successful: {len(result.get('items', []))} items detected, confidence: {result.get('confidence', 0.0)}")
                     
                     # Validate the extracted items against the menu
-                    validated_result = self._validate_extracted_items(result, menu_data)
+                    validated_result = self._validate_extracted_items(result, catalog)
                     return validated_result
                     
                 except json.JSONDecodeError as e:
@@ -267,62 +521,33 @@ class LLMClient:
             logging.error(f"LLM order analysis error: {str(e)}")
             return {"items": [], "confidence": 0.0, "reasoning": f"Error: {str(e)}"}
 
-    def _validate_extracted_items(self, result, menu_data):
-        """Validate extracted items against actual menu data"""
+    def _validate_extracted_items(self, result, catalog):
+        """Validate extracted items against the menu catalog"""
         if not result.get('items'):
             return result
         
         validated_items = []
         for item in result['items']:
-            # Find the actual menu item
-            found = False
-            for category, menu_items in menu_data.items():
-                if isinstance(menu_items, list):
-                    for menu_item in menu_items:
-                        if (isinstance(menu_item, dict) and 
-                            menu_item.get('name', '').lower() == item.get('name', '').lower()):
-                            
-                            # Use actual menu data
-                            validated_item = {
-                                "name": menu_item['name'],  # Exact menu name
-                                "quantity": max(1, int(item.get('quantity', 1))),  # Ensure positive
-                                "customizations": item.get('customizations', []),
-                                "price": float(menu_item['price']),  # Actual menu price
-                                "category": category
-                            }
-                            validated_items.append(validated_item)
-                            found = True
-                            break
-                if found:
-                    break
-            
-            if not found:
+            menu_item = catalog.lookup(str(item.get('name', '')))
+            if menu_item is None:
                 logging.warning(f"LLM extracted item '{item.get('name')}' not found in menu")
+                continue
+            
+            # Use actual menu data
+            validated_items.append({
+                "name": menu_item.name,  # Exact menu name
+                "quantity": max(1, int(item.get('quantity', 1))),  # Ensure positive
+                "customizations": item.get('customizations', []),
+                "price": menu_item.price,  # Actual menu price
+                "category": menu_item.category
+            })
         
-        result['items'] = validated_items
-        if len(validated_items) < len(result.get('items', [])):
+        if len(validated_items) < len(result['items']):
             result['confidence'] = max(0.0, result.get('confidence', 0.0) - 0.2)  # Reduce confidence
-            result['reasoning'] += " (Some items were filtered out during validation)"
+            result['reasoning'] = result.get('reasoning', '') + " (Some items were filtered out during validation)"
+        result['items'] = validated_items
         
         return result
-    
-    def _format_menu_for_llm(self, menu_data):
-        """Format menu data for LLM consumption"""
-        menu_text = []
-        
-        for category, items in menu_data.items():
-            if isinstance(items, list):
-                menu_text.append(f"\n{category.upper()}:")
-                for item in items:
-                    if isinstance(item, dict) and 'name' in item and 'price' in item:
-                        name = item['name']
-                        price = item['price']
-                        description = item.get('description', '')
-                        menu_text.append(f"  - {name}: ${price}")
-                        if description:
-                            menu_text.append(f"    {description}")
-        
-        return "\n".join(menu_text)
 
     def should_suggest_order_creation(self, user_message):
         """
@@ -335,37 +560,12 @@ class LLMClient:
             bool: True if order creation should be suggested
         """
         try:
-            # Enhanced keyword detection
-            order_intent_keywords = [
-                'want', 'need', 'i\'ll take', 'i\'ll have', 'i want', 'i need',
-                'order', 'buy', 'purchase', 'get me', 'give me', 'can i have',
-                'i would like', 'i\'d like', 'looking for', 'interested in'
-            ]
-            
-            food_keywords = [
-                'burger', 'hamburger', 'fries', 'drink', 'beverage', 'combo', 
-                'meal', 'food', 'classic', 'perfburger', 'bbq', 'bacon', 
-                'veggie', 'spicy', 'jalapeño', 'cheese', 'deluxe', 'supreme',
-                'shake', 'milkshake', 'soda', 'water', 'onion rings'
-            ]
-            
-            quantity_indicators = [
-                'two', 'three', 'four', 'five', 'couple', 'few', 'several',
-                '1', '2', '3', '4', '5', '6', '7', '8', '9'
-            ]
-            
-            customization_keywords = [
-                'no onions', 'extra cheese', 'no tomato', 'medium rare', 'well done',
-                'without', 'add', 'extra'
-            ]
-            
-            message_lower = user_message.lower()
-            
-            # Check for different types of order signals
-            has_order_intent = any(keyword in message_lower for keyword in order_intent_keywords)
-            has_food_mention = any(keyword in message_lower for keyword in food_keywords)
-            has_quantity = any(keyword in message_lower for keyword in quantity_indicators)
-            has_customization = any(keyword in message_lower for keyword in customization_keywords)
+            # Check for different types of order signals in one pass
+            signals = ORDER_SIGNALS.match(user_message)
+            has_order_intent = 'order_intent' in signals
+            has_food_mention = 'food' in signals
+            has_quantity = 'quantity' in signals
+            has_customization = 'customization' in signals
             
             # More sophisticated scoring
             score = 0
@@ -379,7 +579,7 @@ class LLMClient:
                 score += 1  # Weak signal
             
             # Additional context checks
-            if 'menu' in message_lower and 'want' in message_lower:
+            if 'menu' in signals and 'want' in signals:
                 score += 1
             
             # Threshold for suggestion
@@ -0,0 +1,114 @@
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_ALIAS_WORD_RE = re.compile(r"[a-z0-9ñáéíóúü&]+")
+
+def fold_word(word: str) -> str:
+    """Singular form of a lowercase word ('sandwiches' -> 'sandwich', 'fries' -> 'frie')"""
+    if len(word) > 3 and word.endswith('es') and word[:-2].endswith(('ch', 'sh', 'x')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+def alias_words(text: str) -> Tuple[str, ...]:
+    """Folded words of a name, without punctuation or a leading article"""
+    words = _ALIAS_WORD_RE.findall(text.lower())
+    if words and words[0] in ('a', 'an', 'the'):
+        words = words[1:]
+    return tuple(fold_word(word) for word in words)
+
+def alias_key(text: str) -> str:
+    """
+    Canonical lookup key for an item name: lowercase words without
+    punctuation or a leading article, with plurals folded ('Classic
+    PerfBurgers' and 'the classic perfburger' share a key).
+    """
+    return ' '.join(alias_words(text))
+
+@dataclass(frozen=True)
+class CatalogItem:
+    """One orderable menu item"""
+    name: str
+    price: float
+    category: str
+    data: Dict[str, Any] = field(compare=False, repr=False)
+    # Folded words of each ingredient, e.g. (('red', 'onion'), ('brioche', 'bun'))
+    ingredient_words: Tuple[Tuple[str, ...], ...] = field(default=(), compare=False, repr=False)
+
+class MenuCatalog:
+    """
+    Indexed, read-only view of the menu.
+
+    Built once per knowledge base snapshot, so it is replaced (and every
+    derived value with it) whenever the menu files change. Name lookups are
+    dictionary hits, ``phrases`` maps the folded words of every name and
+    alias to its item for scanning free text, and the order-extraction
+    prompt text is rendered once.
+    """
+
+    def __init__(self, menu_data: Dict[str, Any], version: str = 'default'):
+        """
+        Args:
+            menu_data (dict): Category name -> list of item dicts, as in menu.json
+            version (str): Knowledge base snapshot version the menu came from
+        """
+        self.menu_data = menu_data
+        self.version = version
+
+        items: List[CatalogItem] = []
+        for category, section in menu_data.items():
+            if not isinstance(section, list):
+                continue
+            for entry in section:
+                if isinstance(entry, dict) and 'name' in entry and 'price' in entry:
+                    ingredients = entry.get('ingredients', []) if isinstance(entry.get('ingredients'), list) else []
+                    ingredient_words = tuple(alias_words(str(ingredient)) for ingredient in ingredients)
+                    items.append(CatalogItem(entry['name'], float(entry['price']), category, entry, ingredient_words))
+        self.items: Tuple[CatalogItem, ...] = tuple(items)
+
+        # Exact (case-insensitive) names win over aliases; the first item keeps a shared alias
+        self._by_name: Dict[str, CatalogItem] = {}
+        self.phrases: Dict[Tuple[str, ...], CatalogItem] = {}
+        for item in self.items:
+            self._by_name.setdefault(item.name.lower(), item)
+            for alias in [item.name] + list(item.data.get('aliases', []) or []):
+                words = alias_words(alias)
+                if words:
+                    self.phrases.setdefault(words, item)
+        self.max_phrase_words = max((len(words) for words in self.phrases), default=0)
+        self.name_vocabulary = frozenset(word for words in self.phrases for word in words)
+        self.ingredient_vocabulary = frozenset(
+            word for item in self.items for ingredient in item.ingredient_words for word in ingredient
+        )
+
+        self.extraction_prompt = self._render_extraction_prompt()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def get(self, name: str) -> Optional[CatalogItem]:
+        """Item with exactly this name, ignoring case"""
+        return self._by_name.get((name or '').strip().lower())
+
+    def lookup(self, name: str) -> Optional[CatalogItem]:
+        """Item by exact name, alias or plural form ('classic perfburgers')"""
+        return self.get(name) or self.phrases.get(alias_words(name or ''))
+
+    def in_categories(self, categories: Iterable[str]) -> Tuple[CatalogItem, ...]:
+        """Items of the given categories, in category then menu order"""
+        return tuple(item for category in categories for item in self.items if item.category == category)
+
+    def _render_extraction_prompt(self) -> str:
+        """Menu listing used in the order-extraction prompt"""
+        menu_text = []
+        for category, section in self.menu_data.items():
+            if isinstance(section, list):
+                menu_text.append(f"\n{category.upper()}:")
+                for item in section:
+                    if isinstance(item, dict) and 'name' in item and 'price' in item:
+                        menu_text.append(f"  - {item['name']}: ${item['price']}")
+                        if item.get('description'):
+                            menu_text.append(f"    {item['description']}")
+        return "\n".join(menu_text)
@@ -0,0 +1,142 @@
+import ast
+import json
+import zlib
+from typing import Any, Dict, List, Optional
+from flask import current_app, has_app_context
+from sqlalchemy.types import Text, TypeDecorator
+
+try:
+    import zstandard
+except ImportError:  # Optional: MESSAGE_COMPRESSION=zstd falls back to zlib
+    zstandard = None
+
+# First byte of a compressed body names its codec
+ZLIB_TAG = b'z'
+ZSTD_TAG = b's'
+
+def encode_context(results: Optional[List[Dict[str, Any]]], kb_version: Optional[str]) -> Optional[str]:
+    """
+    Compact reference to retrieved knowledge base results: the snapshot
+    version plus each entry's key and score, e.g.
+    ``{"v":"3f2a9c1b7d4e","e":[["menu:burgers:classic-perfburger",3.0]]}``
+    """
+    if not results:
+        return None
+    entries = [[result['key'], round(float(result.get('score', 0.0)), 4)] for result in results if result.get('key')]
+    if not entries:
+        return None
+    return json.dumps({'v': kb_version, 'e': entries}, separators=(',', ':'))
+
+def parse_legacy_context(stored: str) -> Optional[List[Dict[str, Any]]]:
+    """Results stored by older versions as ``str(retrieved_context)``, or None if unreadable"""
+    try:
+        results = ast.literal_eval(stored)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return None
+    if not isinstance(results, list):
+        return None
+    return [result for result in results if isinstance(result, dict)]
+
+def compact_legacy_context(stored: Optional[str], knowledge_base) -> Optional[str]:
+    """
+    Convert a legacy ``retrieved_context`` to the compact form, matching
+    results to entries of the current knowledge base by type and title.
+    Compact values are returned unchanged; unreadable ones become None.
+    """
+    if not stored or stored.startswith('{'):
+        return stored
+    results = parse_legacy_context(stored)
+    if not results:
+        return None
+    version = knowledge_base.version  # Loads the knowledge base on first use
+    snapshot = knowledge_base.snapshot
+    keys_by_title = {(entry.type, entry.title): key for key, entry in snapshot.by_key.items()}
+    matched = []
+    for result in results:
+        key = keys_by_title.get((result.get('type'), result.get('title')))
+        if key:
+            matched.append({'key': key, 'score': result.get('score', 0.0)})
+    return encode_context(matched, version)
+
+def resolve_context(stored: Optional[str], knowledge_base) -> Dict[str, Any]:
+    """
+    Full text of the entries a message was answered from. Entries are taken
+    from the current knowledge base; ``stale`` is set when it changed since
+    the message was stored, and entries removed since come back without text.
+    """
+    current_version = knowledge_base.version
+    if not stored:
+        return {'knowledge_base_version': None, 'current_version': current_version, 'stale': False, 'entries': []}
+
+    if not stored.startswith('{'):
+        # Not migrated yet: the full results were stored
+        return {'knowledge_base_version': None, 'current_version': current_version, 'stale': True,
+                'entries': parse_legacy_context(stored) or []}
+
+    reference = json.loads(stored)
+    entries = []
+    for key, score in reference.get('e', []):
+        entry = knowledge_base.get_entry(key)
+        entries.append(entry.to_result(score) if entry else {'key': key, 'score': score, 'missing': True})
+    return {
+        'knowledge_base_version': reference.get('v'),
+        'current_version': current_version,
+        'stale': reference.get('v') != current_version,
+        'entries': entries
+    }
+
+def available_codec(codec: Optional[str]) -> str:
+    """The configured codec name, with zstd falling back to zlib when zstandard is not installed"""
+    codec = (codec or 'none').lower()
+    if codec == 'zstd' and zstandard is None:
+        return 'zlib'
+    return codec
+
+def compression_settings() -> Dict[str, Any]:
+    """Codec ('zlib', 'zstd' or 'none') and size threshold from the app config"""
+    config = current_app.config if has_app_context() else {}
+    return {'codec': available_codec(config.get('MESSAGE_COMPRESSION')),
+            'min_bytes': int(config.get('MESSAGE_COMPRESSION_MIN_BYTES', 1024))}
+
+def compress_text(raw: bytes, codec: str) -> bytes:
+    if codec == 'zstd':
+        return ZSTD_TAG + zstandard.ZstdCompressor(level=3).compress(raw)
+    return ZLIB_TAG + zlib.compress(raw, 6)
+
+def decompress_text(value: bytes) -> str:
+    tag, body = value[:1], value[1:]
+    if tag == ZSTD_TAG:
+        if zstandard is None:
+            raise RuntimeError("Message body is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(body).decode('utf-8')
+    if tag == ZLIB_TAG:
+        return zlib.decompress(body).decode('utf-8')
+    raise ValueError(f"Unknown message compression tag {tag!r}")
+
+class CompressedText(TypeDecorator):
+    """
+    Text column whose large values are stored compressed.
+
+    Values of at least MESSAGE_COMPRESSION_MIN_BYTES are written as a
+    codec tag plus the compressed UTF-8 bytes when MESSAGE_COMPRESSION is
+    set. Only SQLite can keep those as BLOBs in a TEXT column, so other
+    databases always get plain text. Reads decompress BLOBs and pass text through,
+    whatever the current setting, so rows of both kinds can coexist.
+    """
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name != 'sqlite':
+            return value
+        settings = compression_settings()
+        raw = value.encode('utf-8')
+        if settings['codec'] == 'none' or len(raw) < settings['min_bytes']:
+            return value
+        compressed = compress_text(raw, settings['codec'])
+        return compressed if len(compressed) < len(raw) else value
+
+    def process_result_value(self, value, dialect):
+        if isinstance(value, bytes):
+            return decompress_text(value)
+        return value
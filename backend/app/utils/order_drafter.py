@@ -0,0 +1,182 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+from flask import current_app
+from app import db
+from app.models import ChatSession
+from app.utils.circuit_breaker import CircuitBreaker, get_llm_breaker
+from app.utils.draft_cart import update_cart
+from app.utils.knowledge_base import get_knowledge_base
+from app.utils.llm_client import LLMClient
+
+class _DraftJob:
+    """Queued or running draft of one session"""
+    __slots__ = ('future', 'running', 'rerun', 'cancelled', 'done')
+
+    def __init__(self):
+        self.future: Optional[Future] = None
+        self.running = False
+        self.rerun = False
+        self.cancelled = False
+        self.done = threading.Event()
+
+class OrderDrafter:
+    """
+    Keep draft carts current in the background.
+
+    After a chat turn with ordering intent the session's cart is updated on a
+    small thread pool, so that ``POST /orders/`` usually finds it up to date
+    and answers without an LLM call. The work is speculative and kept out of
+    the way of foreground requests:
+
+    - at most ``max_workers`` drafts run at once and ``max_pending`` sessions
+      wait; further submissions are dropped,
+    - a session has at most one job; turns arriving while it is queued are
+      picked up by it, turns arriving while it runs schedule one more pass,
+    - nothing is drafted while the LLM circuit breaker is not closed,
+    - ``settle`` (called by order creation) cancels a queued job so the
+      request drafts synchronously, or waits for a running one instead of
+      repeating its LLM call.
+    """
+
+    def __init__(self, app, max_workers: int = 2, max_pending: int = 32):
+        """
+        Args:
+            app: Flask application the drafts run in
+            max_workers (int): Concurrent drafts
+            max_pending (int): Sessions queued or running before submissions are dropped
+        """
+        self.app = app
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='order-draft')
+        self._jobs: Dict[int, _DraftJob] = {}
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.merged = 0
+        self.dropped = 0
+        self.cancelled = 0
+        self.skipped = 0
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, session_pk: int) -> bool:
+        """
+        Schedule a draft of the session's cart
+
+        Returns:
+            bool: False if the queue is full and the draft was dropped
+        """
+        with self._lock:
+            job = self._jobs.get(session_pk)
+            if job is not None:
+                # A queued job reads the newest messages anyway; a running one goes again
+                job.rerun = job.running
+                self.merged += 1
+                return True
+            if len(self._jobs) >= self.max_pending:
+                self.dropped += 1
+                return False
+            job = _DraftJob()
+            self._jobs[session_pk] = job
+            self.submitted += 1
+            job.future = self._executor.submit(self._run, session_pk, job)
+        return True
+
+    def settle(self, session_pk: int, timeout: float) -> bool:
+        """
+        Make way for a synchronous draft: cancel the session's queued job or
+        wait up to ``timeout`` seconds for its running one
+
+        Returns:
+            bool: True if no background draft of the session is still running
+        """
+        with self._lock:
+            job = self._jobs.get(session_pk)
+            if job is None:
+                return True
+            if not job.running:
+                job.cancelled = True
+                job.future.cancel()
+                del self._jobs[session_pk]
+                self.cancelled += 1
+                return True
+            job.rerun = False
+        return job.done.wait(timeout)
+
+    def shutdown(self):
+        """Cancel queued drafts and wait for running ones"""
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancelled = True
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _run(self, session_pk: int, job: _DraftJob):
+        with self._lock:
+            if job.cancelled:
+                return
+            job.running = True
+        try:
+            while True:
+                self._draft(session_pk)
+                with self._lock:
+                    if not job.rerun or job.cancelled:
+                        break
+                    job.rerun = False
+        finally:
+            with self._lock:
+                if self._jobs.get(session_pk) is job:
+                    del self._jobs[session_pk]
+            job.done.set()
+
+    def _draft(self, session_pk: int):
+        with self.app.app_context():
+            if get_llm_breaker().state != CircuitBreaker.CLOSED:
+                with self._lock:
+                    self.skipped += 1
+                return
+            try:
+                chat_session = db.session.get(ChatSession, session_pk)
+                if chat_session is not None:
+                    update_cart(chat_session, get_knowledge_base().catalog, LLMClient())
+                    db.session.commit()
+                with self._lock:
+                    self.completed += 1
+            except Exception as e:
+                db.session.rollback()
+                logging.warning(f"Background order draft of session {session_pk} failed: {str(e)}")
+                with self._lock:
+                    self.failed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for debug endpoints"""
+        with self._lock:
+            return {
+                'submitted': self.submitted,
+                'merged': self.merged,
+                'dropped': self.dropped,
+                'cancelled': self.cancelled,
+                'skipped': self.skipped,
+                'completed': self.completed,
+                'failed': self.failed,
+                'pending': len(self._jobs)
+            }
+
+_order_drafter: Optional[OrderDrafter] = None
+_order_drafter_lock = threading.Lock()
+
+def get_order_drafter() -> Optional[OrderDrafter]:
+    """Process-wide background order drafter configured from the app config (None when disabled)"""
+    global _order_drafter
+    if _order_drafter is None:
+        config = current_app.config
+        if not config.get('ORDER_DRAFT_ENABLED', True):
+            return None
+        with _order_drafter_lock:
+            if _order_drafter is None:
+                _order_drafter = OrderDrafter(
+                    current_app._get_current_object(),
+                    max_workers=int(config.get('ORDER_DRAFT_WORKERS', 2)),
+                    max_pending=int(config.get('ORDER_DRAFT_QUEUE_SIZE', 32))
+                )
+    return _order_drafter
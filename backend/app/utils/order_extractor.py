@@ -0,0 +1,359 @@
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.utils.menu_catalog import CatalogItem, MenuCatalog, fold_word
+
+_SENTENCE_RE = re.compile(r"[^.!?;\n]+[.!?;]?")
+_WORD_RE = re.compile(r"[a-z0-9ñáéíóúü&']+")
+_TIMES_RE = re.compile(r"^(?:(\d+)x|x(\d+))$")
+
+NUMBER_WORDS = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7, 'eight': 8,
+    'nine': 9, 'ten': 10, 'single': 1, 'couple': 2, 'pair': 2, 'dozen': 12
+}
+INDEFINITE_WORDS = {'a', 'an', 'another'}
+VAGUE_QUANTITY_WORDS = {'few': 3, 'several': 3}
+MAX_QUANTITY = 20
+
+# Words allowed between a quantity and the item ("2 orders of", "a side of the ...")
+QUANTITY_FILLERS = {'of', 'order', 'orders', 'serving', 'servings', 'portion', 'portions', 'side', 'sides', 'the', 'your'}
+
+# Ordering intent ("I'd like", "can I get", "I'll have", ...)
+INTENT_WORDS = {'want', 'like', 'have', 'take', 'get', 'order', 'need', 'give', 'gimme', 'grab', 'add', 'please'}
+
+# Anything that changes an earlier request is left to the LLM
+CORRECTION_WORDS = {'actually', 'instead', 'cancel', 'remove', 'never', 'nevermind', 'change', 'scratch',
+                    'forget', "don't", 'dont', 'not', 'minus', 'replace', 'swap'}
+
+# Customization modifiers and the label they are reported with ("without onions" -> "no onions")
+CUSTOMIZATION_MODIFIERS = {'no': 'no', 'without': 'no', 'hold': 'no', 'extra': 'extra', 'add': 'add'}
+
+# Words after a modifier that mean it is not a customization ("no thanks", "no, I want two", "add it")
+NON_TARGET_WORDS = {'thanks', 'thank', 'thx', 'problem', 'worries', 'worry', 'more', 'that', "that's", 'thats',
+                    'i', "i'm", 'im', 'it', 'one', 'way', 'need', 'idea', 'sorry', 'please', 'and', 'or',
+                    'else', 'other', 'rush', 'hurry', 'just', 'to', 'on', 'me', 'my', 'we', 'you'}
+
+# Cooking preferences and dietary needs the menu can't express; the LLM decides what to do with them
+PREFERENCE_PHRASES = {
+    ('rare',), ('medium', 'rare'), ('medium', 'well'), ('well', 'done'), ('gluten', 'free'), ('dairy', 'free'),
+    ('nut', 'free'), ('vegan',), ('vegetarian',), ('allergy',), ('allergies',), ('allergic',), ('celiac',),
+    ('halal',), ('kosher',), ('keto',)
+}
+
+# Questions starting with these ask about the menu even when they contain "have" or "get"
+QUESTION_WORDS = {'does', 'do', 'is', 'are', 'what', "what's", 'which', 'how', 'why', 'where', 'when', 'who'}
+
+# Words that refer back to something instead of naming it ("I'll take that one")
+REFERENCE_WORDS = {'it', 'that', 'this', 'one', 'those', 'them', 'these', 'same'}
+
+# Reference words that relate to an earlier order even next to an item name
+# ("another classic perfburger", "a veggie supreme, my friend wants the same")
+ORDER_REFERENCE_WORDS = {'same', 'another', 'those', 'these', 'them'}
+
+# Confidence lost per issue; with the default threshold of 0.8 any issue other
+# than a menu question sends the conversation to the LLM
+BASE_CONFIDENCE = 0.95
+ISSUE_PENALTIES = {
+    'unclear': 0.3,
+    'correction': 0.4,
+    'question': 0.1,
+    'conflict': 0.3,
+    'vague': 0.2,
+    'customization': 0.3,
+    'preference': 0.3,
+    'unavailable': 0.3,
+    'no_intent': 0.2,
+    'reference': 0.2
+}
+
+@dataclass
+class _Sentence:
+    words: List[str]
+    folded: List[str]
+    question: bool
+    intent: bool
+    offset: int  # Position of the first word in the whole conversation
+    consumed: set = field(default_factory=set)
+
+@dataclass
+class _Mention:
+    item: CatalogItem
+    position: int
+    quantity: int
+    customizations: List[str] = field(default_factory=list)
+
+def _split_sentences(conversation_text: str) -> List[_Sentence]:
+    sentences = []
+    offset = 0
+    for match in _SENTENCE_RE.finditer(conversation_text.lower()):
+        words = [word.strip("'") for word in _WORD_RE.findall(match.group())]
+        words = [word for word in words if word]
+        if not words:
+            continue
+        sentences.append(_Sentence(
+            words=words,
+            folded=[fold_word(word) for word in words],
+            question=match.group().rstrip().endswith('?'),
+            intent=any(word in INTENT_WORDS for word in words),
+            offset=offset
+        ))
+        offset += len(words)
+    return sentences
+
+def _phrase_at(catalog: MenuCatalog, folded: List[str], start: int) -> Tuple[Optional[CatalogItem], int]:
+    """Longest menu name or alias starting at ``start``, as (item, word count)"""
+    for length in range(min(catalog.max_phrase_words, len(folded) - start), 0, -1):
+        item = catalog.phrases.get(tuple(folded[start:start + length]))
+        if item is not None:
+            return item, length
+    return None, 0
+
+def _skip_fillers(words: List[str], index: int, step: int) -> int:
+    while 0 <= index < len(words) and words[index] in QUANTITY_FILLERS:
+        index += step
+    return index
+
+def _quantity_value(word: str) -> Optional[int]:
+    if word.isdigit():
+        return int(word)
+    times = _TIMES_RE.match(word)
+    if times:
+        return int(times.group(1) or times.group(2))
+    return NUMBER_WORDS.get(word)
+
+def _quantity_before(sentence: _Sentence, start: int, issues: List[Tuple[str, str]]) -> Tuple[int, bool]:
+    """Quantity bound to the mention starting at ``start`` as (quantity, explicit)"""
+    words = sentence.words
+    index = _skip_fillers(words, start - 1, -1)
+    quantity = None
+    if index >= 0:
+        word = words[index]
+        quantity = _quantity_value(word)
+        if word in INDEFINITE_WORDS:
+            quantity = 1
+        elif word in VAGUE_QUANTITY_WORDS:
+            quantity = VAGUE_QUANTITY_WORDS[word]
+            issues.append(('vague', f"vague quantity '{word}'"))
+    if quantity is None:
+        return 1, False
+    if not 1 <= quantity <= MAX_QUANTITY:
+        issues.append(('unclear', f"quantity {quantity} is out of range"))
+        return max(1, min(quantity, MAX_QUANTITY)), True
+    return quantity, True
+
+def _customization_at(catalog: MenuCatalog, sentence: _Sentence, index: int) -> Tuple[Optional[Tuple[str, ...]], int, Optional[str]]:
+    """
+    Ingredient named after the modifier at ``index``
+
+    Returns:
+        tuple: (folded ingredient words or None, words used, raw ingredient text)
+    """
+    words, folded = sentence.words, sentence.folded
+    start = index + 1
+    while start < len(words) and words[start] in ('the', 'any', 'some'):
+        start += 1
+    for length in (2, 1):
+        candidate = folded[start:start + length]
+        if len(candidate) == length and all(word in catalog.ingredient_vocabulary for word in candidate):
+            return tuple(candidate), start + length - index, ' '.join(words[start:start + length])
+    return None, 0, None
+
+def _customization_target(sentence: _Sentence, index: int) -> Optional[str]:
+    """
+    Word a modifier at ``index`` applies to when it is not an ingredient or
+    menu item ("no pickles", "extra napkins"), or None if the modifier
+    does not introduce one ("no thanks", "add 2 fries")
+    """
+    words = sentence.words
+    start = index + 1
+    while start < len(words) and words[start] in ('the', 'any', 'some'):
+        start += 1
+    if start >= len(words):
+        return None
+    word = words[start]
+    if word in NON_TARGET_WORDS or word in INDEFINITE_WORDS or _quantity_value(word) is not None:
+        return None
+    return word
+
+def _preferences(sentence: _Sentence) -> List[str]:
+    """Cooking preference and diet phrases in the sentence ("well done", "gluten free")"""
+    words = sentence.words
+    found = []
+    start = 0
+    while start < len(words):
+        length = next((length for length in (2, 1) if tuple(words[start:start + length]) in PREFERENCE_PHRASES), 0)
+        if length:
+            found.append(' '.join(words[start:start + length]))
+        start += length or 1
+    return found
+
+def _has_ingredient(item: CatalogItem, ingredient: Tuple[str, ...]) -> bool:
+    return any(set(ingredient) <= set(words) for words in item.ingredient_words)
+
+def extract_order(conversation_text: str, catalog: MenuCatalog,
+                  categories: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Extract order items from user messages with deterministic rules.
+
+    Item names and aliases are matched as whole phrases (longest first), each
+    mention takes the quantity written right before it ("two", "a couple of",
+    "3 orders of", "2x") and "no X / without X / extra X / add X" are bound to
+    the nearest item and checked against its ingredients. Everything the rules
+    cannot settle (generic or unknown items, corrections, references such as
+    "I'll take that one", modifiers of unknown ingredients like "no pickles",
+    cooking or diet preferences like "well done") lowers the confidence so the
+    caller can fall back to the LLM.
+
+    Args:
+        conversation_text (str): Combined user messages
+        catalog (MenuCatalog): Menu to match against
+        categories (iterable): Orderable categories; defaults to all of them
+
+    Returns:
+        dict: Same shape as LLMClient.analyze_conversation_for_order, plus
+            'issues' (the kind of every problem found, e.g. 'unclear')
+    """
+    orderable = set(categories) if categories is not None else {item.category for item in catalog.items}
+    sentences = _split_sentences(conversation_text)
+    issues: List[Tuple[str, str]] = []
+    mentions: List[_Mention] = []
+    customizations: List[Tuple[int, int, str, Tuple[str, ...]]] = []  # (position, sentence index, label, ingredient)
+    unavailable: List[str] = []
+    unclear: List[str] = []
+
+    for sentence_index, sentence in enumerate(sentences):
+        words, folded = sentence.words, sentence.folded
+        informational = sentence.question and (not sentence.intent or words[0] in QUESTION_WORDS)
+        mentioned = False
+        index = 0
+        while index < len(words):
+            word = words[index]
+            if index in sentence.consumed:
+                index += 1
+                continue
+
+            modifier = CUSTOMIZATION_MODIFIERS.get(word)
+            if modifier and (word != 'hold' or words[index + 1:index + 2] == ['the']):
+                item, length = _phrase_at(catalog, folded, _skip_fillers(words, index + 1, 1))
+                if item is not None and modifier == 'no':
+                    # "no fries" takes something back
+                    issues.append(('correction', f"'{word} {item.name}'"))
+                    end = _skip_fillers(words, index + 1, 1) + length
+                    sentence.consumed.update(range(index, end))
+                    index = end
+                    continue
+                if item is None:
+                    ingredient, used, raw = _customization_at(catalog, sentence, index)
+                    if ingredient:
+                        if not informational:
+                            customizations.append((sentence.offset + index, sentence_index, f"{modifier} {raw}", ingredient))
+                        sentence.consumed.update(range(index, index + used))
+                        index += used
+                        continue
+                    target_word = _customization_target(sentence, index)
+                    if target_word and not informational:
+                        # Not an ingredient of any item ("no pickles", "no ice"); the instruction must not be lost
+                        issues.append(('customization', f"'{word} {target_word}' is not a known ingredient"))
+
+            item, length = _phrase_at(catalog, folded, index)
+            if item is not None:
+                mentioned = True
+                sentence.consumed.update(range(index, index + length))
+                if informational:
+                    issues.append(('question', f"asked about {item.name}"))
+                elif item.category not in orderable:
+                    issues.append(('unavailable', f"{item.name} cannot be ordered on its own"))
+                    if item.name not in unavailable:
+                        unavailable.append(item.name)
+                else:
+                    quantity, explicit = _quantity_before(sentence, index, issues)
+                    suffix = words[index + length] if index + length < len(words) else ''
+                    if not explicit and _TIMES_RE.match(suffix):
+                        quantity = _quantity_value(suffix)
+                        sentence.consumed.add(index + length)
+                    mentions.append(_Mention(item, sentence.offset + index, quantity))
+                index += length
+                continue
+
+            if not informational:
+                if word in CORRECTION_WORDS:
+                    issues.append(('correction', f"'{word}'"))
+                elif _quantity_value(word) is not None or word in VAGUE_QUANTITY_WORDS or (
+                        word in INDEFINITE_WORDS and index > 0 and words[index - 1] in INTENT_WORDS | {'and', 'plus', 'also', 'with'}):
+                    target = _skip_fillers(words, index + 1, 1)
+                    if _phrase_at(catalog, folded, target)[0] is None and not (word == 'a' and words[index + 1:index + 2] in (['couple'], ['few'])):
+                        text = ' '.join(words[index:target + 1])
+                        issues.append(('unclear', f"'{text}' is not on the menu"))
+                        unclear.append(text)
+            index += 1
+
+        if not informational:
+            for phrase in _preferences(sentence):
+                issues.append(('preference', f"'{phrase}' is not a menu option"))
+            # Menu words that are not part of a full item name ("the veggie", "a burger")
+            for position, folded_word in enumerate(folded):
+                if position not in sentence.consumed and folded_word in catalog.name_vocabulary:
+                    issues.append(('unclear', f"'{words[position]}' does not name a single item"))
+                    unclear.append(words[position])
+            if sentence.intent and not mentioned and any(word in REFERENCE_WORDS for word in words):
+                issues.append(('reference', 'refers to an item without naming it'))
+            elif mentioned and any(word in ORDER_REFERENCE_WORDS for word in words):
+                issues.append(('reference', 'refers to an earlier item'))
+
+    if mentions and not any(sentence.intent for sentence in sentences):
+        issues.append(('no_intent', 'no ordering intent'))
+
+    # Customizations bind to the last item before them, or the next one in the same sentence
+    # ("extra avocado on a veggie supreme"), whichever has the ingredient
+    for position, sentence_index, label, ingredient in customizations:
+        sentence = sentences[sentence_index]
+        before = [mention for mention in mentions if mention.position < position][-1:]
+        after = [mention for mention in mentions
+                 if position < mention.position < sentence.offset + len(sentence.words)][:1]
+        target = next((mention for mention in before + after if _has_ingredient(mention.item, ingredient)), None)
+        if target is None:
+            nearest = (before + after)[0].item.name if before + after else 'any item'
+            issues.append(('customization', f"'{label}' does not apply to {nearest}"))
+            continue
+        if label not in target.customizations:
+            target.customizations.append(label)
+
+    # One line per item and customizations. Quantities of repeated mentions add up, but a
+    # repeat may also restate the same item ("a lemonade. Yes, a lemonade"), so it is a conflict
+    lines: Dict[Tuple[str, Tuple[str, ...]], Dict[str, Any]] = {}
+    for mention in mentions:
+        key = (mention.item.name, tuple(mention.customizations))
+        line = lines.get(key)
+        if line is None:
+            lines[key] = {'item': mention.item, 'quantity': mention.quantity,
+                          'customizations': mention.customizations, 'mentions': 1}
+        else:
+            line['quantity'] = min(MAX_QUANTITY, line['quantity'] + mention.quantity)
+            line['mentions'] += 1
+    for line in lines.values():
+        if line['mentions'] > 1:
+            issues.append(('conflict', f"{line['item'].name} mentioned {line['mentions']} times"))
+
+    items = [{
+        'name': line['item'].name,
+        'quantity': line['quantity'],
+        'customizations': line['customizations'],
+        'price': line['item'].price,
+        'category': line['item'].category
+    } for line in lines.values()]
+
+    confidence = 0.0
+    if items:
+        confidence = max(0.0, BASE_CONFIDENCE - sum(ISSUE_PENALTIES[kind] for kind, _ in issues))
+    reasoning = f"Rule-based extraction found {len(items)} item(s)"
+    if issues:
+        reasoning += ": " + "; ".join(message for _, message in issues)
+
+    return {
+        'items': items,
+        'confidence': round(confidence, 2),
+        'reasoning': reasoning,
+        'unavailable_items': unavailable,
+        'unclear_items': unclear,
+        'issues': [kind for kind, _ in issues]
+    }
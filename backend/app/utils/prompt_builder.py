@@ -0,0 +1,138 @@
+import re
+import textwrap
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Per-message overhead of the chat format (role, separators) and reply priming
+MESSAGE_OVERHEAD_TOKENS = 4
+REPLY_PRIMING_TOKENS = 3
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """
+    Fast local token estimate for OpenAI BPE tokenizers.
+
+    Words count as one token plus one per further 6 characters, and every
+    punctuation mark or symbol as one token. Close enough to budget prompts
+    without shipping a tokenizer.
+    """
+    if not text:
+        return 0
+    tokens = 0
+    for piece in _PIECE_RE.findall(text):
+        tokens += 1 + (len(piece) - 1) // 6 if piece[0].isalnum() or piece[0] == '_' else 1
+    return tokens
+
+def estimate_message_tokens(messages: List[Dict[str, str]]) -> int:
+    """Estimate the prompt tokens of a chat completion message list"""
+    return sum(MESSAGE_OVERHEAD_TOKENS + estimate_tokens(message.get('content')) for message in messages) + REPLY_PRIMING_TOKENS
+
+def compact_whitespace(text: str) -> str:
+    """Remove indentation and blank-line runs from a triple-quoted prompt"""
+    lines = [line.strip() for line in textwrap.dedent(text).strip().splitlines()]
+    compacted = []
+    for line in lines:
+        if line or (compacted and compacted[-1]):
+            compacted.append(line)
+    return '\n'.join(compacted)
+
+def select_context(context: List[Any], budget: int, format_context: Callable[[List[Any]], str]) -> List[Any]:
+    """
+    Deduplicate context entries and drop the lowest-scored ones until the
+    formatted context fits the token budget. Kept entries stay in their
+    original order.
+    """
+    unique = []
+    seen = set()
+    for item in context:
+        key = (item.get('title'), item.get('content')) if isinstance(item, dict) else str(item)
+        if key not in seen:
+            seen.add(key)
+            unique.append(item)
+    if not unique:
+        return []
+
+    costs = [
+        estimate_tokens(f"**{item.get('title')}**\n{item.get('content')}" if isinstance(item, dict) else str(item))
+        for item in unique
+    ]
+    overhead = estimate_tokens(format_context(unique)) - sum(costs)
+    total = overhead + sum(costs)
+
+    # Lowest score first; later entries lose ties since retrieve already ranks them
+    drop_order = sorted(
+        range(len(unique)),
+        key=lambda i: (unique[i].get('score', 0) if isinstance(unique[i], dict) else 0, -i)
+    )
+    dropped = set()
+    for index in drop_order:
+        if total <= budget:
+            break
+        dropped.add(index)
+        total -= costs[index]
+
+    return [item for i, item in enumerate(unique) if i not in dropped]
+
+def pack_prompt(system_prompt: str, user_message: str, context: Optional[List[Any]],
+                chat_history: Optional[List[Dict[str, str]]], budget: int,
+                format_context: Callable[[List[Any]], str],
+                context_intro: str = '', max_history: int = 10,
+                reserved_history: int = 2,
+                summary: Optional[str] = None) -> Tuple[List[Dict[str, str]], Dict[str, int]]:
+    """
+    Assemble chat completion messages within a token budget.
+
+    The system prompt, the conversation summary (if any, as a second system
+    message) and the user message are always sent. The most recent
+    ``reserved_history`` messages are kept ahead of context, then context
+    fills what is left (lowest-scored entries dropped first), then older
+    history is added newest-first while it still fits.
+
+    Returns:
+        tuple: (messages, stats) where stats holds token counts and what was dropped
+    """
+    history = list(chat_history or [])[-max_history:]
+    summary_message = {'role': 'system', 'content': summary} if summary else None
+    fixed = estimate_message_tokens([
+        {'role': 'system', 'content': system_prompt},
+        *([summary_message] if summary_message else []),
+        {'role': 'user', 'content': user_message}
+    ])
+
+    reserved = history[-reserved_history:] if reserved_history else []
+    remaining = budget - fixed - sum(MESSAGE_OVERHEAD_TOKENS + estimate_tokens(m.get('content')) for m in reserved)
+
+    kept_context = []
+    context_message = None
+    if context:
+        available = remaining - MESSAGE_OVERHEAD_TOKENS - estimate_tokens(context_intro)
+        kept_context = select_context(context, available, format_context)
+        if kept_context:
+            context_message = {'role': 'system', 'content': context_intro + format_context(kept_context)}
+            remaining -= MESSAGE_OVERHEAD_TOKENS + estimate_tokens(context_message['content'])
+
+    kept_history = list(reserved)
+    for message in reversed(history[:len(history) - len(reserved)]):
+        cost = MESSAGE_OVERHEAD_TOKENS + estimate_tokens(message.get('content'))
+        if cost > remaining:
+            break
+        kept_history.insert(0, message)
+        remaining -= cost
+
+    messages = [{'role': 'system', 'content': system_prompt}]
+    if summary_message:
+        messages.append(summary_message)
+    if context_message:
+        messages.append(context_message)
+    messages.extend(kept_history)
+    messages.append({'role': 'user', 'content': user_message})
+
+    stats = {
+        'prompt_tokens': estimate_message_tokens(messages),
+        'budget': budget,
+        'context_items': len(kept_context),
+        'context_dropped': len(context or []) - len(kept_context),
+        'history_messages': len(kept_history),
+        'history_dropped': len(history) - len(kept_history)
+    }
+    return messages, stats
@@ -0,0 +1,249 @@
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from flask import current_app
+from sqlalchemy import delete, func, insert, select, update
+from app import db
+from app.models import ChatArchive, ChatMessage, ChatSession
+from app.utils.history_cache import get_history_cache
+from app.utils.message_storage import available_codec, compress_text, decompress_text
+
+def retention_settings() -> Dict[str, Any]:
+    """Archival settings from the app config"""
+    config = current_app.config
+    codec = available_codec(config.get('CHAT_ARCHIVE_COMPRESSION', 'zlib'))
+    return {
+        'days': float(config.get('CHAT_RETENTION_DAYS', 30)),
+        'batch_size': int(config.get('CHAT_ARCHIVE_BATCH_SIZE', 50)),
+        'batch_messages': int(config.get('CHAT_ARCHIVE_BATCH_MESSAGES', 2000)),
+        'vacuum_pages': int(config.get('CHAT_ARCHIVE_VACUUM_PAGES', 2000)),
+        'codec': codec if codec != 'none' else 'zlib'  # Archives are always compressed
+    }
+
+def find_idle_sessions(cutoff: datetime, limit: int, after_pk: int = 0):
+    """Active sessions without activity since ``cutoff``, in id order after ``after_pk``"""
+    recent = select(ChatMessage.id).where(ChatMessage.session_id == ChatSession.id, ChatMessage.timestamp >= cutoff)
+    return db.session.execute(
+        select(ChatSession.id, ChatSession.last_message_id).where(
+            ChatSession.id > after_pk,
+            ChatSession.is_active.is_not(False),
+            ChatSession.updated_at < cutoff,
+            ~recent.exists()
+        ).order_by(ChatSession.id).limit(limit)
+    ).all()
+
+def archive_session(session_pk: int, last_message_id: Optional[int], codec: str) -> Optional[Dict[str, int]]:
+    """
+    Move a session's messages into one compressed ChatArchive row and
+    deactivate the session, in the caller's transaction.
+
+    The session is claimed first with a conditional update: it only
+    succeeds if no message was added since the session was selected
+    (``last_message_id`` is unchanged), and on SQLite it takes the write
+    lock, so nothing can be added before the transaction commits. Returns
+    None when the session was skipped.
+    """
+    claimed = db.session.execute(
+        update(ChatSession).where(
+            ChatSession.id == session_pk,
+            ChatSession.is_active.is_not(False),
+            ChatSession.last_message_id.is_not_distinct_from(last_message_id)
+        ).values(is_active=False, last_message_id=None, updated_at=ChatSession.updated_at)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        return None
+
+    rows = db.session.execute(
+        select(ChatMessage.id, ChatMessage.message_type, ChatMessage.content,
+               ChatMessage.timestamp, ChatMessage.retrieved_context)
+        .where(ChatMessage.session_id == session_pk).order_by(ChatMessage.id)
+    ).all()
+    if not rows:
+        return {'messages': 0, 'raw_bytes': 0, 'archived_bytes': 0}
+
+    document = json.dumps({'messages': [{
+        'id': row.id,
+        'type': row.message_type,
+        'content': row.content,
+        'timestamp': row.timestamp.isoformat() if row.timestamp else None,
+        'context': row.retrieved_context
+    } for row in rows]}, separators=(',', ':')).encode('utf-8')
+    payload = compress_text(document, codec)
+
+    db.session.execute(insert(ChatArchive).values(
+        session_id=session_pk,
+        message_count=len(rows),
+        raw_bytes=len(document),
+        last_message_at=rows[-1].timestamp,
+        archived_at=datetime.utcnow(),
+        payload=payload
+    ))
+    db.session.execute(
+        delete(ChatMessage).where(ChatMessage.session_id == session_pk)
+        .execution_options(synchronize_session=False)
+    )
+    return {'messages': len(rows), 'raw_bytes': len(document), 'archived_bytes': len(payload)}
+
+def archive_idle_sessions(days: Optional[float] = None, batch_size: Optional[int] = None,
+                          vacuum_pages: Optional[int] = None, pause: float = 0.0,
+                          dry_run: bool = False, log=logging.info) -> Dict[str, int]:
+    """
+    Archive every session idle for more than ``days``.
+
+    Sessions are archived in batches of at most ``batch_size`` sessions and
+    CHAT_ARCHIVE_BATCH_MESSAGES messages, each in its own transaction, so
+    live writers wait for one short batch at most. After each batch up to
+    ``vacuum_pages`` freed pages are returned to the filesystem, and the job
+    sleeps ``pause`` seconds to let queued writers through.
+    """
+    settings = retention_settings()
+    days = settings['days'] if days is None else days
+    batch_size = batch_size or settings['batch_size']
+    vacuum_pages = settings['vacuum_pages'] if vacuum_pages is None else vacuum_pages
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    history_cache = get_history_cache()
+
+    stats = {'sessions': 0, 'skipped': 0, 'messages': 0, 'raw_bytes': 0, 'archived_bytes': 0,
+             'batches': 0, 'freed_pages': 0}
+    after_pk = 0
+    while True:
+        candidates = find_idle_sessions(cutoff, batch_size, after_pk)
+        db.session.commit()  # The batch's write transaction must not start from an older read
+        if not candidates:
+            break
+
+        if dry_run:
+            stats['sessions'] += len(candidates)
+            stats['messages'] += db.session.execute(
+                select(func.count(ChatMessage.id)).where(ChatMessage.session_id.in_([c.id for c in candidates]))
+            ).scalar()
+            after_pk = candidates[-1].id
+            continue
+
+        archived: List[int] = []
+        batch_messages = 0
+        try:
+            for candidate in candidates:
+                after_pk = candidate.id
+                result = archive_session(candidate.id, candidate.last_message_id, settings['codec'])
+                if result is None:
+                    stats['skipped'] += 1
+                    continue
+                archived.append(candidate.id)
+                batch_messages += result['messages']
+                for name in ('messages', 'raw_bytes', 'archived_bytes'):
+                    stats[name] += result[name]
+                if batch_messages >= settings['batch_messages']:
+                    break
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        if history_cache is not None:
+            for session_pk in archived:
+                history_cache.discard(session_pk)
+        stats['sessions'] += len(archived)
+        stats['batches'] += 1
+        stats['freed_pages'] += incremental_vacuum(vacuum_pages)
+        log(f"Archived {len(archived)} sessions ({batch_messages} messages), up to session {after_pk}")
+        if pause:
+            time.sleep(pause)
+
+    return stats
+
+def rehydrate_session(chat_session: ChatSession) -> int:
+    """
+    Move an archived session's messages back into chat_message and
+    reactivate it; returns the number of messages restored.
+
+    Messages keep their ids unless one was reused since archival, in which
+    case all of them get new ids after the current maximum and the summary
+    and draft cart watermarks are moved along.
+    """
+    session_pk = chat_session.id
+    claimed = db.session.execute(
+        update(ChatSession).where(ChatSession.id == session_pk, ChatSession.is_active.is_(False))
+        .values(is_active=True).execution_options(synchronize_session=False)
+    ).rowcount
+    archive = db.session.execute(
+        select(ChatArchive.id, ChatArchive.payload).where(ChatArchive.session_id == session_pk)
+    ).first() if claimed else None
+    if archive is None:
+        db.session.commit()
+        return 0
+
+    messages = json.loads(decompress_text(archive.payload))['messages']
+    ids = [message['id'] for message in messages]
+    if db.session.execute(select(func.count(ChatMessage.id)).where(ChatMessage.id.in_(ids))).scalar():
+        next_id = (db.session.execute(select(func.max(ChatMessage.id))).scalar() or 0) + 1
+        id_map = {old_id: next_id + offset for offset, old_id in enumerate(ids)}
+    else:
+        id_map = {old_id: old_id for old_id in ids}
+
+    db.session.execute(insert(ChatMessage), [{
+        'id': id_map[message['id']],
+        'session_id': session_pk,
+        'message_type': message['type'],
+        'content': message['content'],
+        'timestamp': datetime.fromisoformat(message['timestamp']) if message['timestamp'] else None,
+        'retrieved_context': message['context']
+    } for message in messages])
+
+    watermarks = db.session.execute(
+        select(ChatSession.summary_message_id, ChatSession.cart_message_id).where(ChatSession.id == session_pk)
+    ).one()
+    db.session.execute(
+        update(ChatSession).where(ChatSession.id == session_pk).values(
+            last_message_id=id_map[ids[-1]],
+            summary_message_id=_remap_watermark(watermarks.summary_message_id, id_map),
+            cart_message_id=_remap_watermark(watermarks.cart_message_id, id_map)
+        ).execution_options(synchronize_session=False)
+    )
+    db.session.execute(delete(ChatArchive).where(ChatArchive.id == archive.id))
+    db.session.commit()
+
+    history_cache = get_history_cache()
+    if history_cache is not None:
+        history_cache.discard(session_pk)
+    logging.info(f"Rehydrated chat session {chat_session.session_id} with {len(messages)} messages")
+    return len(messages)
+
+def _remap_watermark(watermark: Optional[int], id_map: Dict[int, int]) -> Optional[int]:
+    """New id of the newest restored message at or before ``watermark``"""
+    if watermark is None:
+        return None
+    earlier = [new_id for old_id, new_id in id_map.items() if old_id <= watermark]
+    return max(earlier) if earlier else min(id_map.values()) - 1
+
+def incremental_vacuum(pages: int = 0) -> int:
+    """
+    Return up to ``pages`` free pages (all of them when 0) to the
+    filesystem; returns the number freed. Needs ``auto_vacuum=INCREMENTAL``,
+    which only new databases get automatically (see enable_incremental_vacuum).
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return 0
+    with db.engine.connect() as connection:
+        if connection.exec_driver_sql('PRAGMA auto_vacuum').scalar() != 2:
+            return 0
+        free_before = connection.exec_driver_sql('PRAGMA freelist_count').scalar()
+        # execute() would step the pragma once and free a single page; executescript runs it to completion
+        connection.connection.dbapi_connection.executescript(
+            f'PRAGMA incremental_vacuum({int(pages)})' if pages > 0 else 'PRAGMA incremental_vacuum')
+        return free_before - connection.exec_driver_sql('PRAGMA freelist_count').scalar()
+
+def enable_incremental_vacuum() -> bool:
+    """Switch an existing SQLite database to auto_vacuum=INCREMENTAL; rebuilds the file with a full VACUUM"""
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    db.session.close()
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        if connection.exec_driver_sql('PRAGMA auto_vacuum').scalar() == 2:
+            return False
+        connection.exec_driver_sql('PRAGMA auto_vacuum=INCREMENTAL')
+        connection.exec_driver_sql('VACUUM')
+    return True
@@ -0,0 +1,54 @@
+import logging
+from sqlalchemy import inspect
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import CreateColumn
+
+def add_missing_columns(db):
+    """
+    Add model columns that are missing from existing tables.
+
+    ``db.create_all()`` only creates missing tables, so databases created
+    before a column was added to a model would fail on every query touching
+    it. Only nullable columns (or ones with a server default) are added;
+    anything else needs ``recreate_db.py``.
+    """
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            if not column.nullable and column.server_default is None:
+                logging.warning(f"Cannot add NOT NULL column {table.name}.{column.name}; run recreate_db.py")
+                continue
+            ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+            try:
+                with db.engine.begin() as conn:
+                    conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {ddl}')
+                logging.info(f"Added column {table.name}.{column.name}")
+            except OperationalError as e:
+                # Another worker starting at the same time may have added it first
+                logging.info(f"Column {table.name}.{column.name} not added: {str(e)}")
+
+def add_missing_indexes(db):
+    """Create model indexes that are missing from existing tables (``db.create_all()`` skips them)"""
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                continue
+            try:
+                index.create(bind=db.engine, checkfirst=True)
+                logging.info(f"Created index {index.name} on {table.name}")
+            except OperationalError as e:
+                # Another worker starting at the same time may have created it first
+                logging.info(f"Index {index.name} not created: {str(e)}")
@@ -0,0 +1,172 @@
+import os
+import time
+import zlib
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+from flask import current_app
+
+try:
+    import fcntl
+except ImportError:  # Windows: cross-worker coalescing is unavailable
+    fcntl = None
+
+class _Flight:
+    """One in-flight call and the requests waiting on it"""
+    __slots__ = ('event', 'result', 'error', 'followers')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls onto one execution.
+
+    Within a worker, the first caller for a key runs the function and later
+    callers wait for its result. With a ``lock_dir``, the leader also takes
+    an exclusive file lock so leaders in other workers wait for it too and
+    then read the result through ``lookup`` (typically the shared completion
+    cache) instead of repeating the call.
+    """
+
+    def __init__(self, lock_dir: Optional[str] = None, wait_timeout: float = 60.0,
+                 lock_buckets: int = 4096, poll_interval: float = 0.05):
+        """
+        Args:
+            lock_dir (str): Directory for cross-worker lock files; None coalesces within the process only
+            wait_timeout (float): Seconds a waiting caller gives up after and makes its own call
+            lock_buckets (int): Number of lock files keys are hashed onto
+            poll_interval (float): Seconds between attempts to take a held file lock
+        """
+        if lock_dir and fcntl is None:
+            logging.warning("File locks are not supported on this platform; coalescing within the process only")
+            lock_dir = None
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+        self.lock_dir = lock_dir
+        self.wait_timeout = wait_timeout
+        self.lock_buckets = lock_buckets
+        self.poll_interval = poll_interval
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.cross_worker_coalesced = 0
+        self.timeouts = 0
+
+    def do(self, key: str, fn: Callable[[], Any], lookup: Optional[Callable[[], Any]] = None) -> Tuple[Any, bool]:
+        """
+        Run fn once for all concurrent callers with the same key
+
+        Args:
+            key (str): Identity of the call, e.g. a prompt hash
+            fn (callable): The call to make
+            lookup (callable): Returns another worker's stored result, or None
+
+        Returns:
+            tuple: (result, shared) where shared is True if another caller made the call
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.leaders += 1
+            else:
+                flight.followers += 1
+
+        if not leader:
+            if flight.event.wait(self.wait_timeout):
+                with self._lock:
+                    self.coalesced += 1
+                if flight.error is not None:
+                    raise flight.error
+                return flight.result, True
+            with self._lock:
+                self.timeouts += 1
+            logging.warning(f"Timed out waiting for coalesced call {key[:12]}, calling directly")
+            return fn(), False
+
+        try:
+            flight.result, shared = self._run_leader(key, fn, lookup)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+            if flight.followers:
+                logging.info(f"Coalesced {flight.followers} identical request(s) onto call {key[:12]}")
+        return flight.result, shared
+
+    def _run_leader(self, key: str, fn: Callable[[], Any], lookup: Optional[Callable[[], Any]]) -> Tuple[Any, bool]:
+        if not self.lock_dir or lookup is None:
+            return fn(), False
+
+        bucket = zlib.crc32(key.encode('utf-8')) % self.lock_buckets
+        path = os.path.join(self.lock_dir, f"{bucket:04x}.lock")
+        with open(path, 'a') as handle:
+            if not self._acquire(handle, wait=False):
+                # Another worker is making this call; wait for it to finish and reuse its result
+                acquired = self._acquire(handle, wait=True)
+                result = lookup()
+                if result is not None:
+                    with self._lock:
+                        self.cross_worker_coalesced += 1
+                    if acquired:
+                        fcntl.flock(handle, fcntl.LOCK_UN)
+                    return result, True
+                if not acquired:
+                    with self._lock:
+                        self.timeouts += 1
+                    return fn(), False
+            try:
+                return fn(), False
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _acquire(self, handle, wait: bool) -> bool:
+        # Poll instead of blocking so a gevent worker keeps serving other requests
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if not wait or time.monotonic() >= deadline:
+                    return False
+                time.sleep(self.poll_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for debug endpoints"""
+        with self._lock:
+            return {
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'cross_worker_coalesced': self.cross_worker_coalesced,
+                'timeouts': self.timeouts,
+                'in_flight': len(self._flights),
+                'lock_dir': self.lock_dir
+            }
+
+_single_flight: Optional[SingleFlight] = None
+_single_flight_lock = threading.Lock()
+
+def get_single_flight() -> Optional[SingleFlight]:
+    """Process-wide LLM call coalescer configured from the app config (None when disabled)"""
+    global _single_flight
+    if _single_flight is None:
+        config = current_app.config
+        if not config.get('LLM_COALESCE_ENABLED', True):
+            return None
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight(
+                    lock_dir=config.get('LLM_COALESCE_LOCK_DIR') or None,
+                    wait_timeout=float(config.get('LLM_COALESCE_TIMEOUT', 60))
+                )
+    return _single_flight
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Archive idle chat sessions for PerfBurger Chatbot
+
+Sessions without messages for CHAT_RETENTION_DAYS are deactivated and their
+messages moved into one compressed chat_archive row per session. Each batch
+is its own short transaction, so the job can run next to the app (e.g.
+nightly from cron); freed pages are returned to the filesystem after every
+batch when the database uses auto_vacuum=INCREMENTAL.
+
+Archived sessions come back on POST /chat/sessions/<session_id>/rehydrate,
+or automatically when the user chats in them again.
+
+Usage:
+    python archive_sessions.py [--days 30] [--batch-size 50] [--pause 0.1] [--dry-run]
+    python archive_sessions.py --enable-incremental-vacuum
+"""
+
+import argparse
+from sqlalchemy import text
+from app import create_app, db
+from app.utils.database import database_size
+from app.utils.retention import archive_idle_sessions, enable_incremental_vacuum
+
+def archive_sessions(days=None, batch_size=None, pause=0.1, dry_run=False, enable_vacuum=False):
+    """Archive idle sessions and report how much space was released"""
+    app = create_app()
+    with app.app_context():
+        if enable_vacuum:
+            print("🔧 Switching the database to incremental vacuum (rebuilds the file, blocks writers)...")
+            if enable_incremental_vacuum():
+                print("✅ auto_vacuum=INCREMENTAL; archiving now returns freed pages to the filesystem")
+            else:
+                print("ℹ️  Incremental vacuum is already enabled (or the database is not SQLite)")
+            return True
+
+        if db.engine.dialect.name == 'sqlite' and db.session.execute(text('PRAGMA auto_vacuum')).scalar() != 2:
+            print("⚠️  auto_vacuum is not INCREMENTAL: freed pages are reused but the file won't shrink "
+                  "(run with --enable-incremental-vacuum once)")
+
+        print(f"📦 Archiving chat sessions idle for {days if days is not None else app.config['CHAT_RETENTION_DAYS']} days...")
+        size_before = database_size()
+        stats = archive_idle_sessions(days=days, batch_size=batch_size, pause=pause, dry_run=dry_run,
+                                      log=lambda message: print(f"   ... {message}"))
+
+        if dry_run:
+            print(f"✅ {stats['sessions']} sessions with {stats['messages']} messages would be archived (dry run)")
+            return True
+
+        print(f"✅ {stats['sessions']} sessions archived in {stats['batches']} batches, {stats['skipped']} skipped (active again)")
+        if stats['messages']:
+            print(f"   {stats['messages']} messages, {stats['raw_bytes'] / 1024:.0f} KiB -> "
+                  f"{stats['archived_bytes'] / 1024:.0f} KiB compressed")
+        size_after = database_size()
+        if size_before is not None:
+            print(f"💾 Data size: {size_before / 1024:.0f} KiB -> {size_after / 1024:.0f} KiB, "
+                  f"{stats['freed_pages']} pages returned to the filesystem")
+    return True
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Archive idle chat sessions into compressed rows')
+    parser.add_argument('--days', type=float, default=None, help='Days without messages (default: CHAT_RETENTION_DAYS)')
+    parser.add_argument('--batch-size', type=int, default=None, help='Sessions per transaction (default: CHAT_ARCHIVE_BATCH_SIZE)')
+    parser.add_argument('--pause', type=float, default=0.1, help='Seconds to wait between batches')
+    parser.add_argument('--dry-run', action='store_true', help='Count what would be archived without writing')
+    parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                        help='Switch an existing database to auto_vacuum=INCREMENTAL with one full VACUUM, then exit')
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    options = parse_args()
+    try:
+        archive_sessions(options.days, options.batch_size, options.pause, options.dry_run,
+                         options.enable_incremental_vacuum)
+    except Exception as e:
+        print(f"\n💥 Archiving failed: {str(e)}")
+        exit(1)
+    print("\n🎉 Chat session archiving completed!")
@@ -21,16 +21,98 @@ class Config:
         SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or f'sqlite:///{db_path}'
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    
+
+    # Connection pool of the engine (per worker process); pre-ping replaces connections that went stale
+    SQLALCHEMY_POOL_SIZE = int(os.environ.get('SQLALCHEMY_POOL_SIZE') or 10)
+    SQLALCHEMY_MAX_OVERFLOW = int(os.environ.get('SQLALCHEMY_MAX_OVERFLOW') or 20)
+    SQLALCHEMY_POOL_TIMEOUT = float(os.environ.get('SQLALCHEMY_POOL_TIMEOUT') or 30)  # Seconds to wait for a free connection
+    SQLALCHEMY_POOL_RECYCLE = int(os.environ.get('SQLALCHEMY_POOL_RECYCLE') or 3600)  # Seconds
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': SQLALCHEMY_POOL_SIZE,
+        'max_overflow': SQLALCHEMY_MAX_OVERFLOW,
+        'pool_timeout': SQLALCHEMY_POOL_TIMEOUT,
+        'pool_recycle': SQLALCHEMY_POOL_RECYCLE,
+        'pool_pre_ping': (os.environ.get('SQLALCHEMY_POOL_PRE_PING') or 'true').lower() == 'true'
+    }
+
+    # SQLite connection profile, applied to every new connection (ignored for other databases).
+    # WAL lets readers and the single writer proceed concurrently; it needs a local filesystem.
+    # Busy waits block the whole worker under gevent, so keep the timeout to a few seconds.
+    SQLITE_TUNING_ENABLED = (os.environ.get('SQLITE_TUNING_ENABLED') or 'true').lower() == 'true'
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE') or 'WAL'
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS') or 'NORMAL'
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS') or 5000)
+    SQLITE_AUTO_VACUUM = os.environ.get('SQLITE_AUTO_VACUUM') or 'INCREMENTAL'  # New database files only; NONE, FULL or INCREMENTAL
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE') or 268435456)  # Bytes, 0 disables memory mapping
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE') or -8000)  # Pages, or KiB when negative (per connection)
+
+    # Separate pool of query-only connections for history and order lookups
+    SQLITE_READ_POOL_ENABLED = (os.environ.get('SQLITE_READ_POOL_ENABLED') or 'false').lower() == 'true'
+    SQLITE_READ_POOL_SIZE = int(os.environ.get('SQLITE_READ_POOL_SIZE') or 10)
+
     # JWT configuration
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-string'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     
     # OpenAI configuration
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
+    OPENAI_BASE_URL = os.environ.get('OPENAI_BASE_URL') or None  # e.g. http://localhost:8001/v1 for fake_openai.py
+    LLM_PROMPT_TOKEN_BUDGET = int(os.environ.get('LLM_PROMPT_TOKEN_BUDGET') or 3000)  # Estimated prompt tokens per chat call
+    CHAT_SUMMARY_THRESHOLD = int(os.environ.get('CHAT_SUMMARY_THRESHOLD') or 12)  # Unsummarized messages before folding, 0 disables
+    CHAT_SUMMARY_KEEP_RECENT = int(os.environ.get('CHAT_SUMMARY_KEEP_RECENT') or 6)  # Newest messages kept raw when folding
+    CHAT_INTENT_ROUTER_ENABLED = (os.environ.get('CHAT_INTENT_ROUTER_ENABLED') or 'true').lower() == 'true'  # Menu/order status without the LLM
+    ORDER_EXTRACTOR_ENABLED = (os.environ.get('ORDER_EXTRACTOR_ENABLED') or 'true').lower() == 'true'  # Clear-cut orders without the LLM
+    ORDER_EXTRACTOR_MIN_CONFIDENCE = float(os.environ.get('ORDER_EXTRACTOR_MIN_CONFIDENCE') or 0.8)  # Rule-based results below go to the LLM
+    
+    # Background drafting of order carts after chat turns with ordering intent
+    ORDER_DRAFT_ENABLED = (os.environ.get('ORDER_DRAFT_ENABLED') or 'true').lower() == 'true'
+    ORDER_DRAFT_WORKERS = int(os.environ.get('ORDER_DRAFT_WORKERS') or 2)  # Concurrent drafts per worker process
+    ORDER_DRAFT_QUEUE_SIZE = int(os.environ.get('ORDER_DRAFT_QUEUE_SIZE') or 32)  # Sessions waiting before drafts are dropped
+    ORDER_DRAFT_WAIT_SECONDS = float(os.environ.get('ORDER_DRAFT_WAIT_SECONDS') or 10)  # Order creation waits this long for a running draft
+    
+    # LLM timeouts, retries and circuit breaker
+    LLM_TIMEOUT_SECONDS = float(os.environ.get('LLM_TIMEOUT_SECONDS') or 20)  # Per attempt
+    LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES') or 2)
+    LLM_RETRY_BACKOFF_SECONDS = float(os.environ.get('LLM_RETRY_BACKOFF_SECONDS') or 0.5)  # Doubles per retry, full jitter
+    LLM_RETRY_MAX_BACKOFF_SECONDS = float(os.environ.get('LLM_RETRY_MAX_BACKOFF_SECONDS') or 4)
+    LLM_RETRY_BUDGET_RATIO = float(os.environ.get('LLM_RETRY_BUDGET_RATIO') or 0.2)  # Retries per request, on average
+    LLM_BREAKER_FAILURE_THRESHOLD = int(os.environ.get('LLM_BREAKER_FAILURE_THRESHOLD') or 5)  # Consecutive failures
+    LLM_BREAKER_RECOVERY_SECONDS = float(os.environ.get('LLM_BREAKER_RECOVERY_SECONDS') or 30)
+    LLM_BREAKER_HALF_OPEN_CALLS = int(os.environ.get('LLM_BREAKER_HALF_OPEN_CALLS') or 1)
+    
+    # LLM completion cache (in-process LRU plus a SQLite file shared by all workers)
+    LLM_CACHE_ENABLED = (os.environ.get('LLM_CACHE_ENABLED') or 'true').lower() == 'true'
+    LLM_CACHE_PATH = os.environ.get('LLM_CACHE_PATH', os.path.join(os.path.dirname(db_path), 'llm_cache.db'))  # Empty keeps it in-process
+    LLM_CACHE_MEMORY_SIZE = int(os.environ.get('LLM_CACHE_MEMORY_SIZE') or 256)
+    LLM_CACHE_MAX_ROWS = int(os.environ.get('LLM_CACHE_MAX_ROWS') or 5000)
+    LLM_CACHE_TTL = float(os.environ.get('LLM_CACHE_TTL') or 3600)  # Seconds
+    
+    # Coalescing of identical in-flight LLM calls; a lock directory extends it across workers
+    LLM_COALESCE_ENABLED = (os.environ.get('LLM_COALESCE_ENABLED') or 'true').lower() == 'true'
+    LLM_COALESCE_LOCK_DIR = os.environ.get('LLM_COALESCE_LOCK_DIR') or ''
+    LLM_COALESCE_TIMEOUT = float(os.environ.get('LLM_COALESCE_TIMEOUT') or 60)  # Seconds a waiting request gives up after
     
     # Knowledge base configuration
     KNOWLEDGE_BASE_PATH = os.environ.get('KNOWLEDGE_BASE_PATH') or 'knowledge_base/'
+    KNOWLEDGE_BASE_RANKING = os.environ.get('KNOWLEDGE_BASE_RANKING') or 'keyword'  # 'keyword', 'bm25' or 'vector'
+    KNOWLEDGE_BASE_RELOAD_INTERVAL = float(os.environ.get('KNOWLEDGE_BASE_RELOAD_INTERVAL') or 30)  # Seconds, 0 disables
+    KNOWLEDGE_BASE_CACHE_SIZE = int(os.environ.get('KNOWLEDGE_BASE_CACHE_SIZE') or 512)  # Cached retrieve results, 0 disables
+    KNOWLEDGE_BASE_CACHE_TTL = float(os.environ.get('KNOWLEDGE_BASE_CACHE_TTL') or 300)  # Seconds
+    
+    # In-process cache of the newest messages per chat session, written through on every message
+    HISTORY_CACHE_SESSIONS = int(os.environ.get('HISTORY_CACHE_SESSIONS') or 1024)  # 0 disables
+    HISTORY_CACHE_MESSAGES = int(os.environ.get('HISTORY_CACHE_MESSAGES') or 20)  # Per session
+    
+    # Compression of large chat message bodies ('zlib', 'zstd' with the zstandard package, or 'none'; SQLite only)
+    MESSAGE_COMPRESSION = os.environ.get('MESSAGE_COMPRESSION') or 'none'
+    MESSAGE_COMPRESSION_MIN_BYTES = int(os.environ.get('MESSAGE_COMPRESSION_MIN_BYTES') or 1024)
+    
+    # Archival of idle chat sessions into compressed chat_archive rows (archive_sessions.py, e.g. nightly from cron)
+    CHAT_RETENTION_DAYS = float(os.environ.get('CHAT_RETENTION_DAYS') or 30)  # Days without messages before a session is archived
+    CHAT_ARCHIVE_BATCH_SIZE = int(os.environ.get('CHAT_ARCHIVE_BATCH_SIZE') or 50)  # Sessions per transaction
+    CHAT_ARCHIVE_BATCH_MESSAGES = int(os.environ.get('CHAT_ARCHIVE_BATCH_MESSAGES') or 2000)  # A batch ends once it moved this many messages
+    CHAT_ARCHIVE_VACUUM_PAGES = int(os.environ.get('CHAT_ARCHIVE_VACUUM_PAGES') or 2000)  # Free pages released after each batch, 0 releases all
+    CHAT_ARCHIVE_COMPRESSION = os.environ.get('CHAT_ARCHIVE_COMPRESSION') or 'zlib'  # 'zlib' or 'zstd' (zstandard package)
     
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -44,3 +126,7 @@ class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_ENGINE_OPTIONS = {}  # In-memory databases share one connection (StaticPool)
+    LLM_CACHE_PATH = ''
+    ORDER_DRAFT_ENABLED = False
+    HISTORY_CACHE_SESSIONS = 0  # Every test starts a new database with the same ids
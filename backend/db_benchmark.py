@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Concurrent-writer database benchmark for PerfBurger Chatbot
+
+Runs the database side of chat turns from several processes (like gunicorn
+workers) with several threads each against one SQLite file: read the
+session's history, store the user message, store the assistant reply, and
+now and then look up an order. Reports throughput, p50/p95/p99 latency per
+operation and how many operations failed (e.g. "database is locked").
+
+Usage:
+    python db_benchmark.py --processes 4 --threads 8 --duration 20
+    python db_benchmark.py --untuned   # driver defaults, for comparison
+    HISTORY_CACHE_SESSIONS=0 python db_benchmark.py   # every history read hits the database
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+MESSAGE = "I'd like 2 Classic PerfBurgers with no onions and a large Fresh Lemonade, please. " * 3
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def make_app(db_path, untuned):
+    from app import create_app
+    from config import Config
+
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+        LLM_CACHE_PATH = ''
+        ORDER_DRAFT_ENABLED = False
+
+    if untuned:
+        BenchmarkConfig.SQLITE_TUNING_ENABLED = False
+        BenchmarkConfig.SQLALCHEMY_ENGINE_OPTIONS = {}
+        BenchmarkConfig.SQLITE_READ_POOL_ENABLED = False
+    return create_app(BenchmarkConfig)
+
+def seed(db_path, sessions, untuned):
+    """Create one user with a chat session per benchmark thread and one order"""
+    app = make_app(db_path, untuned)
+    from app import db
+    from app.models import ChatSession, Order, User
+    with app.app_context():
+        user = User(email='bench@example.com', first_name='Bench', last_name='User')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.flush()
+        for index in range(sessions):
+            db.session.add(ChatSession(user_id=user.id, session_id=f'bench-{index}'))
+        db.session.add(Order(id='PB000001', user_id=user.id, items='[]', total_amount=0.0))
+        db.session.commit()
+        return user.id, [(chat_session.id, chat_session.session_id) for chat_session in ChatSession.query.order_by(ChatSession.id)]
+
+def worker(db_path, untuned, sessions, user_id, duration, results):
+    """One process: a thread per session running chat turns until the deadline"""
+    app = make_app(db_path, untuned)
+    from app.models import Order
+    from app.chat.routes import get_chat_history, get_or_create_session, save_message
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def timed(operation, func):
+        started = time.perf_counter()
+        try:
+            with app.app_context():
+                func()
+        except Exception as e:
+            with lock:
+                errors[operation] += 1
+                errors[f'{operation}: {type(e).__name__}'] += 1
+            return
+        with lock:
+            latencies[operation].append(time.perf_counter() - started)
+
+    def read_history(session_id):
+        get_chat_history(get_or_create_session(user_id, session_id))
+
+    def lookup_order():
+        order = Order.query.filter_by(id='PB000001', user_id=user_id).first()
+        order.to_status_dict()
+
+    def run(session_pk, session_id):
+        while time.perf_counter() < deadline:
+            timed('history', lambda: read_history(session_id))
+            timed('save_user', lambda: save_message(session_pk, 'user', MESSAGE))
+            timed('save_assistant', lambda: save_message(session_pk, 'assistant', MESSAGE))
+            if random.random() < 0.2:
+                timed('order_lookup', lookup_order)
+
+    threads = [threading.Thread(target=run, args=session) for session in sessions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put((dict(latencies), dict(errors)))
+
+def run_benchmark(processes, threads, duration, untuned, db_path):
+    user_id, sessions = seed(db_path, processes * threads, untuned)
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=worker, args=(
+            db_path, untuned, sessions[index * threads:(index + 1) * threads], user_id, duration, results))
+        for index in range(processes)
+    ]
+    started = time.perf_counter()
+    for process in workers:
+        process.start()
+    collected = [results.get() for _ in workers]
+    for process in workers:
+        process.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    for process_latencies, process_errors in collected:
+        for operation, values in process_latencies.items():
+            latencies[operation].extend(values)
+        for operation, count in process_errors.items():
+            errors[operation] += count
+    return elapsed, latencies, errors
+
+def print_report(elapsed, latencies, errors):
+    """Print throughput and latency percentiles per operation"""
+    print(f"\n📊 Results over {elapsed:.1f}s")
+    print(f"{'operation':<16}{'count':>8}{'errors':>8}{'ops/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    report = {}
+    for operation in sorted(set(latencies) | {name for name in errors if ':' not in name}):
+        values = sorted(latencies.get(operation, []))
+        row = {
+            'count': len(values),
+            'errors': errors.get(operation, 0),
+            'throughput': len(values) / elapsed if elapsed else 0.0,
+            'p50_ms': percentile(values, 0.50) * 1000,
+            'p95_ms': percentile(values, 0.95) * 1000,
+            'p99_ms': percentile(values, 0.99) * 1000,
+            'max_ms': values[-1] * 1000 if values else 0.0
+        }
+        report[operation] = row
+        print(f"{operation:<16}{row['count']:>8}{row['errors']:>8}{row['throughput']:>9.1f}"
+              f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['max_ms']:>9.0f}")
+    for name in sorted(name for name in errors if ':' in name):
+        print(f"⚠️  {name}: {errors[name]}")
+    return report
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark concurrent database writers')
+    parser.add_argument('--processes', type=int, default=4, help='Writer processes (gunicorn workers)')
+    parser.add_argument('--threads', type=int, default=8, help='Threads per process (concurrent requests)')
+    parser.add_argument('--duration', type=float, default=20.0, help='Seconds to run for')
+    parser.add_argument('--untuned', action='store_true', help='Disable the SQLite profile (driver defaults)')
+    parser.add_argument('--db-path', help='Database file (default: a fresh temporary file)')
+    parser.add_argument('--json', dest='json_path', help='Also write the report to this JSON file')
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    options = parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.abspath(options.db_path or os.path.join(tmp_dir, 'benchmark.db'))
+        print(f"🚀 {options.processes} processes x {options.threads} threads writing to {db_path} "
+              f"for {options.duration:.0f}s ({'untuned' if options.untuned else 'configured profile'})...")
+        elapsed, latencies, errors = run_benchmark(
+            options.processes, options.threads, options.duration, options.untuned, db_path)
+        report = print_report(elapsed, latencies, errors)
+
+    if options.json_path:
+        with open(options.json_path, 'w') as f:
+            json.dump({'elapsed': elapsed, 'operations': report}, f, indent=2)
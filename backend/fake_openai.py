@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Local OpenAI-compatible stub server for PerfBurger Chatbot load tests
+
+Serves /v1/chat/completions (plain and streamed) and /v1/models with
+configurable latency, error injection and canned or echo replies, so the
+backend can be exercised without spending OpenAI quota.
+
+Usage:
+    python fake_openai.py --port 8001 --latency lognormal --latency-ms 800
+    OPENAI_BASE_URL=http://localhost:8001/v1 OPENAI_API_KEY=fake python run.py
+"""
+
+import argparse
+import json
+import random
+import time
+import uuid
+from flask import Flask, Response, jsonify, request
+
+CANNED_REPLY = (
+    "Thanks for reaching out to PerfBurger! Our Classic PerfBurger is a customer favourite, "
+    "and it goes great with Crispy French Fries and a Fresh Lemonade. Would you like to order?"
+)
+
+CANNED_ORDER_ANALYSIS = {
+    "items": [
+        {"name": "Classic PerfBurger", "quantity": 1, "customizations": [], "price": 0, "category": "burgers"}
+    ],
+    "confidence": 0.9,
+    "reasoning": "Canned analysis from the fake OpenAI server",
+    "unavailable_items": [],
+    "unclear_items": []
+}
+
+def sample_latency(options):
+    """Latency in seconds drawn from the configured distribution"""
+    mean = options.latency_ms / 1000.0
+    jitter = options.latency_jitter_ms / 1000.0
+    if options.latency == 'uniform':
+        value = random.uniform(mean - jitter, mean + jitter)
+    elif options.latency == 'normal':
+        value = random.gauss(mean, jitter)
+    elif options.latency == 'lognormal':
+        # Long-tailed like a real LLM API; jitter is the standard deviation of the underlying normal
+        value = mean * random.lognormvariate(0, options.latency_sigma)
+    else:
+        value = mean
+    return max(0.0, value)
+
+def count_tokens(text):
+    """Rough token count for the usage block"""
+    return max(1, len(text) // 4)
+
+def create_app(options):
+    """Create the fake OpenAI Flask application"""
+    app = Flask(__name__)
+    stats = {'requests': 0, 'errors_injected': 0, 'streams': 0}
+
+    def reply_for(messages, json_mode):
+        if json_mode:
+            return json.dumps(CANNED_ORDER_ANALYSIS)
+        if options.mode == 'echo':
+            user_messages = [m.get('content', '') for m in messages if m.get('role') == 'user']
+            return f"Echo: {user_messages[-1] if user_messages else ''}"
+        return options.reply or CANNED_REPLY
+
+    def error_response():
+        status = options.error_status
+        body = {'error': {'message': f'Injected error ({status})', 'type': 'server_error', 'code': None}}
+        headers = {'Retry-After': '1'} if status == 429 else {}
+        return jsonify(body), status, headers
+
+    @app.route('/v1/models', methods=['GET'])
+    def models():
+        return jsonify({'object': 'list', 'data': [{'id': 'gpt-3.5-turbo', 'object': 'model', 'owned_by': 'fake'}]})
+
+    @app.route('/v1/chat/completions', methods=['POST'])
+    def chat_completions():
+        stats['requests'] += 1
+        payload = request.get_json(force=True)
+        messages = payload.get('messages', [])
+        model = payload.get('model', 'gpt-3.5-turbo')
+        json_mode = (payload.get('response_format') or {}).get('type') == 'json_object'
+
+        latency = sample_latency(options)
+
+        if random.random() < options.error_rate:
+            stats['errors_injected'] += 1
+            time.sleep(latency if options.error_latency else 0)
+            return error_response()
+
+        content = reply_for(messages, json_mode)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        prompt_tokens = sum(count_tokens(m.get('content') or '') for m in messages)
+
+        if payload.get('stream'):
+            stats['streams'] += 1
+
+            def generate():
+                # Time to first token is the sampled latency; the rest trickles in per chunk
+                time.sleep(latency)
+                words = content.split(' ')
+                for i, word in enumerate(words):
+                    delta = {'content': word if i == 0 else ' ' + word}
+                    if i == 0:
+                        delta['role'] = 'assistant'
+                    chunk = {
+                        'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                        'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}]
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    if options.chunk_delay_ms:
+                        time.sleep(options.chunk_delay_ms / 1000.0)
+                final = {
+                    'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                    'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]
+                }
+                yield f"data: {json.dumps(final)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return Response(generate(), mimetype='text/event-stream')
+
+        time.sleep(latency)
+        completion_tokens = count_tokens(content)
+        return jsonify({
+            'id': completion_id,
+            'object': 'chat.completion',
+            'created': created,
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop'
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens
+            }
+        })
+
+    @app.route('/stats', methods=['GET'])
+    def server_stats():
+        return jsonify(stats)
+
+    return app
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='OpenAI-compatible fake server for load testing')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', choices=['fixed', 'uniform', 'normal', 'lognormal'], default='fixed',
+                        help='Latency distribution of each completion')
+    parser.add_argument('--latency-ms', type=float, default=500, help='Mean (or median for lognormal) latency')
+    parser.add_argument('--latency-jitter-ms', type=float, default=200, help='Spread for uniform/normal latency')
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help='Shape of the lognormal distribution')
+    parser.add_argument('--chunk-delay-ms', type=float, default=20, help='Delay between streamed chunks')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests that fail (0-1)')
+    parser.add_argument('--error-status', type=int, default=500, help='HTTP status of injected errors, e.g. 429 or 503')
+    parser.add_argument('--error-latency', action='store_true', help='Apply the sampled latency to injected errors too')
+    parser.add_argument('--mode', choices=['canned', 'echo'], default='canned', help='Reply with canned text or echo the user')
+    parser.add_argument('--reply', help='Custom canned reply text')
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    options = parse_args()
+    print(f"🤖 Fake OpenAI server at http://{options.host}:{options.port}/v1 "
+          f"({options.latency} latency ~{options.latency_ms:.0f} ms, error rate {options.error_rate:.0%})")
+    create_app(options).run(host=options.host, port=options.port, threaded=True)
@@ -0,0 +1,36 @@
+"""
+Gunicorn configuration for PerfBurger Chatbot
+
+Chat and order requests spend almost all their time waiting on OpenAI.
+With the default gevent worker class each of those waits yields to other
+requests (sockets are monkey-patched when the worker starts), so a worker
+serves up to GUNICORN_WORKER_CONNECTIONS concurrent requests instead of
+one. Set GUNICORN_WORKER_CLASS=sync to get the old behaviour back, or
+gthread together with GUNICORN_THREADS.
+"""
+import os
+import multiprocessing
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+workers = int(os.environ.get('GUNICORN_WORKERS') or min(4, multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 500))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+accesslog = '-'
+errorlog = '-'
+
+if worker_class == 'gevent':
+    # httpcore (used by the OpenAI SDK) imports trio when it is installed, and
+    # trio needs select.epoll, which gevent's patching removes. Importing it in
+    # the master means workers inherit it instead of importing it after patching.
+    try:
+        import httpcore  # noqa: F401
+    except ImportError:
+        pass
+
+def post_fork(server, worker):
+    server.log.info(f"Worker {worker.pid} started ({worker_class}, {worker_connections} connections)")
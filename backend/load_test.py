@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test for PerfBurger Chatbot
+
+Registers a pool of users, then drives chat conversations (and an order at
+the end of each one) against a running backend at a target request rate.
+Requests are started on a fixed schedule whether or not earlier ones have
+finished (open loop), so slow responses show up as latency, not as a lower
+offered load. Reports throughput and p50/p95/p99 latency per endpoint.
+
+Usage:
+    python fake_openai.py --latency lognormal --latency-ms 800 &
+    OPENAI_BASE_URL=http://localhost:8001/v1 OPENAI_API_KEY=fake gunicorn -c gunicorn.conf.py run:app &
+    python load_test.py --base-url http://localhost:5000 --rps 20 --duration 60
+"""
+
+import argparse
+import json
+import math
+import queue
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+CONVERSATIONS = [
+    ["Hi! What's on the menu?", "Tell me about the Classic PerfBurger", "I want 2 Classic PerfBurgers and fries"],
+    ["What drinks do you have?", "I'll have a Fresh Lemonade and the BBQ Bacon Deluxe"],
+    ["Do you have vegetarian options?", "I'd like a Veggie Supreme with no onions and Onion Rings"],
+    ["What are your delivery hours?", "How long does delivery take?"],
+    ["Hola, ¿qué hamburguesas tienen?", "Quiero una Spicy Jalapeño Crunch"],
+]
+
+class VirtualUser:
+    """A registered user working through one conversation at a time"""
+
+    def __init__(self, email, token):
+        self.email = email
+        self.headers = {'Authorization': f'Bearer {token}'}
+        self.http = requests.Session()
+        self.script = None
+        self.session_id = None
+
+    def next_step(self):
+        """Return ('chat', message) or ('order', None), starting a new conversation when one ends"""
+        if self.script is None or (not self.script and not self.session_id):
+            self.script = list(random.choice(CONVERSATIONS))
+            self.session_id = None
+        if self.script:
+            return 'chat', self.script.pop(0)
+        # Conversation finished: order from it, then start over
+        self.script = None
+        return 'order', None
+
+class Recorder:
+    """Thread-safe latency and outcome recording per endpoint"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.status_codes = defaultdict(lambda: defaultdict(int))
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds, status):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            self.status_codes[endpoint][status] += 1
+            if status == 0 or status >= 400:
+                self.errors[endpoint] += 1
+
+    def skip(self):
+        with self._lock:
+            self.skipped += 1
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def timed_request(recorder, endpoint, method, url, timeout, **kwargs):
+    """Send a request and record its latency; returns the response or None"""
+    started = time.perf_counter()
+    try:
+        response = method(url, timeout=timeout, **kwargs)
+        status = response.status_code
+    except requests.RequestException:
+        response, status = None, 0
+    recorder.record(endpoint, time.perf_counter() - started, status)
+    return response
+
+def register_users(base_url, count, timeout):
+    """Register load-test users (before the measured run) and return them as VirtualUsers"""
+    run_id = uuid.uuid4().hex[:8]
+    users = []
+    for i in range(count):
+        email = f"loadtest-{run_id}-{i}@example.com"
+        try:
+            response = requests.post(f"{base_url}/users/register", timeout=timeout, json={
+                'email': email,
+                'password': 'loadtest123',
+                'first_name': 'Load',
+                'last_name': f'Tester{i}'
+            })
+        except requests.RequestException as e:
+            print(f"⚠️  Could not register {email}: {e}")
+            continue
+        if response.status_code == 201:
+            users.append(VirtualUser(email, response.json()['access_token']))
+        else:
+            print(f"⚠️  Could not register {email}: {response.status_code}")
+    return users
+
+def run_step(user, idle_users, recorder, base_url, timeout, endpoint_path):
+    """Run the user's next conversation step and return the user to the idle pool"""
+    try:
+        step, message = user.next_step()
+        if step == 'order':
+            timed_request(recorder, 'POST /orders/', user.http.post, f"{base_url}/orders/", timeout,
+                          headers=user.headers, json={'session_id': user.session_id})
+            return
+
+        payload = {'message': message}
+        if user.session_id:
+            payload['session_id'] = user.session_id
+        response = timed_request(recorder, f'POST {endpoint_path}', user.http.post, f"{base_url}{endpoint_path}", timeout,
+                                 headers=user.headers, json=payload, stream=endpoint_path.endswith('stream'))
+        if response is None or response.status_code != 200:
+            return
+        if endpoint_path.endswith('stream'):
+            # Recorded latency is time to headers; drain the stream to pick up the session id
+            for line in response.iter_lines(decode_unicode=True):
+                if line and line.startswith('data: ') and '"session_id"' in line:
+                    user.session_id = json.loads(line[6:]).get('session_id') or user.session_id
+        else:
+            user.session_id = response.json().get('session_id')
+    finally:
+        idle_users.put(user)
+
+def run_load(base_url, users, rps, duration, timeout, recorder, endpoint_path):
+    """Start conversation steps at a fixed rate for the given duration"""
+    idle_users = queue.Queue()
+    for user in users:
+        idle_users.put(user)
+
+    interval = 1.0 / rps
+    started = time.perf_counter()
+    next_start = started
+    with ThreadPoolExecutor(max_workers=len(users)) as executor:
+        while time.perf_counter() - started < duration:
+            try:
+                user = idle_users.get_nowait()
+            except queue.Empty:
+                # Every user is waiting on a response: the backend is not keeping up
+                recorder.skip()
+            else:
+                executor.submit(run_step, user, idle_users, recorder, base_url, timeout, endpoint_path)
+            next_start += interval
+            time.sleep(max(0.0, next_start - time.perf_counter()))
+    return time.perf_counter() - started
+
+def print_report(recorder, elapsed):
+    """Print throughput and latency percentiles per endpoint"""
+    print(f"\n📊 Results over {elapsed:.1f}s")
+    print(f"{'endpoint':<24}{'count':>7}{'errors':>8}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    report = {}
+    for endpoint in sorted(recorder.latencies):
+        values = sorted(recorder.latencies[endpoint])
+        row = {
+            'count': len(values),
+            'errors': recorder.errors[endpoint],
+            'throughput': len(values) / elapsed if elapsed else 0.0,
+            'p50_ms': percentile(values, 0.50) * 1000,
+            'p95_ms': percentile(values, 0.95) * 1000,
+            'p99_ms': percentile(values, 0.99) * 1000,
+            'max_ms': values[-1] * 1000 if values else 0.0,
+            'status_codes': dict(recorder.status_codes[endpoint])
+        }
+        report[endpoint] = row
+        print(f"{endpoint:<24}{row['count']:>7}{row['errors']:>8}{row['throughput']:>8.2f}"
+              f"{row['p50_ms']:>9.0f}{row['p95_ms']:>9.0f}{row['p99_ms']:>9.0f}{row['max_ms']:>9.0f}")
+    if recorder.skipped:
+        print(f"⚠️  {recorder.skipped} scheduled requests skipped because every user was busy (add --users)")
+    return report
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the PerfBurger backend')
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--users', type=int, default=20, help='Registered users (maximum concurrent conversations)')
+    parser.add_argument('--rps', type=float, default=5.0, help='Target request rate')
+    parser.add_argument('--duration', type=float, default=60.0, help='Seconds to generate load for')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Per-request timeout in seconds')
+    parser.add_argument('--stream', action='store_true', help='Use /chat/stream instead of /chat/')
+    parser.add_argument('--json', dest='json_path', help='Also write the report to this JSON file')
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    options = parse_args()
+    base_url = options.base_url.rstrip('/')
+    recorder = Recorder()
+
+    print(f"👥 Registering {options.users} users at {base_url}...")
+    users = register_users(base_url, options.users, options.timeout)
+    if not users:
+        print("💥 No users registered, is the backend running?")
+        exit(1)
+
+    endpoint_path = '/chat/stream' if options.stream else '/chat/'
+    print(f"🚀 Driving {endpoint_path} conversations at {options.rps} req/s for {options.duration:.0f}s...")
+    elapsed = run_load(base_url, users, options.rps, options.duration, options.timeout, recorder, endpoint_path)
+    report = print_report(recorder, elapsed)
+
+    if options.json_path:
+        with open(options.json_path, 'w') as f:
+            json.dump({'elapsed': elapsed, 'skipped': recorder.skipped, 'endpoints': report}, f, indent=2)
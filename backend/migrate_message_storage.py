@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Migrate stored chat messages to the compact storage format for PerfBurger Chatbot
+
+- retrieved_context: values stored by older versions as ``str(results)``
+  (full formatted entries) become compact references: the knowledge base
+  version plus entry keys and scores
+- content: bodies are rewritten according to MESSAGE_COMPRESSION, so
+  enabling compression compresses existing rows and disabling it turns
+  them back into plain text
+
+Rows are processed in id order in batches that are committed one by one,
+so the script can run next to the app and be restarted after an interruption.
+
+Usage:
+    python migrate_message_storage.py [--batch-size 500] [--dry-run] [--vacuum]
+"""
+
+import argparse
+from sqlalchemy import Text, select, text, type_coerce, update
+from app import create_app, db
+from app.models import ChatMessage
+from app.utils.database import database_size
+from app.utils.knowledge_base import get_knowledge_base
+from app.utils.message_storage import CompressedText, compact_legacy_context, decompress_text
+
+def migrate_messages(batch_size=500, dry_run=False, vacuum=False):
+    """Rewrite retrieved_context and content of every chat message that is not in the current format"""
+    print("🔧 Migrating chat message storage...")
+
+    app = create_app()
+    with app.app_context():
+        knowledge_base = get_knowledge_base()
+        table = ChatMessage.__table__
+        content_type = CompressedText()
+        # The stored value as is (text or compressed bytes)
+        stored_content = type_coerce(table.c.content, Text()).label('content')
+
+        size_before = database_size()
+        scanned = contexts = bodies = 0
+        last_id = 0
+        while True:
+            rows = db.session.execute(
+                select(table.c.id, stored_content, table.c.retrieved_context)
+                .where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+
+            for row in rows:
+                values = {}
+                context = compact_legacy_context(row.retrieved_context, knowledge_base)
+                if context != row.retrieved_context:
+                    values['retrieved_context'] = context
+                    contexts += 1
+
+                body = decompress_text(row.content) if isinstance(row.content, bytes) else row.content
+                if content_type.process_bind_param(body, db.engine.dialect) != row.content:
+                    values['content'] = body
+                    bodies += 1
+
+                if values and not dry_run:
+                    db.session.execute(
+                        update(ChatMessage).where(ChatMessage.id == row.id).values(**values)
+                        .execution_options(synchronize_session=False)
+                    )
+
+            db.session.commit()
+            scanned += len(rows)
+            last_id = rows[-1].id
+            print(f"   ... {scanned} messages scanned")
+
+        print(f"✅ {contexts} retrieved contexts compacted, {bodies} message bodies rewritten"
+              f"{' (dry run, nothing written)' if dry_run else ''}")
+
+        if vacuum and not dry_run and db.engine.dialect.name == 'sqlite':
+            print("🧹 Vacuuming the database file...")
+            db.session.close()
+            with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                connection.execute(text('VACUUM'))
+
+        size_after = database_size()
+        if size_before is not None:
+            print(f"💾 Data size: {size_before / 1024:.0f} KiB -> {size_after / 1024:.0f} KiB")
+    return True
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Migrate chat messages to the compact storage format')
+    parser.add_argument('--batch-size', type=int, default=500, help='Messages per transaction')
+    parser.add_argument('--dry-run', action='store_true', help='Count what would change without writing')
+    parser.add_argument('--vacuum', action='store_true', help='Return freed pages to the filesystem afterwards')
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    options = parse_args()
+    try:
+        migrate_messages(options.batch_size, options.dry_run, options.vacuum)
+    except Exception as e:
+        print(f"\n💥 Migration failed: {str(e)}")
+        exit(1)
+    print("\n🎉 Chat message storage migration completed!")
@@ -74,3 +74,36 @@ class TestChat:
         context = kb.get_relevant_context(query)
         
         assert any(doc['source'] in expected_sources for doc in context)
+
+class TestChatTurnPersistence:
+    """Test how a chat turn is persisted around the LLM call"""
+
+    def test_no_transaction_held_during_llm_call(self, client, auth_headers):
+        """Test that the user message is committed and the connection released before the LLM call"""
+        from app import db
+        from app.models import ChatMessage
+        seen = {}
+
+        def generate_response(**kwargs):
+            seen['in_transaction'] = db.session().in_transaction()
+            seen['saved'] = [m.content for m in ChatMessage.query.filter_by(message_type='user').all()]
+            db.session.close()
+            return 'Sure!'
+
+        with patch('app.chat.routes.llm_client.generate_response', side_effect=generate_response):
+            response = client.post('/chat/', headers=auth_headers, json={'message': 'Do you deliver late?'})
+
+        assert response.status_code == 200
+        assert seen == {'in_transaction': False, 'saved': ['Do you deliver late?']}
+
+    def test_current_message_is_not_in_history(self, client, auth_headers):
+        """Test that the new message is sent once, not also as history"""
+        with patch('app.chat.routes.llm_client.generate_response', return_value='Hello!') as generate:
+            first = client.post('/chat/', headers=auth_headers, json={'message': 'Hi'})
+            client.post('/chat/', headers=auth_headers,
+                        json={'message': 'Do you deliver late?', 'session_id': first.get_json()['session_id']})
+
+        assert generate.call_args_list[0].kwargs['chat_history'] == []
+        assert generate.call_args_list[1].kwargs['chat_history'] == [
+            {'role': 'user', 'content': 'Hi'}, {'role': 'assistant', 'content': 'Hello!'}
+        ]
@@ -0,0 +1,115 @@
+import time
+import httpx
+import pytest
+from unittest.mock import MagicMock, patch
+from openai import APIConnectionError, BadRequestError
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError, RetryBudget
+from app.utils.llm_client import LLMClient
+
+def connection_error():
+    return APIConnectionError(request=httpx.Request('POST', 'http://localhost/v1/chat/completions'))
+
+def bad_request_error():
+    request = httpx.Request('POST', 'http://localhost/v1/chat/completions')
+    return BadRequestError('Invalid request', response=httpx.Response(400, request=request), body=None)
+
+class TestCircuitBreaker:
+    """Test the circuit breaker state machine"""
+
+    def test_opens_after_consecutive_failures(self):
+        """Test that the circuit opens at the threshold and rejects calls"""
+        breaker = CircuitBreaker('test', failure_threshold=3, recovery_timeout=60)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+
+        assert breaker.state == CircuitBreaker.CLOSED
+
+        breaker.record_failure()
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow_request()
+        assert breaker.stats()['rejected'] == 1
+
+    def test_half_open_probe_closes_or_reopens(self):
+        """Test recovery probing after the recovery timeout"""
+        breaker = CircuitBreaker('test', failure_threshold=1, recovery_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow_request()
+        assert not breaker.allow_request()  # Only one probe at a time
+
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+        time.sleep(0.06)
+        assert breaker.allow_request()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_retry_budget(self):
+        """Test that retries are limited to the budget"""
+        budget = RetryBudget(ratio=0.5, max_tokens=1)
+
+        assert budget.try_spend()
+        assert not budget.try_spend()
+        budget.record_request()
+        budget.record_request()
+        assert budget.try_spend()
+
+class TestLLMClientResilience:
+    """Test retries and fast fallback in the LLM client"""
+
+    def make_client(self, side_effect):
+        client = LLMClient()
+        client.client = MagicMock()
+        client.client.chat.completions.create.side_effect = side_effect
+        return client
+
+    def test_transient_failure_is_retried(self, app):
+        """Test that a connection error is retried and the call succeeds"""
+        response = MagicMock()
+        response.choices[0].message.content = 'Hello from PerfBot'
+        client = self.make_client([connection_error(), response])
+        breaker = CircuitBreaker('test', failure_threshold=5)
+
+        with app.app_context(), patch('app.utils.llm_client.get_llm_breaker', return_value=breaker), \
+                patch('app.utils.llm_client.get_llm_retry_budget', return_value=RetryBudget()), \
+                patch('app.utils.llm_client.time.sleep'):
+            assert client._create_completion(messages=[]) is response
+
+        assert client.client.chat.completions.create.call_count == 2
+        assert breaker.stats()['consecutive_failures'] == 0
+
+    def test_open_circuit_returns_fallback_without_calling(self, app):
+        """Test that an open circuit skips OpenAI and answers with the fallback"""
+        client = self.make_client(AssertionError('OpenAI must not be called'))
+        breaker = CircuitBreaker('test', failure_threshold=1, recovery_timeout=60)
+        breaker.record_failure()
+
+        with app.app_context(), patch('app.utils.llm_client.get_llm_breaker', return_value=breaker):
+            with pytest.raises(CircuitOpenError):
+                client._create_completion(messages=[])
+            reply = client.generate_response('Where is my order?')
+
+        assert reply == client._get_fallback_response('Where is my order?')
+        client.client.chat.completions.create.assert_not_called()
+
+    @pytest.mark.parametrize('error', [bad_request_error(), ValueError('unexpected response')])
+    def test_probe_that_raises_a_non_transient_error_frees_the_circuit(self, app, error):
+        """Test that a half-open probe failing with a 400 or any other error doesn't block later calls"""
+        client = self.make_client(error)
+        breaker = CircuitBreaker('test', failure_threshold=1, recovery_timeout=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+
+        with app.app_context(), patch('app.utils.llm_client.get_llm_breaker', return_value=breaker), \
+                patch('app.utils.llm_client.get_llm_retry_budget', return_value=RetryBudget()):
+            with pytest.raises(type(error)):
+                client._create_completion(messages=[])
+
+        assert breaker.allow_request()
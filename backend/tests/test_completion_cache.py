@@ -0,0 +1,83 @@
+import time
+import sqlite3
+import pytest
+from unittest.mock import patch
+from app.utils.completion_cache import CompletionCache
+
+MESSAGES = [{'role': 'user', 'content': 'What burgers do you have?'}]
+PARAMS = {'model': 'gpt-3.5-turbo', 'temperature': 0.7}
+
+class TestCompletionCache:
+    """Test the two-tier LLM completion cache"""
+
+    def test_key_covers_messages_params_and_version(self):
+        """Test that any change to the request produces a different key"""
+        key = CompletionCache.make_key(MESSAGES, PARAMS, 'v1')
+
+        assert key == CompletionCache.make_key(list(MESSAGES), dict(PARAMS), 'v1')
+        assert key != CompletionCache.make_key(MESSAGES, {**PARAMS, 'temperature': 0.2}, 'v1')
+        assert key != CompletionCache.make_key(MESSAGES, PARAMS, 'v2')
+        assert key != CompletionCache.make_key([{'role': 'user', 'content': 'Hi'}], PARAMS, 'v1')
+
+    def test_shared_tier_is_visible_to_other_workers(self, tmp_path):
+        """Test that a completion stored by one process-local cache is found by another"""
+        path = str(tmp_path / 'llm_cache.db')
+        key = CompletionCache.make_key(MESSAGES, PARAMS, 'v1')
+
+        CompletionCache(path=path).set(key, 'We have burgers!', 'v1')
+        other = CompletionCache(path=path)
+
+        assert other.get(key, 'v1') == 'We have burgers!'
+        assert other.shared_hits == 1
+
+    def test_new_knowledge_base_version_purges_old_entries(self, tmp_path):
+        """Test invalidation when the knowledge base version changes"""
+        cache = CompletionCache(path=str(tmp_path / 'llm_cache.db'))
+        cache.set('old', 'stale answer', 'v1')
+
+        assert cache.get('old', 'v2') is None
+        assert CompletionCache(path=cache.path).stats()['shared_rows'] == 0
+
+    def test_entries_expire_and_are_trimmed(self, tmp_path):
+        """Test TTL expiry and size-based eviction of the shared tier"""
+        cache = CompletionCache(path=str(tmp_path / 'llm_cache.db'), ttl=0.05, max_rows=1)
+        cache.set('a', 'first')
+        time.sleep(0.1)
+
+        assert cache.get('a') is None
+
+        cache = CompletionCache(path=cache.path, max_rows=2)
+        for key in ('x', 'y', 'z'):
+            cache.set(key, key)
+        cache.evict()
+        assert cache.stats()['shared_rows'] == 2
+
+    def test_memory_only_cache(self):
+        """Test the in-process tier without a shared file"""
+        cache = CompletionCache(path=None, memory_size=1)
+        cache.set('a', 'first')
+        cache.set('b', 'second')
+
+        assert cache.get('a') is None
+        assert cache.get('b') == 'second'
+
+    def test_connections_are_closed(self, tmp_path):
+        """Test that every shared-tier operation closes its SQLite connection"""
+        cache = CompletionCache(path=str(tmp_path / 'cache.db'))
+        opened = []
+        connect = sqlite3.connect
+
+        def tracking_connect(*args, **kwargs):
+            opened.append(connect(*args, **kwargs))
+            return opened[-1]
+
+        with patch('app.utils.completion_cache.sqlite3.connect', side_effect=tracking_connect):
+            cache.set('key', 'value', 'v1')
+            cache.memory.clear()
+            assert cache.get('key', 'v1') == 'value'
+            cache.evict()
+
+        assert opened
+        for conn in opened:
+            with pytest.raises(sqlite3.ProgrammingError):
+                conn.execute('SELECT 1')
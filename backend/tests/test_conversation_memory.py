@@ -0,0 +1,81 @@
+from unittest.mock import MagicMock, patch
+from app import db
+from app.models import User, ChatSession, ChatMessage
+from app.utils.conversation_memory import summarize_if_needed, unsummarized_messages
+
+def add_messages(chat_session, count, start=0):
+    for i in range(start, start + count):
+        message = ChatMessage(session_id=chat_session.id, message_type='user' if i % 2 == 0 else 'assistant',
+                              content=f'message {i}')
+        db.session.add(message)
+    db.session.commit()
+
+class TestConversationMemory:
+    """Test rolling conversation summarization"""
+
+    def make_session(self):
+        user = User(email='memory@example.com', first_name='Memory', last_name='User')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+        chat_session = ChatSession(user_id=user.id, session_id='summary-session')
+        db.session.add(chat_session)
+        db.session.commit()
+        return chat_session
+
+    def test_short_conversations_are_not_summarized(self, app):
+        """Test that nothing happens below the threshold"""
+        chat_session = self.make_session()
+        add_messages(chat_session, 12)
+        llm = MagicMock()
+
+        assert not summarize_if_needed(chat_session, llm)
+        llm.summarize_conversation.assert_not_called()
+
+    def test_only_new_messages_are_folded_in(self, app):
+        """Test that the summary is updated incrementally from the watermark"""
+        chat_session = self.make_session()
+        add_messages(chat_session, 14)
+        llm = MagicMock()
+        llm.summarize_conversation.return_value = 'first summary'
+
+        assert summarize_if_needed(chat_session, llm)
+        previous, folded = llm.summarize_conversation.call_args[0]
+        assert previous is None
+        assert [m['content'] for m in folded] == [f'message {i}' for i in range(8)]
+        assert chat_session.summary == 'first summary'
+        assert unsummarized_messages(chat_session).count() == 6
+
+        add_messages(chat_session, 8, start=14)
+        llm.summarize_conversation.return_value = 'second summary'
+
+        assert summarize_if_needed(chat_session, llm)
+        previous, folded = llm.summarize_conversation.call_args[0]
+        assert previous == 'first summary'
+        assert [m['content'] for m in folded] == [f'message {i}' for i in range(8, 16)]
+
+    def test_failed_summary_keeps_watermark(self, app):
+        """Test that a failed LLM call leaves the session unchanged"""
+        chat_session = self.make_session()
+        add_messages(chat_session, 14)
+        llm = MagicMock()
+        llm.summarize_conversation.return_value = None
+
+        assert not summarize_if_needed(chat_session, llm)
+        assert chat_session.summary_message_id is None
+
+    def test_chat_response_does_not_wait_for_the_summary(self, app, client, auth_headers):
+        """Test that /chat/ summarizes only after the response has been sent"""
+        app.config.update(CHAT_SUMMARY_THRESHOLD=2, CHAT_SUMMARY_KEEP_RECENT=1)
+        with patch('app.chat.routes.llm_client.generate_response', return_value='Sure!'), \
+                patch('app.chat.routes.llm_client.summarize_conversation', return_value='asked twice') as summarize:
+            session_id = client.post('/chat/', headers=auth_headers, json={'message': 'Hi there'}).get_json()['session_id']
+            response = client.post('/chat/', headers=auth_headers, json={'message': 'Hi again', 'session_id': session_id})
+
+            assert response.status_code == 200
+            summarize.assert_not_called()
+
+            response.close()
+
+        summarize.assert_called_once()
+        assert ChatSession.query.filter_by(session_id=session_id).one().summary == 'asked twice'
@@ -0,0 +1,65 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app import create_app, db
+from app.chat.routes import get_chat_history
+from app.models import ChatMessage, ChatSession, User
+from app.utils.database import READ_ENGINE, read_session
+from config import Config
+
+def file_config(db_path, **overrides):
+    """Default (non-testing) database settings on a temporary SQLite file"""
+    attributes = {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}', 'LLM_CACHE_PATH': '', 'ORDER_DRAFT_ENABLED': False}
+    attributes.update(overrides)
+    return type('FileConfig', (Config,), attributes)
+
+class TestSQLiteProfile:
+    """Test the SQLite connection profile and the read pool"""
+
+    def test_pragmas_and_pool_are_applied(self, tmp_path):
+        """Test that every connection gets the configured pragmas"""
+        app = create_app(file_config(tmp_path / 'profile.db', SQLITE_BUSY_TIMEOUT_MS=1234))
+
+        with app.app_context():
+            with db.engine.connect() as connection:
+                pragma = lambda name: connection.execute(text(f'PRAGMA {name}')).scalar()
+                assert pragma('journal_mode') == 'wal'
+                assert pragma('synchronous') == 1  # NORMAL
+                assert pragma('busy_timeout') == 1234
+                assert pragma('cache_size') == -8000
+            assert db.engine.pool.size() == Config.SQLALCHEMY_POOL_SIZE
+            assert READ_ENGINE not in app.extensions
+
+    def test_profile_can_be_disabled(self, tmp_path):
+        """Test that SQLITE_TUNING_ENABLED=False leaves the driver defaults"""
+        app = create_app(file_config(tmp_path / 'plain.db', SQLITE_TUNING_ENABLED=False))
+
+        with app.app_context(), db.engine.connect() as connection:
+            assert connection.execute(text('PRAGMA journal_mode')).scalar() == 'delete'
+
+    def test_reads_use_query_only_pool(self, tmp_path):
+        """Test that history is read from the read pool, which cannot write"""
+        app = create_app(file_config(tmp_path / 'read.db', SQLITE_READ_POOL_ENABLED=True))
+
+        with app.app_context():
+            user = User(email='reader@example.com', first_name='Read', last_name='Only')
+            user.set_password('password123')
+            db.session.add(user)
+            db.session.flush()
+            chat_session = ChatSession(user_id=user.id, session_id='read-pool-session')
+            db.session.add(chat_session)
+            db.session.flush()
+            db.session.add(ChatMessage(session_id=chat_session.id, message_type='user', content='Hello'))
+            db.session.commit()
+
+            assert get_chat_history(chat_session) == [{'role': 'user', 'content': 'Hello'}]
+            with read_session() as session:
+                assert session.get_bind() is app.extensions[READ_ENGINE]
+                with pytest.raises(OperationalError):
+                    session.execute(text("DELETE FROM chat_message"))
+            assert ChatMessage.query.count() == 1
+
+    def test_memory_database_uses_request_session(self, app):
+        """Test that without a read pool reads share the request's session"""
+        with read_session() as session:
+            assert session is db.session
@@ -0,0 +1,117 @@
+import json
+from unittest.mock import patch
+from app import db
+from app.models import ChatMessage, ChatSession, User
+from app.utils.draft_cart import load_cart, update_cart
+from app.utils.menu_catalog import MenuCatalog
+
+MENU = {
+    'burgers': [{'name': 'Classic PerfBurger', 'price': '12.99', 'aliases': ['classic burger'],
+                 'ingredients': ['beef patty', 'red onion']}],
+    'drinks': [{'name': 'Fresh Lemonade', 'price': '3.49', 'aliases': ['lemonade']}]
+}
+
+class FakeLLMClient:
+    """Records the conversation text of every order analysis"""
+
+    def __init__(self, items=None):
+        self.items = items or []
+        self.calls = []
+
+    def analyze_conversation_for_order(self, conversation_text, catalog):
+        self.calls.append(conversation_text)
+        return {'items': self.items, 'confidence': 0.9, 'reasoning': 'LLM'}
+
+class TestDraftCart:
+    """Test the incremental per-session draft cart"""
+
+    def _add_message(self, chat_session, content, message_type='user'):
+        message = ChatMessage(session_id=chat_session.id, message_type=message_type, content=content)
+        db.session.add(message)
+        db.session.commit()
+        return message
+
+    def _session(self, session_id='cart-session'):
+        user = User(email=f'{session_id}@example.com', first_name='Cart', last_name='User')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.flush()
+        chat_session = ChatSession(user_id=user.id, session_id=session_id)
+        db.session.add(chat_session)
+        db.session.commit()
+        return chat_session
+
+    def test_only_new_messages_are_analyzed(self, app):
+        """Test that each update reads the messages after the watermark only"""
+        catalog = MenuCatalog(MENU)
+        chat_session = self._session()
+        llm = FakeLLMClient([{'name': 'Classic PerfBurger', 'quantity': 3}, {'name': 'Fresh Lemonade', 'quantity': 1}])
+
+        first = self._add_message(chat_session, "I'd like 2 classic burgers please")
+        self._add_message(chat_session, 'Great choice!', 'assistant')
+        cart = update_cart(chat_session, catalog, llm)
+        assert [(item['name'], item['quantity']) for item in cart['items']] == [('Classic PerfBurger', 2)]
+        assert cart['analysis_method'] == 'rules'
+        assert chat_session.cart_message_id == first.id
+
+        self._add_message(chat_session, 'And a lemonade please')
+        cart = update_cart(chat_session, catalog, llm)
+        assert [(item['name'], item['quantity']) for item in cart['items']] == [('Classic PerfBurger', 2), ('Fresh Lemonade', 1)]
+        assert cart['total_amount'] == round(12.99 * 2 + 3.49, 2)
+        assert llm.calls == []
+
+        self._add_message(chat_session, 'Actually make that 3 burgers')
+        cart = update_cart(chat_session, catalog, llm)
+        assert llm.calls == ['Order so far: 2x Classic PerfBurger; 1x Fresh Lemonade\nNew messages: Actually make that 3 burgers']
+        assert [(item['name'], item['quantity']) for item in cart['items']] == [('Classic PerfBurger', 3), ('Fresh Lemonade', 1)]
+        assert cart['analysis_method'] == 'LLM'
+
+        assert update_cart(chat_session, catalog, llm) == cart
+        assert len(llm.calls) == 1
+        assert json.loads(chat_session.draft_cart) == load_cart(chat_session) == cart
+
+    def test_small_talk_leaves_cart_alone(self, app):
+        """Test that messages without anything order-related skip the LLM"""
+        chat_session = self._session()
+        llm = FakeLLMClient()
+        self._add_message(chat_session, 'Hello there, is the lemonade fresh?')
+
+        cart = update_cart(chat_session, MenuCatalog(MENU), llm)
+
+        assert cart['items'] == []
+        assert llm.calls == []
+        assert chat_session.cart_message_id is None
+
+    def test_reference_is_analyzed_with_the_question_it_refers_to(self, app):
+        """Test that a menu question from an earlier turn reaches the LLM with the order referring to it"""
+        catalog = MenuCatalog(MENU)
+        chat_session = self._session()
+        llm = FakeLLMClient([{'name': 'Fresh Lemonade', 'quantity': 2}])
+        self._add_message(chat_session, 'Is the lemonade fresh?')
+        self._add_message(chat_session, 'Yes, squeezed every morning.', 'assistant')
+        assert update_cart(chat_session, catalog, llm)['items'] == []
+        assert llm.calls == []
+
+        last = self._add_message(chat_session, "Great, I'll take two of those")
+        cart = update_cart(chat_session, catalog, llm)
+
+        assert llm.calls == ["Is the lemonade fresh? Great, I'll take two of those"]
+        assert [(item['name'], item['quantity']) for item in cart['items']] == [('Fresh Lemonade', 2)]
+        assert chat_session.cart_message_id == last.id
+
+    def test_order_materializes_and_clears_cart(self, client, auth_headers):
+        """Test that creating an order uses the cart and starts a new one"""
+        user = User.query.filter_by(email='test@example.com').first()
+        chat_session = ChatSession(user_id=user.id, session_id='order-cart-session')
+        db.session.add(chat_session)
+        db.session.commit()
+        self._add_message(chat_session, 'I want 2 classic perfburgers please')
+
+        with patch('app.orders.routes.LLMClient.analyze_conversation_for_order', side_effect=AssertionError('LLM called')):
+            created = client.post('/orders/', headers=auth_headers, json={'session_id': 'order-cart-session'})
+            repeated = client.post('/orders/', headers=auth_headers, json={'session_id': 'order-cart-session'})
+
+        assert created.status_code == 201
+        assert created.get_json()['order']['conversation_summary'] == '2x Classic PerfBurger'
+        assert repeated.status_code == 400
+        assert db.session.get(ChatSession, chat_session.id).draft_cart is None
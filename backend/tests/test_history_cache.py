@@ -0,0 +1,89 @@
+from unittest.mock import patch
+from sqlalchemy import inspect, text
+from app import db
+from app.chat.routes import get_chat_history, save_message
+from app.models import ChatMessage, ChatSession, User
+from app.utils.history_cache import HistoryCache
+
+class TestHistoryCache:
+    """Test the per-session chat history ring buffers"""
+
+    def test_serves_only_current_snapshots(self):
+        """Test that a snapshot is used only while it matches the session's last message"""
+        cache = HistoryCache(max_sessions=2, size=3)
+        cache.store(1, 20, [(10, 'user', 'a'), (20, 'assistant', 'b')], complete=True)
+
+        assert cache.get(1, 20, limit=10) == [{'role': 'user', 'content': 'a'}, {'role': 'assistant', 'content': 'b'}]
+        assert cache.get(1, 20, limit=10, after_id=10) == [{'role': 'assistant', 'content': 'b'}]
+        assert cache.get(1, 21, limit=10) is None
+
+        cache.append(1, 20, 30, 'user', 'c')
+        cache.append(1, 30, 40, 'assistant', 'd')
+        assert [message[0] for message in cache.peek(1).messages] == [20, 30, 40]
+        assert cache.get(1, 40, limit=2) == [{'role': 'user', 'content': 'c'}, {'role': 'assistant', 'content': 'd'}]
+        # Message 10 fell out of the ring buffer, so a longer history needs the database
+        assert cache.get(1, 40, limit=4) is None
+        assert cache.get(1, 40, limit=4, after_id=20) is not None
+
+        cache.append(1, 30, 50, 'user', 'e')
+        assert cache.peek(1) is None
+
+    def test_evicts_least_recently_used_session(self):
+        """Test that the cache is bounded by session count"""
+        cache = HistoryCache(max_sessions=2, size=3)
+        for session_pk in (1, 2):
+            cache.store(session_pk, None, [], complete=True)
+        assert cache.get(1, None, limit=10) == []
+        cache.store(3, None, [], complete=True)
+
+        assert cache.peek(2) is None and cache.peek(1) is not None
+        assert cache.stats()['evictions'] == 1
+
+class TestHistoryWriteThrough:
+    """Test that chat turns keep the cache current without reading history"""
+
+    def _session(self):
+        user = User(email='history@example.com', first_name='History', last_name='User')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.flush()
+        chat_session = ChatSession(user_id=user.id, session_id='history-session')
+        db.session.add(chat_session)
+        db.session.commit()
+        return chat_session.id
+
+    def test_turns_are_served_from_cache(self, app):
+        """Test write-through on save and invalidation by writes that bypass the cache"""
+        cache = HistoryCache(size=4)
+        session_pk = self._session()
+        with patch('app.chat.routes.get_history_cache', return_value=cache):
+            assert get_chat_history(db.session.get(ChatSession, session_pk)) == []
+            save_message(session_pk, 'user', 'Hi')
+            save_message(session_pk, 'assistant', 'Hello!')
+
+            with patch('app.chat.routes.read_session', side_effect=AssertionError('history read from the database')):
+                history = get_chat_history(db.session.get(ChatSession, session_pk))
+            assert [message['content'] for message in history] == ['Hi', 'Hello!']
+
+            # Another worker adds a message: the snapshot no longer matches
+            other = ChatMessage(session_id=session_pk, message_type='user', content='From elsewhere')
+            db.session.add(other)
+            db.session.flush()
+            db.session.get(ChatSession, session_pk).last_message_id = other.id
+            db.session.commit()
+            save_message(session_pk, 'assistant', 'Got it')
+            assert cache.peek(session_pk) is None
+
+            history = get_chat_history(db.session.get(ChatSession, session_pk))
+            assert [message['content'] for message in history] == ['Hi', 'Hello!', 'From elsewhere', 'Got it']
+            assert cache.stats()['misses'] == 2
+
+    def test_history_uses_session_index(self, app):
+        """Test that recent history is read through the (session_id, timestamp) index"""
+        indexes = {index['name'] for index in inspect(db.engine).get_indexes('chat_message')}
+        assert {'ix_chat_message_session_timestamp', 'ix_chat_message_session_type'} <= indexes
+
+        plan = db.session.execute(text(
+            'EXPLAIN QUERY PLAN SELECT id, message_type, content FROM chat_message '
+            'WHERE session_id = 1 ORDER BY timestamp DESC LIMIT 20')).fetchall()
+        assert 'ix_chat_message_session_timestamp' in ' '.join(str(row) for row in plan)
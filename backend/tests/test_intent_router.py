@@ -0,0 +1,76 @@
+import pytest
+from unittest.mock import patch
+from app import db
+from app.models import Order, User
+from app.utils.intent_router import match_intent, render_listing_templates
+
+class TestIntentRouter:
+    """Test the deterministic intent fast-path"""
+
+    @pytest.mark.parametrize('message,expected', [
+        ('menu', ('full_menu', None)),
+        ("What's on the menu?", ('full_menu', None)),
+        ('What drinks do you have?', ('drinks', None)),
+        ('show me the sides', ('sides', None)),
+        ('Hola, bebidas', ('drinks', None)),
+        ('check order pb123456', ('order_status', 'PB123456')),
+        ('PB123456', ('order_status', 'PB123456')),
+        ('Where is my order PB123456?', ('order_status', 'PB123456')),
+        ("What's the status of PB123456", ('order_status', 'PB123456')),
+        ('track #PB123456 please', ('order_status', 'PB123456')),
+        ('Hola, ¿dónde está mi pedido PB123456?', ('order_status', 'PB123456')),
+        ('my burger from PB123456 was cold, I want a refund', (None, None)),
+        ('can I add fries to PB123456?', (None, None)),
+        ('Please cancel order PB123456', (None, None)),
+        ('Is the menu gluten free?', (None, None)),
+        ('I want 2 burgers', (None, None)),
+    ])
+    def test_match_intent(self, message, expected):
+        """Test that only whole-message listing requests and order lookups are routed"""
+        assert match_intent(message) == expected
+
+    def test_listing_templates(self):
+        """Test rendering of listing replies from menu data"""
+        templates = render_listing_templates({
+            'burgers': [{'name': 'Classic PerfBurger', 'price': '12.99', 'description': 'Signature burger'}],
+            'drinks': [{'name': 'Iced Tea', 'price': '2.99'}]
+        })
+
+        assert '**Classic PerfBurger** - $12.99' in templates['full_menu']
+        assert 'Iced Tea' in templates['drinks']
+        assert 'Classic PerfBurger' not in templates['drinks']
+        assert templates['sides'] == "Sorry, we don't have any sides on the menu right now."
+
+    def test_menu_request_skips_llm(self, client, auth_headers):
+        """Test that a full menu request is answered without calling the LLM"""
+        with patch('app.chat.routes.llm_client.generate_response', side_effect=AssertionError('LLM called')):
+            response = client.post('/chat/', headers=auth_headers, json={'message': 'Show me the menu'})
+
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['message'].startswith("Here's our full menu")
+        assert set(data) == {'message', 'session_id', 'knowledge_base_version', 'timestamp'}
+
+    def test_order_status_uses_order_lookup(self, client, auth_headers):
+        """Test that order status is answered for the user's own order only"""
+        user = User.query.filter_by(email='test@example.com').first()
+        db.session.add(Order(id='PB654321', user_id=user.id, status='preparing', total_amount=12.99,
+                             items='[{"name": "Classic PerfBurger", "quantity": 1, "price": 12.99}]'))
+        db.session.commit()
+
+        with patch('app.chat.routes.llm_client.generate_response', side_effect=AssertionError('LLM called')):
+            found = client.post('/chat/', headers=auth_headers, json={'message': 'check order PB654321'})
+            missing = client.post('/chat/', headers=auth_headers, json={'message': 'check order PB000000'})
+
+        assert 'Our kitchen is preparing your delicious meal.' in found.get_json()['message']
+        assert '1x Classic PerfBurger' in found.get_json()['message']
+        assert "couldn't find order PB000000" in missing.get_json()['message']
+
+    def test_router_can_be_disabled(self, app, client, auth_headers):
+        """Test the config toggle"""
+        app.config['CHAT_INTENT_ROUTER_ENABLED'] = False
+        with patch('app.chat.routes.llm_client.generate_response', return_value='From the LLM') as generate:
+            response = client.post('/chat/', headers=auth_headers, json={'message': 'menu'})
+
+        assert response.get_json()['message'] == 'From the LLM'
+        generate.assert_called_once()
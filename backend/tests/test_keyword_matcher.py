@@ -0,0 +1,28 @@
+from app.utils.keyword_matcher import KeywordMatcher
+
+class TestKeywordMatcher:
+    """Test single-pass keyword group matching"""
+
+    def test_overlapping_keywords_from_different_groups(self):
+        """Test that a keyword inside a longer one is still reported"""
+        matcher = KeywordMatcher({
+            'customization': ['extra cheese'],
+            'food': ['cheese', 'burger']
+        })
+
+        assert matcher.match('A burger with EXTRA CHEESE') == {'customization', 'food'}
+
+    def test_prefix_keywords_at_same_position(self):
+        """Test keywords that share a start position"""
+        matcher = KeywordMatcher({'intent': ['want'], 'polite': ['wanted to ask']})
+
+        assert matcher.match('I wanted to ask') == {'intent', 'polite'}
+        assert matcher.match('I want it') == {'intent'}
+
+    def test_substring_semantics_and_no_match(self):
+        """Test that matching behaves like `keyword in text`"""
+        matcher = KeywordMatcher({'menu': ['menu'], 'quantity': ['2']})
+
+        assert matcher.match('menus for 12') == {'menu', 'quantity'}
+        assert matcher.match('hello') == set()
+        assert KeywordMatcher({}).match('anything') == set()
@@ -0,0 +1,119 @@
+import json
+import os
+import shutil
+import pytest
+from app.utils.knowledge_base import KnowledgeBase, normalize_query, tokenize
+
+class TestKnowledgeBase:
+    """Test knowledge base indexing and retrieval"""
+
+    @pytest.fixture
+    def kb(self):
+        """Knowledge base loaded from the bundled files"""
+        return KnowledgeBase()
+
+    def test_tokenize_normalizes_terms(self):
+        """Test Spanish mapping, stop words and plural folding"""
+        assert tokenize('Hamburguesas and PAPAS') == ['burger', 'frie']
+        assert tokenize('what are the drinks') == ['drink']
+
+    def test_retrieve_menu_item_by_name(self, kb):
+        """Test that a burger is found from words in its name"""
+        results = kb.retrieve('tell me about the classic burger')
+
+        assert results[0]['title'] == 'Classic PerfBurger'
+        assert results[0]['type'] == 'menu_item'
+        assert 'Price: $12.99' in results[0]['content']
+
+    def test_retrieve_faq(self, kb):
+        """Test FAQ retrieval"""
+        results = kb.retrieve('delivery hours')
+
+        assert results[0]['type'] == 'faq'
+        assert 'delivery hours' in results[0]['title']
+
+    def test_retrieve_spanish_terms(self, kb):
+        """Test that Spanish terms are matched through the index"""
+        titles = [item['title'] for item in kb.retrieve('papas')]
+
+        assert 'Crispy French Fries' in titles
+        assert 'Sweet Potato Fries' in titles
+
+    def test_retrieve_no_match(self, kb):
+        """Test that unrelated queries return nothing"""
+        assert kb.retrieve('xyzzy') == []
+
+    def test_retrieve_respects_max_results(self, kb):
+        """Test result limit"""
+        assert len(kb.retrieve('fries cheese onion', max_results=2)) == 2
+
+    def test_full_menu_trigger(self, kb):
+        """Test full menu requests return every menu item"""
+        results = kb.retrieve("what's on the menu?")
+
+        categories = set(item['category'] for item in results)
+        assert {'burger', 'sides', 'drinks', 'combos'} <= categories
+
+    def test_bm25_ranking(self):
+        """Test the BM25 ranking mode"""
+        kb = KnowledgeBase(ranking='bm25')
+        results = kb.retrieve('delivery hours', max_results=3)
+
+        assert len(results) == 3
+        assert results[0]['title'] == 'What are your delivery hours?'
+        assert results[0]['score'] >= results[1]['score'] >= results[2]['score']
+        assert kb.retrieve('xyzzy') == []
+
+    def test_full_menu_is_precompiled(self, kb):
+        """Test that full menu results come from the compiled snapshot"""
+        first = kb.get_full_menu()
+        second = kb.get_full_menu()
+
+        assert first == second
+        assert first[0] is second[0]
+        assert kb.snapshot.entries[0].key == 'menu:burgers:classic-perfburger'
+
+    def test_reload_swaps_snapshot_on_change(self, tmp_path):
+        """Test that edited files produce a new snapshot version"""
+        for name in ('menu.json', 'faqs.yaml', 'policies.json'):
+            shutil.copy(os.path.join('knowledge_base', name), tmp_path / name)
+        kb = KnowledgeBase(kb_path=str(tmp_path), reload_interval=0)
+        old_version = kb.version
+        old_snapshot = kb.snapshot
+
+        assert kb.reload() == old_version
+
+        policies = json.loads((tmp_path / 'policies.json').read_text())
+        policies['pet_policy'] = 'Well behaved dogs are welcome on our patio.'
+        (tmp_path / 'policies.json').write_text(json.dumps(policies))
+
+        assert kb.reload() != old_version
+        assert kb.snapshot is not old_snapshot
+        assert kb.retrieve('dogs patio')[0]['title'] == 'Pet Policy'
+        assert old_snapshot.search('dogs patio', 10) == []
+
+    def test_query_cache_hits_on_normalized_query(self, kb):
+        """Test that equivalent queries are served from the cache"""
+        first = kb.retrieve('Delivery   hours')
+        second = kb.retrieve('delivery hours')
+
+        assert first == second
+        assert kb.query_cache.hits == 1
+        assert kb.query_cache.misses == 1
+
+    def test_normalize_query(self):
+        """Test query normalisation used for cache keys"""
+        assert normalize_query('  Quiero  PAPAS\n') == 'quiero fries'
+
+    def test_vector_ranking_persists_vectors(self, tmp_path):
+        """Test the local vector ranking mode and its persisted matrix"""
+        for name in ('menu.json', 'faqs.yaml', 'policies.json'):
+            shutil.copy(os.path.join('knowledge_base', name), tmp_path / name)
+        kb = KnowledgeBase(ranking='vector', kb_path=str(tmp_path), reload_interval=0)
+
+        assert kb.retrieve('lemon drink')[0]['title'] == 'Fresh Lemonade'
+        assert (tmp_path / 'embeddings.npz').exists()
+
+        reloaded = KnowledgeBase(ranking='vector', kb_path=str(tmp_path), reload_interval=0)
+        reloaded.retrieve('spicy')
+        assert (reloaded.snapshot.vectors.matrix == kb.snapshot.vectors.matrix).all()
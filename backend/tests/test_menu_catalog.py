@@ -0,0 +1,76 @@
+import pytest
+import json
+from app.utils.knowledge_base import KnowledgeBase
+from app.utils.llm_client import LLMClient
+from app.utils.menu_catalog import MenuCatalog, alias_key
+from app.utils.draft_cart import _simple_keyword_extraction
+
+MENU = {
+    'burgers': [{'name': 'Classic PerfBurger', 'price': '12.99', 'description': 'Signature burger',
+                 'aliases': ['classic burger']}],
+    'sides': [{'name': 'Crispy French Fries', 'price': '4.99', 'aliases': ['fries']}],
+    'drinks': [{'name': 'Milkshakes', 'price': '5.99'}, {'name': 'Iced Tea', 'price': '2.99'}],
+    'combos': [{'name': 'Classic Combo', 'price': '16.99'}]
+}
+
+class TestMenuCatalog:
+    """Test the shared menu catalog"""
+
+    def test_lookup_by_name_alias_and_plural(self):
+        """Test case-insensitive names, aliases and plural folding"""
+        catalog = MenuCatalog(MENU)
+
+        assert catalog.get('classic perfburger').price == 12.99
+        assert catalog.get('Classic PerfBurgers') is None
+        assert catalog.lookup('Classic PerfBurgers').name == 'Classic PerfBurger'
+        assert catalog.lookup('the classic burger').name == 'Classic PerfBurger'
+        assert catalog.lookup('FRIES').category == 'sides'
+        assert catalog.lookup('a milkshake').name == 'Milkshakes'
+        assert catalog.lookup('Veggie Supreme') is None
+        assert alias_key('Sandwiches') == alias_key('sandwich')
+
+    def test_categories_and_extraction_prompt(self):
+        """Test category filtering and the pre-rendered prompt text"""
+        catalog = MenuCatalog(MENU, version='v1')
+
+        assert len(catalog) == 5
+        assert [item.name for item in catalog.in_categories(('drinks', 'burgers'))] == \
+            ['Milkshakes', 'Iced Tea', 'Classic PerfBurger']
+        assert '\nBURGERS:\n  - Classic PerfBurger: $12.99\n    Signature burger' in catalog.extraction_prompt
+        assert '  - Classic Combo: $16.99' in catalog.extraction_prompt
+
+    def test_catalog_is_replaced_on_reload(self, tmp_path):
+        """Test that the catalog is rebuilt with the knowledge base snapshot"""
+        (tmp_path / 'menu.json').write_text(json.dumps(MENU))
+        kb = KnowledgeBase(kb_path=str(tmp_path), reload_interval=0)
+        catalog = kb.catalog
+        assert catalog.version == kb.version
+        assert kb.catalog is catalog
+
+        (tmp_path / 'menu.json').write_text(json.dumps({'burgers': [{'name': 'Veggie Supreme', 'price': '11.99'}]}))
+        kb.reload()
+
+        assert kb.catalog is not catalog
+        assert kb.catalog.lookup('veggie supreme').price == 11.99
+        assert kb.catalog.lookup('Classic PerfBurger') is None
+
+    def test_validate_extracted_items(self):
+        """Test that LLM items are mapped onto the menu and unknown items lower the confidence"""
+        result = LLMClient()._validate_extracted_items({
+            'items': [{'name': 'classic perfburgers', 'quantity': 2, 'price': 0.01},
+                      {'name': 'Lobster Roll', 'quantity': 1}],
+            'confidence': 0.9,
+            'reasoning': 'Two items'
+        }, MenuCatalog(MENU))
+
+        assert result['items'] == [{'name': 'Classic PerfBurger', 'quantity': 2, 'customizations': [],
+                                     'price': 12.99, 'category': 'burgers'}]
+        assert result['confidence'] == 0.7
+        assert result['reasoning'].endswith('(Some items were filtered out during validation)')
+
+    def test_keyword_extraction_skips_combos(self):
+        """Test the keyword fallback against the catalog"""
+        items, total = _simple_keyword_extraction('2 classic combos and some fries please', MenuCatalog(MENU))
+
+        assert [item['name'] for item in items] == ['Classic PerfBurger', 'Crispy French Fries']
+        assert total == pytest.approx((12.99 + 4.99) * 2)
@@ -0,0 +1,70 @@
+import json
+from unittest.mock import patch
+from sqlalchemy import text
+from app import db
+from app.models import ChatMessage, ChatSession, User
+from app.utils.knowledge_base import get_knowledge_base
+from app.utils.message_storage import compact_legacy_context, encode_context, resolve_context
+
+class TestMessageStorage:
+    """Test compact retrieved context and compressed message bodies"""
+
+    def test_context_is_stored_as_keys_and_resolved_on_request(self, client, auth_headers):
+        """Test that assistant messages keep entry keys and the endpoint returns the full entries"""
+        with patch('app.chat.routes.llm_client.generate_response', return_value='We deliver from 11 AM.'):
+            client.post('/chat/', headers=auth_headers, json={'message': 'How long does delivery take?'})
+
+        message = ChatMessage.query.filter_by(message_type='assistant').one()
+        reference = json.loads(message.retrieved_context)
+        assert reference['v'] == get_knowledge_base().version
+        assert reference['e'][0][0] == 'faq:how-long-does-delivery-take'
+
+        response = client.get(f'/chat/messages/{message.id}/context', headers=auth_headers)
+        data = response.get_json()
+        assert response.status_code == 200
+        assert data['stale'] is False
+        assert data['entries'][0]['title'] == 'How long does delivery take?'
+        assert 'minutes' in data['entries'][0]['content']
+
+        other = client.post('/users/register', json={
+            'email': 'other@example.com', 'password': 'testpass123', 'first_name': 'Other', 'last_name': 'User'
+        }).get_json()['access_token']
+        response = client.get(f'/chat/messages/{message.id}/context', headers={'Authorization': f'Bearer {other}'})
+        assert response.status_code == 404
+
+    def test_legacy_context_is_compacted(self, app):
+        """Test converting the old str(results) format to a compact reference"""
+        knowledge_base = get_knowledge_base()
+        results = knowledge_base.retrieve('do you deliver')
+        legacy = str([{name: value for name, value in result.items() if name != 'key'} for result in results])
+
+        compact = compact_legacy_context(legacy, knowledge_base)
+
+        assert compact == encode_context(results, knowledge_base.version)
+        assert len(compact) < len(legacy) / 3
+        assert compact_legacy_context(compact, knowledge_base) == compact
+        assert resolve_context(legacy, knowledge_base)['entries'][0]['title'] == results[0]['title']
+        assert compact_legacy_context('not a python literal', knowledge_base) is None
+
+    def test_large_bodies_are_compressed(self, app):
+        """Test that bodies above the threshold are stored compressed and read back as text"""
+        app.config.update(MESSAGE_COMPRESSION='zlib', MESSAGE_COMPRESSION_MIN_BYTES=100)
+        user = User(email='storage@example.com', first_name='Storage', last_name='User')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.flush()
+        chat_session = ChatSession(user_id=user.id, session_id='storage-session')
+        db.session.add(chat_session)
+        db.session.flush()
+        long_body = 'Our Classic PerfBurger comes with lettuce, tomato and our secret sauce. ' * 20
+        db.session.add_all([
+            ChatMessage(session_id=chat_session.id, message_type='assistant', content=long_body),
+            ChatMessage(session_id=chat_session.id, message_type='user', content='Short question')
+        ])
+        db.session.commit()
+        db.session.expire_all()
+
+        stored = db.session.execute(text('SELECT typeof(content), length(content) FROM chat_message ORDER BY id')).all()
+        assert stored[0][0] == 'blob' and stored[0][1] < len(long_body) / 5
+        assert stored[1][0] == 'text'
+        assert [message.content for message in ChatMessage.query.order_by(ChatMessage.id)] == [long_body, 'Short question']
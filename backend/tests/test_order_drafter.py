@@ -0,0 +1,71 @@
+import threading
+from unittest.mock import MagicMock, patch
+from app import db
+from app.models import ChatMessage, ChatSession, User
+from app.utils.draft_cart import load_cart
+from app.utils.order_drafter import OrderDrafter
+
+class TestOrderDrafter:
+    """Test speculative background order drafting"""
+
+    def _session_with_message(self, content):
+        user = User(email='drafter@example.com', first_name='Draft', last_name='User')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.flush()
+        chat_session = ChatSession(user_id=user.id, session_id='drafter-session')
+        db.session.add(chat_session)
+        db.session.flush()
+        db.session.add(ChatMessage(session_id=chat_session.id, message_type='user', content=content))
+        db.session.commit()
+        return chat_session.id
+
+    def test_draft_is_stored_for_the_session(self, app):
+        """Test that a background draft updates the session's cart"""
+        session_pk = self._session_with_message("I'd like 2 classic perfburgers please")
+        drafter = OrderDrafter(app, max_workers=1)
+
+        assert drafter.submit(session_pk)
+        job = drafter._jobs.get(session_pk)
+        assert job is None or job.done.wait(5)
+        drafter.shutdown()
+
+        db.session.expire_all()
+        cart = load_cart(db.session.get(ChatSession, session_pk))
+        assert [(item['name'], item['quantity']) for item in cart['items']] == [('Classic PerfBurger', 2)]
+        assert drafter.stats()['completed'] == 1
+
+    def test_queue_is_bounded_and_cancellable(self, app):
+        """Test dropping, merging, cancelling and waiting"""
+        drafter = OrderDrafter(app, max_workers=1, max_pending=2)
+        started, release = threading.Event(), threading.Event()
+
+        def slow_draft(session_pk):
+            started.set()
+            release.wait(5)
+
+        with patch.object(drafter, '_draft', side_effect=slow_draft):
+            assert drafter.submit(1)
+            assert started.wait(5)
+            assert drafter.submit(2)
+            assert not drafter.submit(3)
+            assert drafter.submit(2)
+
+            assert drafter.settle(2, 0)
+            assert not drafter.settle(1, 0.01)
+            release.set()
+            assert drafter.settle(1, 5)
+            drafter.shutdown()
+
+        stats = drafter.stats()
+        assert (stats['submitted'], stats['dropped'], stats['merged'], stats['cancelled'], stats['pending']) == (2, 1, 1, 1, 0)
+
+    def test_chat_turn_with_order_intent_schedules_draft(self, client, auth_headers):
+        """Test that chat turns hand the session to the drafter"""
+        drafter = MagicMock()
+        with patch('app.chat.routes.get_order_drafter', return_value=drafter), \
+                patch('app.chat.routes.llm_client.generate_response', return_value='Coming right up!'):
+            client.post('/chat/', headers=auth_headers, json={'message': 'I want 2 classic burgers with extra cheese'})
+            client.post('/chat/', headers=auth_headers, json={'message': 'What are your opening hours?'})
+
+        assert drafter.submit.call_count == 1
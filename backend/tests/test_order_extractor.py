@@ -0,0 +1,145 @@
+import pytest
+from unittest.mock import patch
+from app import db
+from app.models import ChatMessage, ChatSession, User
+from app.utils.menu_catalog import MenuCatalog
+from app.utils.order_extractor import extract_order
+
+MENU = {
+    'burgers': [
+        {'name': 'Classic PerfBurger', 'price': '12.99', 'aliases': ['classic burger'],
+         'ingredients': ['beef patty', 'lettuce', 'tomato', 'red onion', 'brioche bun']},
+        {'name': 'Veggie Supreme', 'price': '11.99', 'ingredients': ['plant-based patty', 'avocado', 'swiss cheese']}
+    ],
+    'sides': [
+        {'name': 'Crispy French Fries', 'price': '4.99', 'aliases': ['fries']},
+        {'name': 'Sweet Potato Fries', 'price': '5.99'}
+    ],
+    'drinks': [{'name': 'Fresh Lemonade', 'price': '3.49', 'aliases': ['lemonade']}],
+    'combos': [{'name': 'Classic Combo', 'price': '16.99'}]
+}
+ORDERABLE = ('burgers', 'sides', 'drinks')
+
+def _lines(result):
+    return [(item['name'], item['quantity'], item['customizations']) for item in result['items']]
+
+class TestOrderExtractor:
+    """Test the rule-based order extractor"""
+
+    @pytest.mark.parametrize('text,expected', [
+        ("Hi! I'd like 2 classic burgers with no onions and a lemonade.",
+         [('Classic PerfBurger', 2, ['no onions']), ('Fresh Lemonade', 1, [])]),
+        ('Can I get two veggie supremes and a couple of sweet potato fries?',
+         [('Veggie Supreme', 2, []), ('Sweet Potato Fries', 2, [])]),
+        ("I'll take three orders of fries, 1 classic perfburger without tomato please",
+         [('Crispy French Fries', 3, []), ('Classic PerfBurger', 1, ['no tomato'])]),
+        ('Classic PerfBurger x2 and extra avocado on a veggie supreme please',
+         [('Classic PerfBurger', 2, []), ('Veggie Supreme', 1, ['extra avocado'])]),
+    ])
+    def test_confident_extraction(self, text, expected):
+        """Test quantities and customizations bound to their own items"""
+        result = extract_order(text, MenuCatalog(MENU), ORDERABLE)
+
+        assert _lines(result) == expected
+        assert result['confidence'] >= 0.8
+
+    @pytest.mark.parametrize('text', [
+        'I want a burger',
+        'I want fries and the veggie',
+        'give me a classic perfburger and a pizza',
+        'I want a classic perfburger. Actually make it 3 instead',
+        'Does the veggie supreme have cheese? OK I will take one.',
+        "I'd like a few lemonades",
+        'A classic perfburger with extra avocado please',
+        'I want a classic combo',
+    ])
+    def test_ambiguous_conversations_have_low_confidence(self, text):
+        """Test that anything the rules cannot settle is left to the LLM"""
+        assert extract_order(text, MenuCatalog(MENU), ORDERABLE)['confidence'] < 0.8
+
+    @pytest.mark.parametrize('text,issue', [
+        ('I want a classic burger with no pickles', 'customization'),
+        ('I want a classic burger and a lemonade no ice', 'customization'),
+        ('I want a classic burger with extra bacon', 'customization'),
+        ('I want a classic burger well done', 'preference'),
+        ('I want a classic burger medium rare', 'preference'),
+        ("I'd like a veggie supreme, gluten free please", 'preference'),
+    ])
+    def test_instructions_the_rules_cannot_keep_go_to_the_llm(self, text, issue):
+        """Test that unknown customizations and cooking or diet preferences are never dropped silently"""
+        result = extract_order(text, MenuCatalog(MENU), ORDERABLE)
+
+        assert issue in result['issues']
+        assert result['confidence'] < 0.8
+
+    @pytest.mark.parametrize('text,quantity,issue', [
+        ('I want a classic perfburger. I also want another classic perfburger for my friend', 2, 'reference'),
+        ('I want a lemonade and a lemonade', 2, 'conflict'),
+        ('I want fries, fries and fries', 3, 'conflict'),
+        ('I want a veggie supreme, my friend wants the same', 1, 'reference'),
+    ])
+    def test_repeated_and_referring_mentions_go_to_the_llm(self, text, quantity, issue):
+        """Test that repeats add up but are not trusted, and "another"/"the same" count as references"""
+        result = extract_order(text, MenuCatalog(MENU), ORDERABLE)
+
+        assert [line[1] for line in _lines(result)] == [quantity]
+        assert issue in result['issues']
+        assert result['confidence'] < 0.8
+
+    def test_same_item_with_different_customizations_stays_separate(self):
+        """Test that each mention keeps its own customizations"""
+        result = extract_order('I want a classic perfburger with no onions and a classic perfburger with extra tomato',
+                               MenuCatalog(MENU), ORDERABLE)
+
+        assert _lines(result) == [('Classic PerfBurger', 1, ['no onions']), ('Classic PerfBurger', 1, ['extra tomato'])]
+        assert result['confidence'] >= 0.8
+
+    @pytest.mark.parametrize('text', [
+        'I want a classic burger. No thanks, that is all.',
+        'Can I add 2 fries and a lemonade',
+    ])
+    def test_modifier_words_without_a_target_are_not_customizations(self, text):
+        """Test that "no thanks" or "add 2 fries" don't count as unknown customizations"""
+        assert extract_order(text, MenuCatalog(MENU), ORDERABLE)['confidence'] >= 0.8
+
+    def test_menu_question_does_not_order(self):
+        """Test that asking about an item does not add it"""
+        result = extract_order('Is the veggie supreme spicy? I will have 2 lemonades please', MenuCatalog(MENU), ORDERABLE)
+
+        assert _lines(result) == [('Fresh Lemonade', 2, [])]
+        assert result['confidence'] >= 0.8
+
+    def _session_with_messages(self, *messages):
+        user = User.query.filter_by(email='test@example.com').first()
+        chat_session = ChatSession(user_id=user.id, session_id='order-session')
+        db.session.add(chat_session)
+        db.session.flush()
+        for content in messages:
+            db.session.add(ChatMessage(session_id=chat_session.id, message_type='user', content=content))
+        db.session.commit()
+        return chat_session.session_id
+
+    def test_confident_order_skips_llm(self, client, auth_headers):
+        """Test that a clear-cut order is created without calling the LLM"""
+        session_id = self._session_with_messages('Hi there', "I'd like 2 classic perfburgers and a lemonade please")
+
+        with patch('app.orders.routes.LLMClient.analyze_conversation_for_order', side_effect=AssertionError('LLM called')):
+            response = client.post('/orders/', headers=auth_headers, json={'session_id': session_id})
+
+        assert response.status_code == 201
+        data = response.get_json()
+        assert data['analysis_method'] == 'rules'
+        assert [(item['name'], item['quantity']) for item in data['order']['items']] == \
+            [('Classic PerfBurger', 2), ('Fresh Lemonade', 1)]
+        assert data['order']['total_amount'] == pytest.approx(12.99 * 2 + 3.49)
+
+    def test_ambiguous_order_uses_llm(self, client, auth_headers):
+        """Test that low-confidence conversations still go to the LLM"""
+        session_id = self._session_with_messages('I want a burger and some fries')
+        llm_result = {'items': [{'name': 'Classic PerfBurger', 'quantity': 1}], 'confidence': 0.9, 'reasoning': 'LLM'}
+
+        with patch('app.orders.routes.LLMClient.analyze_conversation_for_order', return_value=llm_result) as analyze:
+            response = client.post('/orders/', headers=auth_headers, json={'session_id': session_id})
+
+        analyze.assert_called_once()
+        assert response.get_json()['analysis_method'] == 'LLM'
@@ -0,0 +1,61 @@
+from app.utils.prompt_builder import compact_whitespace, estimate_tokens, pack_prompt
+
+def format_context(items):
+    return "\n\n".join(f"**{item['title']}**\n{item['content']}" for item in items)
+
+class TestPromptBuilder:
+    """Test token-budgeted prompt assembly"""
+
+    def test_compact_whitespace(self):
+        """Test that prompt indentation is removed"""
+        prompt = """
+        You are PerfBot.
+        
+        
+            - Be helpful
+        """
+
+        assert compact_whitespace(prompt) == "You are PerfBot.\n\n- Be helpful"
+
+    def test_estimate_tokens(self):
+        """Test the local token estimate"""
+        assert estimate_tokens('') == 0
+        assert estimate_tokens('Hello, world!') == 4
+
+    def test_drops_lowest_scored_context_and_duplicates(self):
+        """Test that context is deduplicated and trimmed by score"""
+        context = [
+            {'title': 'Classic PerfBurger', 'content': 'beef ' * 40, 'score': 3.0},
+            {'title': 'Onion Rings', 'content': 'rings ' * 40, 'score': 1.0},
+            {'title': 'Classic PerfBurger', 'content': 'beef ' * 40, 'score': 3.0},
+            {'title': 'Iced Tea', 'content': 'tea ' * 40, 'score': 2.0}
+        ]
+
+        messages, stats = pack_prompt('system', 'hi', context, [], 150, format_context)
+
+        assert stats['context_items'] == 2
+        assert 'Classic PerfBurger' in messages[1]['content']
+        assert 'Iced Tea' in messages[1]['content']
+        assert 'Onion Rings' not in messages[1]['content']
+        assert stats['prompt_tokens'] <= 150
+
+    def test_keeps_most_recent_history(self):
+        """Test that older history is dropped first"""
+        history = [{'role': 'user', 'content': f'message {i} ' + 'word ' * 20} for i in range(10)]
+
+        messages, stats = pack_prompt('system', 'hi', None, history, 100, format_context)
+
+        assert messages[0]['role'] == 'system'
+        assert messages[-1] == {'role': 'user', 'content': 'hi'}
+        assert messages[-2]['content'].startswith('message 9')
+        assert stats['history_dropped'] > 0
+
+    def test_summary_is_always_sent(self):
+        """Test that the conversation summary follows the system prompt and survives trimming"""
+        history = [{'role': 'user', 'content': 'word ' * 50} for _ in range(4)]
+
+        messages, stats = pack_prompt('system', 'hi', None, history, 60, format_context,
+                                      summary='Customer wants 2 Classic PerfBurgers')
+
+        assert messages[1] == {'role': 'system', 'content': 'Customer wants 2 Classic PerfBurgers'}
+        assert stats['history_dropped'] == 2  # Only the reserved recent messages are kept
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from sqlalchemy import select, update
+from app import db
+from app.models import ChatArchive, ChatMessage, ChatSession
+from app.utils.retention import archive_idle_sessions, archive_session, rehydrate_session
+
+def chat(client, auth_headers, message, session_id=None):
+    with patch('app.chat.routes.llm_client.generate_response', return_value='We deliver from 11 AM.') as generate:
+        response = client.post('/chat/', headers=auth_headers, json={'message': message, 'session_id': session_id})
+    return response.get_json()['session_id'], generate
+
+def age_session(session_id, days):
+    """Move a session's activity ``days`` into the past"""
+    chat_session = ChatSession.query.filter_by(session_id=session_id).one()
+    past = datetime.utcnow() - timedelta(days=days)
+    db.session.execute(update(ChatMessage).where(ChatMessage.session_id == chat_session.id).values(timestamp=past))
+    db.session.execute(update(ChatSession).where(ChatSession.id == chat_session.id).values(updated_at=past))
+    db.session.commit()
+    return chat_session.id
+
+class TestRetention:
+    """Test archival of idle chat sessions and rehydration"""
+
+    def test_idle_sessions_are_archived_and_rehydrated(self, client, auth_headers):
+        """Test that only idle sessions are archived and rehydration restores them unchanged"""
+        old_session, _ = chat(client, auth_headers, 'How long does delivery take?')
+        chat(client, auth_headers, 'Do you have vegan options?', old_session)
+        recent_session, _ = chat(client, auth_headers, 'Are you open on Sundays?')
+        old_pk = age_session(old_session, 40)
+        before = [(m.id, m.message_type, m.content, m.timestamp, m.retrieved_context)
+                  for m in ChatMessage.query.filter_by(session_id=old_pk).order_by(ChatMessage.id)]
+
+        stats = archive_idle_sessions(days=30)
+
+        assert stats['sessions'] == 1 and stats['messages'] == 4
+        assert ChatMessage.query.filter_by(session_id=old_pk).count() == 0
+        assert ChatArchive.query.filter_by(session_id=old_pk).one().message_count == 4
+        assert db.session.get(ChatSession, old_pk).is_active is False
+        assert ChatSession.query.filter_by(session_id=recent_session).one().is_active is True
+        assert archive_idle_sessions(days=30)['sessions'] == 0
+
+        response = client.post(f'/chat/sessions/{old_session}/rehydrate', headers=auth_headers)
+        assert response.status_code == 200
+        assert response.get_json()['restored_messages'] == 4
+
+        after = [(m.id, m.message_type, m.content, m.timestamp, m.retrieved_context)
+                 for m in ChatMessage.query.filter_by(session_id=old_pk).order_by(ChatMessage.id)]
+        assert after == before
+        assert db.session.get(ChatSession, old_pk).is_active is True
+        assert db.session.get(ChatSession, old_pk).last_message_id == before[-1][0]
+        assert ChatArchive.query.count() == 0
+
+        other = client.post('/users/register', json={
+            'email': 'other@example.com', 'password': 'testpass123', 'first_name': 'Other', 'last_name': 'User'
+        }).get_json()['access_token']
+        response = client.post(f'/chat/sessions/{old_session}/rehydrate', headers={'Authorization': f'Bearer {other}'})
+        assert response.status_code == 404
+
+    def test_session_with_a_new_message_is_not_archived(self, client, auth_headers):
+        """Test that a session that got a message after it was selected is skipped"""
+        session_id, _ = chat(client, auth_headers, 'How long does delivery take?')
+        chat_session = ChatSession.query.filter_by(session_id=session_id).one()
+
+        assert archive_session(chat_session.id, chat_session.last_message_id - 1, 'zlib') is None
+        db.session.commit()
+        assert ChatMessage.query.filter_by(session_id=chat_session.id).count() == 2
+
+    def test_reused_ids_are_renumbered(self, client, auth_headers):
+        """Test that rehydration assigns new ids and moves the watermarks if an archived id was reused"""
+        session_id, _ = chat(client, auth_headers, 'How long does delivery take?')
+        chat_session = ChatSession.query.filter_by(session_id=session_id).one()
+        first_id, last_id = [m.id for m in chat_session.messages.order_by(ChatMessage.id)]
+        chat_session.summary_message_id = first_id
+        db.session.commit()
+        session_pk = age_session(session_id, 40)
+        archive_idle_sessions(days=30)
+
+        # SQLite hands out max(id) + 1, so the archived ids are free again
+        other_session, _ = chat(client, auth_headers, 'Are you open on Sundays?')
+        other_pk = ChatSession.query.filter_by(session_id=other_session).one().id
+        assert db.session.execute(select(ChatMessage.session_id).where(ChatMessage.id == first_id)).scalar() == other_pk
+
+        assert rehydrate_session(db.session.get(ChatSession, session_pk)) == 2
+        restored = [m.id for m in ChatMessage.query.filter_by(session_id=session_pk).order_by(ChatMessage.id)]
+        chat_session = db.session.get(ChatSession, session_pk)
+        assert restored == [last_id + 1, last_id + 2]
+        assert chat_session.summary_message_id == restored[0]
+        assert chat_session.last_message_id == restored[1]
+
+    def test_chatting_in_an_archived_session_restores_its_history(self, client, auth_headers):
+        """Test that an archived session is rehydrated before its history is read"""
+        session_id, _ = chat(client, auth_headers, 'How long does delivery take?')
+        age_session(session_id, 40)
+        archive_idle_sessions(days=30)
+
+        _, generate = chat(client, auth_headers, 'And do you deliver on Sundays?', session_id)
+
+        history = generate.call_args.kwargs['chat_history']
+        assert [message['content'] for message in history] == ['How long does delivery take?', 'We deliver from 11 AM.']
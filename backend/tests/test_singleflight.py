@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+import fcntl
+import zlib
+import pytest
+from app.utils.singleflight import SingleFlight
+
+class TestSingleFlight:
+    """Test coalescing of identical in-flight calls"""
+
+    def test_concurrent_callers_share_one_call(self):
+        """Test that threads with the same key wait on the leader's call"""
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def slow_call():
+            calls.append(1)
+            release.wait(5)
+            return 'answer'
+
+        def caller():
+            results.append(flight.do('same-prompt', slow_call))
+
+        threads = [threading.Thread(target=caller) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        while 'same-prompt' not in flight._flights or flight._flights['same-prompt'].followers < 4:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert [result for result, _ in results] == ['answer'] * 5
+        assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+        assert flight.stats()['coalesced'] == 4
+
+    def test_leader_error_reaches_followers(self):
+        """Test that a failed call fails every waiting caller"""
+        flight = SingleFlight()
+        started = threading.Event()
+        errors = []
+
+        def failing_call():
+            started.set()
+            time.sleep(0.1)
+            raise RuntimeError('upstream down')
+
+        def follower():
+            started.wait(5)
+            try:
+                flight.do('key', lambda: 'unused')
+            except RuntimeError as e:
+                errors.append(str(e))
+
+        thread = threading.Thread(target=follower)
+        thread.start()
+        with pytest.raises(RuntimeError):
+            flight.do('key', failing_call)
+        thread.join()
+
+        assert errors == ['upstream down']
+
+    def test_cross_worker_follower_reads_shared_result(self, tmp_path):
+        """Test that a held file lock makes the caller wait and reuse the stored result"""
+        flight = SingleFlight(lock_dir=str(tmp_path), poll_interval=0.01)
+        bucket = zlib.crc32(b'prompt-hash') % flight.lock_buckets
+        stored = {}
+
+        # Another worker holds the lock while it makes the call
+        other_worker = open(os.path.join(str(tmp_path), f"{bucket:04x}.lock"), 'a')
+        fcntl.flock(other_worker, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+        def finish_other_worker():
+            time.sleep(0.1)
+            stored['value'] = 'shared answer'
+            fcntl.flock(other_worker, fcntl.LOCK_UN)
+            other_worker.close()
+
+        thread = threading.Thread(target=finish_other_worker)
+        thread.start()
+        result, shared = flight.do('prompt-hash', lambda: 'own answer', lookup=lambda: stored.get('value'))
+        thread.join()
+
+        assert (result, shared) == ('shared answer', True)
+        assert flight.stats()['cross_worker_coalesced'] == 1
@@ -224,14 +224,27 @@ ${response.order.driver_name ? `**Driver:** ${response.order.driver_name}${respo
 
     setMessage('');
 
+    const botMessageId = 'bot-' + Date.now();
+
     try {
-      const response = await apiService.sendMessage(
+      // Render the reply incrementally as tokens arrive
+      const response = await apiService.streamMessage(
         userMessage.content,
-        chatState.sessionId || undefined
+        chatState.sessionId || undefined,
+        (token) => {
+          setChatState(prev => {
+            const exists = prev.messages.some(m => m.id === botMessageId);
+            const messages = exists
+              ? prev.messages.map(m => m.id === botMessageId ? { ...m, content: m.content + token } : m)
+              : [...prev.messages, { id: botMessageId, content: token, isUser: false, timestamp: new Date() }];
+            return { ...prev, messages, isTyping: false };
+          });
+        },
+        (sessionId) => setChatState(prev => ({ ...prev, sessionId }))
       );
 
       const botMessage: ChatMessage = {
-        id: 'bot-' + Date.now(),
+        id: botMessageId,
         content: response.message,
         isUser: false,
         timestamp: new Date(response.timestamp),
@@ -240,7 +253,9 @@ ${response.order.driver_name ? `**Driver:** ${response.order.driver_name}${respo
 
       setChatState(prev => ({
         ...prev,
-        messages: [...prev.messages, botMessage],
+        messages: prev.messages.some(m => m.id === botMessageId)
+          ? prev.messages.map(m => m.id === botMessageId ? botMessage : m)
+          : [...prev.messages, botMessage],
         sessionId: response.session_id,
         isLoading: false,
         isTyping: false,
@@ -274,9 +289,10 @@ ${response.order.driver_name ? `**Driver:** ${response.order.driver_name}${respo
         timestamp: new Date(),
       };
 
+      // A partially streamed reply is replaced by the fallback text
       setChatState(prev => ({
         ...prev,
-        messages: [...prev.messages, errorMessage],
+        messages: [...prev.messages.filter(m => m.id !== botMessageId), errorMessage],
         isLoading: false,
         isTyping: false,
       }));
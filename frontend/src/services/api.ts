@@ -1,6 +1,6 @@
 import axios from 'axios';
 import type { AxiosInstance, AxiosResponse } from 'axios';
-import type { AuthResponse, ChatResponse, ApiError, CreateOrderResponse, OrderLookupResponse } from '../types';
+import type { AuthResponse, ChatResponse, ChatStreamDone, ApiError, CreateOrderResponse, OrderLookupResponse } from '../types';
 
 class ApiService {
   private static instance: ApiService;
@@ -120,6 +120,84 @@ class ApiService {
     }
   }
 
+  // Stream a chat reply over Server-Sent Events, calling onToken for each chunk
+  async streamMessage(
+    message: string,
+    sessionId: string | undefined,
+    onToken: (token: string) => void,
+    onStart?: (sessionId: string) => void
+  ): Promise<ChatStreamDone> {
+    const payload: any = { message };
+    if (sessionId) {
+      payload.session_id = sessionId;
+    }
+
+    let response: Response;
+    try {
+      response = await fetch(`${this.api.defaults.baseURL}/chat/stream`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          Accept: 'text/event-stream',
+          ...(this.token ? { Authorization: `Bearer ${this.token}` } : {}),
+        },
+        body: JSON.stringify(payload),
+      });
+    } catch (error: any) {
+      throw this.handleError(error);
+    }
+
+    if (!response.ok || !response.body) {
+      if (response.status === 401) {
+        this.logout();
+      }
+      const data = await response.json().catch(() => ({}));
+      throw this.handleError({ response: { status: response.status, data } });
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let done: ChatStreamDone | null = null;
+
+    while (true) {
+      const { value, done: finished } = await reader.read();
+      if (finished) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      // Events are separated by a blank line
+      let boundary = buffer.indexOf('\n\n');
+      while (boundary !== -1) {
+        const block = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        boundary = buffer.indexOf('\n\n');
+
+        let event = 'message';
+        let data = '';
+        for (const line of block.split('\n')) {
+          if (line.startsWith('event: ')) event = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        }
+        if (!data) continue;
+
+        const parsed = JSON.parse(data);
+        if (event === 'start' && onStart) onStart(parsed.session_id);
+        else if (event === 'token') onToken(parsed.content);
+        else if (event === 'done') done = parsed;
+        else if (event === 'error') {
+          // The reply was not saved, so it must not look like a normal answer
+          reader.cancel().catch(() => {});
+          throw { error: parsed.error, message: 'The response could not be saved. Please try again.' } as ApiError;
+        }
+      }
+    }
+
+    if (!done) {
+      throw { error: 'Stream interrupted', message: 'The response was interrupted. Please try again.' } as ApiError;
+    }
+    return done;
+  }
+
   // Order methods
   async createOrder(sessionId: string): Promise<CreateOrderResponse> {
     try {
@@ -22,9 +22,17 @@ export interface Message {
 export interface ChatResponse {
   message: string;
   session_id: string;
+  knowledge_base_version?: string;
   timestamp: string;
 }
 
+export interface ChatStreamDone extends ChatResponse {
+  timing: {
+    first_token_ms: number | null;
+    total_ms: number;
+  };
+}
+
 export interface ApiError {
   error: string;
   message?: string;
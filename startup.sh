@@ -18,4 +18,5 @@ echo "Current directory: $(pwd)"
 echo "OpenAI API Key configured: $([ -n "$OPENAI_API_KEY" ] && echo "Yes" || echo "No")"
 
 # Start gunicorn server (database tables will be created automatically on first request)
-gunicorn --bind 0.0.0.0:8000 --workers 2 --timeout 120 --log-level info run:app
+# Worker class and concurrency are configured in gunicorn.conf.py (gevent by default)
+GUNICORN_BIND=0.0.0.0:8000 GUNICORN_WORKERS=${GUNICORN_WORKERS:-2} gunicorn -c gunicorn.conf.py run:app